@@ -0,0 +1,118 @@
+# Cold-start timing harness for ACEest
+#
+# Measures, in fresh interpreters so nothing is cached in-process:
+#   * import: time to `import src.app` (app built, store opened)
+#   * ttfb:   process start -> first byte of GET / from a real server
+#
+# Run from the repository root:
+#   python benchmarks/startup.py --runs 5
+#   python benchmarks/startup.py --server gunicorn --json > startup.json
+# Compare the JSON across releases to catch cold-start regressions.
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import src.app; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _env(warmup, directory):
+    env = dict(os.environ)
+    env['ACEEST_STORE'] = 'sqlite'
+    env['ACEEST_DB_PATH'] = os.path.join(directory, 'bench.db')
+    env['ACEEST_WARMUP'] = '1' if warmup else '0'
+    env['PYTHONPATH'] = ROOT
+    return env
+
+
+def time_import(warmup):
+    with tempfile.TemporaryDirectory(prefix='aceest-bench-') as directory:
+        out = subprocess.run([sys.executable, '-c', IMPORT_SNIPPET], cwd=ROOT, env=_env(warmup, directory),
+                             check=True, capture_output=True, text=True).stdout
+    return float(out.strip().splitlines()[-1])
+
+
+def _server_command(server, port):
+    if server == 'gunicorn':
+        return [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-w', '1',
+                '-b', f'127.0.0.1:{port}', 'src.app:app']
+    return [sys.executable, '-m', 'flask', '--app', 'src.app', 'run', '--port', str(port)]
+
+
+def time_first_byte(server, warmup, timeout=30.0):
+    with tempfile.TemporaryDirectory(prefix='aceest-bench-') as directory:
+        return _time_first_byte(server, warmup, directory, timeout)
+
+
+def _time_first_byte(server, warmup, directory, timeout):
+    port = _free_port()
+    url = f'http://127.0.0.1:{port}/'
+    start = time.perf_counter()
+    proc = subprocess.Popen(_server_command(server, port), cwd=ROOT, env=_env(warmup, directory),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f'{server} exited with {proc.returncode} before serving')
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    response.read(1)
+                    return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.005)
+        raise RuntimeError(f'no response from {url} within {timeout}s')
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def _stats(samples):
+    return {
+        'min_ms': round(min(samples) * 1000, 1),
+        'median_ms': round(statistics.median(samples) * 1000, 1),
+        'max_ms': round(max(samples) * 1000, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure ACEest import time and time to first byte.')
+    parser.add_argument('--runs', type=int, default=5, help='fresh processes per measurement')
+    parser.add_argument('--server', choices=('flask', 'gunicorn'), default='flask')
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args(argv)
+
+    results = {'python': sys.version.split()[0], 'server': args.server, 'runs': args.runs}
+    for warmup in (False, True):
+        label = 'warmup' if warmup else 'lazy'
+        results[f'import_{label}'] = _stats([time_import(warmup) for _ in range(args.runs)])
+        results[f'ttfb_{label}'] = _stats([time_first_byte(args.server, warmup) for _ in range(args.runs)])
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"python {results['python']}, server {args.server}, {args.runs} runs each")
+    for key, value in results.items():
+        if isinstance(value, dict):
+            print(f"{key:16} min {value['min_ms']:8.1f} ms  median {value['median_ms']:8.1f} ms  max {value['max_ms']:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+# Gunicorn settings for ACEest (loaded automatically from the working directory)
+#
+# The app is imported once in the master (preload) and the workers are
+# forked from it, so templates, constants and imported modules are shared
+# copy-on-write. The GC is frozen before forking: without that, the first
+# collection in each worker writes to every preloaded object header and
+# un-shares those pages.
+import gc
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+# A journaled memory store belongs to a single worker (see src/journal.py);
+# its concurrency comes from the threads.
+if os.environ.get('ACEEST_STORE', 'memory').lower() == 'memory' and os.environ.get('ACEEST_JOURNAL_DIR'):
+    workers = 1
+threads = int(os.environ.get('WEB_THREADS', 4))
+worker_class = 'gthread'
+preload_app = True
+
+# No collections while the app is imported: they would only reshuffle
+# objects that are about to be frozen.
+gc.disable()
+
+
+def when_ready(server):
+    # Runs in the master after the app is preloaded, before any worker forks.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    gc.enable()
+    from src.app import app, init_worker
+    init_worker(app)
@@ -0,0 +1,71 @@
+# Incrementally maintained workout aggregates
+#
+# /add and /add-auto update these counters in O(1) so GET / and /summary do
+# not rescan the whole log.
+from datetime import date
+
+from src.models import CATEGORIES, MAX_CLOCK_SKEW
+
+WEEK_DAYS = 7
+# Entries may be stamped up to MAX_CLOCK_SKEW ahead; those days get their own
+# buckets so they never evict one still inside today's window.
+RING_DAYS = WEEK_DAYS + -(-MAX_CLOCK_SKEW // 86400)
+
+
+class AggregateTracker:
+    """Per-category session counts and minutes plus a 7-day calorie ring.
+
+    The ring holds one bucket per day, indexed by ``date.toordinal() % RING_DAYS``.
+    Each bucket remembers which day it belongs to, so a bucket left over from
+    an earlier week is reset the first time a newer day lands in it.
+    """
+
+    def __init__(self):
+        self.sessions = {category: 0 for category in CATEGORIES}
+        self.minutes = {category: 0 for category in CATEGORIES}
+        self._ring_days = [0] * RING_DAYS
+        self._ring_calories = [0] * RING_DAYS
+
+    def add(self, category, duration, calories, day):
+        """Record one entry logged on ``day`` (a date)."""
+        self.sessions[category] += 1
+        self.minutes[category] += duration
+        self.add_day_calories(day.toordinal(), calories)
+
+    def add_day_calories(self, ordinal, calories):
+        slot = ordinal % RING_DAYS
+        if self._ring_days[slot] == ordinal:
+            self._ring_calories[slot] += calories
+        elif self._ring_days[slot] < ordinal:
+            self._ring_days[slot] = ordinal
+            self._ring_calories[slot] = calories
+        # Older than the day already in this slot: outside any window we report.
+
+    @property
+    def total_sessions(self):
+        return sum(self.sessions.values())
+
+    @property
+    def total_minutes(self):
+        return sum(self.minutes.values())
+
+    def progress_totals(self):
+        """Minutes per category, in CATEGORIES order."""
+        return dict(self.minutes)
+
+    def weekly_calories(self, today=None):
+        """Calories logged in the last 7 days including ``today``."""
+        today = (today or date.today()).toordinal()
+        return sum(
+            calories
+            for ordinal, calories in zip(self._ring_days, self._ring_calories)
+            if today - WEEK_DAYS < ordinal <= today
+        )
+
+    def copy(self):
+        clone = AggregateTracker()
+        clone.sessions = dict(self.sessions)
+        clone.minutes = dict(self.minutes)
+        clone._ring_days = list(self._ring_days)
+        clone._ring_calories = list(self._ring_calories)
+        return clone
@@ -1,32 +1,37 @@
 
 # Flask web app for ACEestFitness and Gym
 import os
-import io
-from datetime import datetime, timedelta
-from flask import Flask, render_template_string, request, redirect, url_for, flash, send_file
-
-# PDF/report utilities (parity with Tkinter v1.3 export)
-from reportlab.pdfgen import canvas as pdf_canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import Table, TableStyle
-from reportlab.lib import colors as rl_colors
-
-app = Flask(__name__)
-app.secret_key = os.environ.get("FLASK_SECRET_KEY", "aceest-dev-secret")
-
-CATEGORIES = ("Warm-up", "Workout", "Cool-down")
-workouts = {category: [] for category in CATEGORIES}
-
-# MET values and user profile (from Tkinter v1.3)
-MET_VALUES = {
-    "Warm-up": 3,
-    "Workout": 6,
-    "Cool-down": 2.5,
-}
-
-# Simple in-memory user profile and daily aggregation
-user_info = {}
-daily_workouts = {}  # key: ISO date string -> {category: [entries]}
+import atexit
+import functools
+import hashlib
+import heapq
+import importlib
+import itertools
+import tempfile
+import threading
+from datetime import datetime, timezone
+from flask import (
+    Flask, current_app, flash, jsonify, make_response, redirect, render_template, request, send_file, session,
+    stream_with_context, url_for,
+)
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+from werkzeug.http import is_resource_modified
+
+from src.batch import BATCH_LOCK_NAME, try_batch_lock, zip_chunks
+from src.bulk import (
+    FORMATS as BULK_FORMATS, MIMETYPES as BULK_MIMETYPES, SPOOL_MAX_SIZE, day_bounds, detect_format, export_chunks,
+    export_npz, import_stream,
+)
+from src.charts import ChartCache, chart_key, report_charts
+from src.ingest import DEFAULT_WEIGHT_KG, ValidationError, entries_from_records, met_calories
+from src.models import CATEGORIES, MAX_ENTRY_VALUE, MET_VALUES, WorkoutEntry
+from src.reports import (
+    DONE as REPORT_DONE, REPORT_CACHE_SIZE, ReportCache, ReportJobs, ReportOutdated, ReportQueueFull, ReportTotals,
+    default_cache_dir, report_lines, report_row, spooled_pdf, write_weekly_report,
+)
+from src.scheduler import LOCK_NAME as PRERENDER_LOCK, WeeklyPrerender, parse_hours
+from src.storage import GUEST_MEMBER, create_store, entry_position
 
 WORKOUT_CHART_DATA = {
     "Warm-up (5-10 min)": [
@@ -66,439 +71,148 @@ DIET_PLANS = {
     ],
 }
 
-HTML_TEMPLATE = """
-<!DOCTYPE html>
-<html lang='en'>
-<head>
-    <meta charset='UTF-8'>
-    <title>ACEestFitness and Gym</title>
-    <style>
-        :root {
-            --color-primary: #4caf50;
-            --color-primary-dark: #388e3c;
-            --color-secondary: #2196f3;
-            --color-secondary-dark: #1976d2;
-            --color-background: #f8f9fa;
-            --color-card: #ffffff;
-            --color-text: #343a40;
-        }
-        body { font-family: Arial, sans-serif; background: var(--color-background); margin: 0; padding: 0; color: var(--color-text); }
-        .container { max-width: 860px; margin: 40px auto; background: var(--color-card); padding: 32px; border-radius: 12px; box-shadow: 0 12px 28px rgba(44, 62, 80, 0.15); }
-        h1 { color: var(--color-text); margin-bottom: 8px; font-size: 2.1em; }
-        .subtitle { color: #6c757d; margin-top: 0; font-size: 1.05em; }
-        form { margin-bottom: 24px; }
-        label { display: block; margin-top: 12px; font-weight: bold; color: var(--color-text); }
-        input[type=text], input[type=number], select { width: 100%; padding: 12px; margin-top: 6px; border: 1px solid #ced4da; border-radius: 8px; background: #f1f3f5; transition: border-color 0.2s, background 0.2s; }
-        input[type=text]:focus, input[type=number]:focus, select:focus { outline: none; border-color: var(--color-secondary); background: var(--color-card); }
-        button { margin-top: 20px; padding: 13px 22px; background: var(--color-primary); color: #fff; border: none; border-radius: 24px; cursor: pointer; font-weight: bold; letter-spacing: 0.6px; text-transform: uppercase; box-shadow: 0 4px 12px rgba(76, 175, 80, 0.25); }
-        button:hover { background: var(--color-primary-dark); }
-        .messages { margin-top: 16px; }
-        .messages .info { background: #d1ecf1; color: #0c5460; border: 1px solid #bee5eb; padding: 10px; border-radius: 6px; margin-bottom: 8px; }
-        .messages .error { background: #f8d7da; color: #721c24; border: 1px solid #f5c6cb; padding: 10px; border-radius: 6px; margin-bottom: 8px; }
-        .workout-list { margin-top: 32px; }
-        .workout-item { background: #eafaf1; padding: 12px; border-radius: 6px; margin-bottom: 10px; border-left: 4px solid #28a745; }
-        .actions { margin-top: 16px; text-align: center; }
-        .actions a { color: #007bff; text-decoration: none; font-weight: bold; }
-        .actions a:hover { text-decoration: underline; }
-        .tabs { margin-top: 24px; }
-    .tab-nav { display: flex; gap: 8px; flex-wrap: wrap; }
-    .tab-btn { background: #e4ecf6; border: none; padding: 10px 20px; border-radius: 24px; cursor: pointer; color: var(--color-text); font-weight: 600; transition: background 0.3s, transform 0.2s; }
-    .tab-btn:hover { background: #d0d9e4; transform: translateY(-1px); }
-    .tab-btn.active { background: var(--color-secondary); color: #fff; box-shadow: 0 6px 14px rgba(33, 150, 243, 0.25); }
-        .tab-panel { display: none; margin-top: 24px; }
-        .tab-panel.active { display: block; }
-    .input-card { background: #eef4fb; padding: 26px; border-radius: 12px; border: 1px solid #dce4f0; box-shadow: inset 0 0 0 1px rgba(0,0,0,0.02); }
-        .chart-group, .diet-group { background: #f8f9fa; border-radius: 8px; padding: 18px; margin-bottom: 18px; box-shadow: inset 0 0 0 1px rgba(0,0,0,0.04); }
-        .chart-group h3, .diet-group h3 { margin-top: 0; }
-        ul { padding-left: 18px; }
-    .chart-wrapper { background: #fff; border-radius: 10px; padding: 20px; margin-bottom: 16px; box-shadow: 0 8px 18px rgba(0,0,0,0.05); }
-    .progress-note { color: #6c757d; margin-bottom: 8px; font-weight: bold; }
-    .progress-summary { color: #dc3545; font-weight: bold; margin-top: 16px; }
-    .empty-progress { color: #777; font-style: italic; }
-    .section-title { font-size: 1.4em; color: #343a40; margin-bottom: 12px; }
-    .section-subtitle { color: #6c757d; margin-top: 0; margin-bottom: 16px; font-size: 0.95em; }
-        .summary-header { margin-bottom: 16px; text-align: center; }
-        .summary-category { color: #007bff; margin-bottom: 10px; text-transform: uppercase; letter-spacing: 0.5px; }
-        .summary-entry { margin-left: 16px; margin-bottom: 6px; }
-        .summary-total { margin-top: 24px; font-weight: bold; color: #dc3545; font-size: 1.1em; }
-        .summary-note { margin-top: 8px; color: #555; font-style: italic; }
-        footer { margin-top: 24px; font-size: 0.9em; color: #666; text-align: center; }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <h1>ACEestFitness and Gym</h1>
-        <p class="subtitle">Log your training, follow curated workout flows, and keep nutrition aligned.</p>
-        <!-- User Info -->
-        <div class="input-card" style="margin-bottom: 18px;">
-            <h2 class="section-title">📝 User Info</h2>
-            <form method="POST" action="{{ url_for('save_user_info') }}">
-                <label for="name">Name</label>
-                <input type="text" id="name" name="name" value="{{ user_info.get('name','') }}" placeholder="Your full name" required>
-
-                <label for="regn_id">Regn-ID</label>
-                <input type="text" id="regn_id" name="regn_id" value="{{ user_info.get('regn_id','') }}" placeholder="Membership / Registration ID" required>
-
-                <label for="age">Age</label>
-                <input type="number" id="age" name="age" min="1" value="{{ user_info.get('age','') }}" required>
-
-                <label for="gender">Gender (M/F)</label>
-                <select id="gender" name="gender" required>
-                    <option value="" {% if not user_info %}selected{% endif %} disabled>Select</option>
-                    <option value="M" {% if user_info.get('gender')=='M' %}selected{% endif %}>M</option>
-                    <option value="F" {% if user_info.get('gender')=='F' %}selected{% endif %}>F</option>
-                </select>
-
-                <label for="height">Height (cm)</label>
-                <input type="number" step="0.1" id="height" name="height" min="50" value="{{ user_info.get('height','') }}" required>
-
-                <label for="weight">Weight (kg)</label>
-                <input type="number" step="0.1" id="weight" name="weight" min="10" value="{{ user_info.get('weight','') }}" required>
-
-                <label for="weekly_cal_goal">Weekly Calorie Goal (kcal)</label>
-                <input type="number" id="weekly_cal_goal" name="weekly_cal_goal" min="0" value="{{ user_info.get('weekly_cal_goal', 2000) }}" required>
-
-                <button type="submit">Save Info</button>
-            </form>
-            {% if user_info %}
-                <div style="margin-top: 10px;">
-                    <div class="messages info">Saved. BMI={{ '%.1f'|format(user_info['bmi']) }}, BMR={{ '%.0f'|format(user_info['bmr']) }} kcal/day</div>
-                    <div style="margin-top: 8px;">
-                        <strong>Weekly Calories:</strong> {{ weekly_calories }} / {{ user_info.get('weekly_cal_goal', 2000) }} kcal
-                        <div style="height: 10px; background:#e9ecef; border-radius:6px; margin-top:6px;">
-                            <div style="height:10px; width: {{ weekly_progress_percent }}%; background: var(--color-secondary); border-radius:6px;"></div>
-                        </div>
-                    </div>
-                </div>
-            {% endif %}
-        </div>
-
-        <div class="tabs">
-            <div class="tab-nav">
-                <button type="button" class="tab-btn active" data-target="log-tab">🏋️ Log Workouts</button>
-                <button type="button" class="tab-btn" data-target="chart-tab">💡 Workout Plan</button>
-                <button type="button" class="tab-btn" data-target="diet-tab">🥗 Diet Guide</button>
-                <button type="button" class="tab-btn" data-target="progress-tab">📈 Progress Tracker</button>
-            </div>
-            <div id="log-tab" class="tab-panel active">
-                <div class="input-card">
-                    <h2 class="section-title">ACEest Session Logger</h2>
-                    <p class="section-subtitle">Track your progress with precision.</p>
-                    <form method="POST" action="{{ url_for('add_workout') }}">
-                        <label for="category">Select Category</label>
-                        <select id="category" name="category" required>
-                            {% for category in categories %}
-                                <option value="{{ category }}" {% if category == default_category %}selected{% endif %}>{{ category }}</option>
-                            {% endfor %}
-                        </select>
-
-                        <label for="workout">Exercise</label>
-                        <input type="text" id="workout" name="workout" placeholder="e.g. Interval Sprints" required>
-
-                        <label for="duration">Duration (minutes)</label>
-                        <input type="number" id="duration" name="duration" min="1" placeholder="e.g. 30" required>
-
-                        <label for="calories">Calories Burned</label>
-                        <input type="number" id="calories" name="calories" min="0" placeholder="e.g. 250" required>
-
-                        <button type="submit">✅ Add Session</button>
-                    </form>
-                    <div style="margin-top:16px;">
-                        <form method="POST" action="{{ url_for('add_workout_auto') }}">
-                            <label for="category_auto">Quick Add (Auto Calories via MET)</label>
-                            <select id="category_auto" name="category" required>
-                                {% for category in categories %}
-                                    <option value="{{ category }}" {% if category == default_category %}selected{% endif %}>{{ category }}</option>
-                                {% endfor %}
-                            </select>
-                            <label for="workout_auto">Exercise</label>
-                            <input type="text" id="workout_auto" name="workout" placeholder="e.g. Intervals" required>
-                            <label for="duration_auto">Duration (minutes)</label>
-                            <input type="number" id="duration_auto" name="duration" min="1" placeholder="e.g. 30" required>
-                            <button type="submit" style="background: var(--color-secondary);">⚡ Add with Auto Calories</button>
-                            <div class="summary-note">Uses your saved weight (or 70kg) and category MET to estimate calories.</div>
-                        </form>
-                    </div>
-                </div>
-
-                <div class="messages">
-                    {% with messages = get_flashed_messages(with_categories=true) %}
-                        {% if messages %}
-                            {% for category, msg in messages %}
-                                <div class="{{ category }}">{{ msg }}</div>
-                            {% endfor %}
-                        {% endif %}
-                    {% endwith %}
-                </div>
-
-                <div class="workout-list">
-                    <h2>Logged Workouts</h2>
-                    {% if total_sessions %}
-                        {% for category, sessions in workouts.items() %}
-                            <h3>{{ category }}</h3>
-                            {% if sessions %}
-                                {% for entry in sessions %}
-                                    <div class="workout-item">
-                                        <strong>{{ entry.workout }}</strong> - {{ entry.duration }} min, {{ entry.calories }} cal<br>
-                                        <small>Logged at {{ entry.timestamp }}</small>
-                                    </div>
-                                {% endfor %}
-                            {% else %}
-                                <p>No sessions recorded for this category.</p>
-                            {% endif %}
-                        {% endfor %}
-                    {% else %}
-                        <p>No workouts logged yet.</p>
-                    {% endif %}
-                </div>
-                <div class="actions">
-                    <a href="{{ url_for('summary') }}">View Summary</a>
-                    &nbsp;|&nbsp;
-                    <a href="{{ url_for('export_weekly_pdf') }}">📄 Export Weekly PDF Report</a>
-                </div>
-            </div>
-            <div id="chart-tab" class="tab-panel">
-                <h2 class="section-title">💡 Personalized Workout Plan Guide</h2>
-                <p class="section-subtitle">Structured flows to keep your sessions purposeful.</p>
-                {% for category, exercises in workout_chart.items() %}
-                    <div class="chart-group">
-                        <h3>{{ category }}</h3>
-                        <ul>
-                            {% for exercise in exercises %}
-                                <li>{{ exercise }}</li>
-                            {% endfor %}
-                        </ul>
-                    </div>
-                {% endfor %}
-            </div>
-            <div id="diet-tab" class="tab-panel">
-                <h2 class="section-title">🥗 Nutritional Goal Setting Guide</h2>
-                <p class="section-subtitle">Align your meals with the outcomes you’re chasing.</p>
-                {% for goal, foods in diet_plans.items() %}
-                    <div class="diet-group">
-                        <h3>{{ goal }}</h3>
-                        <ul>
-                            {% for item in foods %}
-                                <li>{{ item }}</li>
-                            {% endfor %}
-                        </ul>
-                    </div>
-                {% endfor %}
-            </div>
-            <div id="progress-tab" class="tab-panel">
-                <h2 class="section-title">📈 Personal Progress Tracker</h2>
-                <p class="progress-note">Visualization of your logged workout time distribution.</p>
-                <p id="progress-empty" class="empty-progress" {% if total_minutes %}style="display:none"{% endif %}>No workout data logged yet. Log a session to see your progress!</p>
-                <div class="chart-wrapper">
-                    <canvas id="durationBarChart" width="400" height="240"></canvas>
-                </div>
-                <div class="chart-wrapper">
-                    <canvas id="distributionPieChart" width="400" height="240"></canvas>
-                </div>
-                <p class="progress-summary" id="progress-summary" {% if not total_minutes %}style="display:none"{% endif %}>LIFETIME TOTAL: {{ total_minutes }} minutes logged across all categories.</p>
-            </div>
-        </div>
-        <footer>
-            Version: {{ version }}
-        </footer>
-    </div>
-    <script src="https://cdn.jsdelivr.net/npm/chart.js@4.4.2/dist/chart.umd.min.js"></script>
-    <script>
-    document.addEventListener('DOMContentLoaded', function () {
-        var buttons = document.querySelectorAll('.tab-btn');
-        var panels = document.querySelectorAll('.tab-panel');
-        buttons.forEach(function (btn) {
-            btn.addEventListener('click', function () {
-                buttons.forEach(function (item) { item.classList.remove('active'); });
-                panels.forEach(function (panel) { panel.classList.remove('active'); });
-                btn.classList.add('active');
-                var target = document.getElementById(btn.dataset.target);
-                if (target) {
-                    target.classList.add('active');
-                }
-            });
-        });
-
-        var totals = {{ progress_totals | tojson }};
-        var labels = Object.keys(totals);
-        var values = labels.map(function (key) { return totals[key]; });
-        var totalMinutes = values.reduce(function (acc, value) { return acc + value; }, 0);
-
-        var emptyMessage = document.getElementById('progress-empty');
-        var barCanvas = document.getElementById('durationBarChart');
-        var pieCanvas = document.getElementById('distributionPieChart');
-        var barWrapper = barCanvas ? barCanvas.parentElement : null;
-        var pieWrapper = pieCanvas ? pieCanvas.parentElement : null;
-        var summaryText = document.getElementById('progress-summary');
-
-        if (totalMinutes > 0 && window.Chart && barCanvas && pieCanvas) {
-            if (emptyMessage) {
-                emptyMessage.style.display = 'none';
-            }
-            if (barWrapper) {
-                barWrapper.style.display = 'block';
-            }
-            if (pieWrapper) {
-                pieWrapper.style.display = 'block';
-            }
-            if (summaryText) {
-                summaryText.style.display = 'block';
-                summaryText.textContent = 'LIFETIME TOTAL: ' + totalMinutes + ' minutes logged across all categories.';
-            }
-
-            var palette = ['#007bff', '#28a745', '#ffc107'];
-
-            var barContext = barCanvas.getContext('2d');
-            new Chart(barContext, {
-                type: 'bar',
-                data: {
-                    labels: labels,
-                    datasets: [{
-                        label: 'Minutes Logged',
-                        data: values,
-                        backgroundColor: palette,
-                    }]
-                },
-                options: {
-                    scales: {
-                        y: {
-                            beginAtZero: true,
-                            title: {
-                                display: true,
-                                text: 'Minutes'
-                            }
-                        }
-                    },
-                    plugins: {
-                        legend: {
-                            display: false
-                        }
-                    }
-                }
-            });
-
-            var pieContext = pieCanvas.getContext('2d');
-            new Chart(pieContext, {
-                type: 'pie',
-                data: {
-                    labels: labels,
-                    datasets: [{
-                        data: values,
-                        backgroundColor: palette,
-                    }]
-                },
-                options: {
-                    plugins: {
-                        legend: {
-                            position: 'bottom'
-                        }
-                    }
-                }
-            });
-        } else {
-            if (barCanvas) {
-                barCanvas.style.display = 'none';
-            }
-            if (pieCanvas) {
-                pieCanvas.style.display = 'none';
-            }
-            if (barWrapper) {
-                barWrapper.style.display = 'none';
-            }
-            if (pieWrapper) {
-                pieWrapper.style.display = 'none';
-            }
-            if (summaryText) {
-                summaryText.style.display = 'none';
-            }
-        }
-    });
-    </script>
-</body>
-</html>
-"""
-
-SUMMARY_TEMPLATE = """
-<!DOCTYPE html>
-<html lang='en'>
-<head>
-    <meta charset='UTF-8'>
-    <title>Workout Summary</title>
-    <style>
-        body { font-family: Arial, sans-serif; background: #eef1f4; margin: 0; padding: 0; }
-        .container { max-width: 700px; margin: 40px auto; background: #fff; padding: 32px; border-radius: 10px; box-shadow: 0 8px 22px rgba(44, 62, 80, 0.15); }
-        .summary-header { text-align: center; margin-bottom: 24px; }
-        .summary-header h1 { color: #2c3e50; margin-bottom: 8px; }
-        .summary-header p { color: #6c757d; margin: 0; }
-        .summary-category { color: #007bff; margin-top: 18px; margin-bottom: 8px; text-transform: uppercase; letter-spacing: 0.6px; font-weight: bold; }
-        .session { margin-bottom: 10px; padding-left: 18px; }
-        .session span { color: #6c757d; font-size: 0.9em; }
-        .empty { color: #777; font-style: italic; padding-left: 18px; }
-        .total { margin-top: 28px; font-weight: bold; color: #dc3545; font-size: 1.1em; }
-        .note { margin-top: 12px; font-style: italic; color: #555; }
-        a { display: inline-block; margin-top: 30px; color: #007bff; text-decoration: none; font-weight: bold; }
-        a:hover { text-decoration: underline; }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="summary-header">
-            <h1>📊 Weekly Session Summary</h1>
-            <p>Review your logged workouts by category.</p>
-        </div>
-        {% for category, sessions in workouts.items() %}
-            <div class="summary-category">{{ category }}</div>
-            {% if sessions %}
-                {% for entry in sessions %}
-                    <div class="session">{{ loop.index }}. {{ entry.workout }} - {{ entry.duration }} min ({{ entry.calories }} cal)
-                        <span>• Logged: {{ entry.timestamp.split(' ')[0] }}</span>
-                    </div>
-                {% endfor %}
-            {% else %}
-                <div class="empty">No sessions recorded.</div>
-            {% endif %}
-        {% endfor %}
-        <div class="total">Total Time Spent: {{ total_time }} minutes</div>
-        <div class="note">{{ motivation }}</div>
-        <a href="{{ url_for('index') }}">⬅️ Back to Tracker</a>
-    </div>
-</body>
-</html>
-"""
-
-@app.route('/', methods=['GET'])
+# Entries per category embedded in the home page, and the largest page
+# /workouts/more will return.
+HOME_LOG_SIZE = 20
+MAX_LOG_PAGE_SIZE = 200
+
+# Range of SQLite integers, which cursors are compared against.
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+# Largest batch accepted by POST /api/v1/members/<regn_id>/entries.
+MAX_BATCH_SIZE = 1000
+
+# Summary pagination (entries per category per page) and streaming chunk size
+# (template statements per write).
+SUMMARY_PAGE_SIZE = 500
+SUMMARY_MAX_PAGE_SIZE = 5000
+# Highest summary page; keeps the SQL OFFSET well within SQLite's int64.
+SUMMARY_MAX_PAGE = 2 ** 31 - 1
+STREAM_BUFFER = 64
+
+# Page templates live in src/templates/. TEMPLATES are the pages; FRAGMENTS
+# are constant blocks rendered once per app and spliced into every page.
+TEMPLATES = ('index.html', 'summary.html')
+FRAGMENTS = {
+    'chart_tab': ('_chart_tab.html', {'workout_chart': WORKOUT_CHART_DATA}),
+    'diet_tab': ('_diet_tab.html', {'diet_plans': DIET_PLANS}),
+}
+
+
+def render_fragments(app):
+    """Pre-render the FRAGMENTS (their data never changes at runtime)."""
+    return {
+        name: Markup(app.jinja_env.get_template(template).render(**context))
+        for name, (template, context) in FRAGMENTS.items()
+    }
+
+
+def stream_page(name, **context):
+    """Stream a template's output instead of building the page in memory.
+
+    Flask's stream_template yields once per template statement; buffering
+    STREAM_BUFFER of those per chunk keeps the number of writes sane.
+    """
+    app = current_app._get_current_object()
+    app.update_template_context(context)
+    stream = app.jinja_env.get_template(name).stream(context)
+    stream.enable_buffering(STREAM_BUFFER)
+    return app.response_class(stream_with_context(stream), mimetype='text/html')
+
+
+def get_store():
+    """The store of the app handling the current request."""
+    return current_app.extensions['aceest_store']
+
+
+def current_member():
+    """Regn-ID of the member using this browser session (guest until a profile is saved)."""
+    return session.get('regn_id', GUEST_MEMBER)
+
+
+def page_etag(member_id, version, *extra):
+    """Strong ETag for the current page (endpoint and query) of ``member_id`` at ``version``."""
+    key = repr((request.endpoint, request.query_string, member_id, os.environ.get('APP_VERSION', 'unknown')) + extra)
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).hexdigest()
+    return f"{get_store().epoch}-{version}-{digest}"
+
+
+def conditional_get(daily=False):
+    """Serve a member's page with ETag/Last-Modified built from their data version.
+
+    A request whose validators still match gets an empty 304 before the
+    view runs, so no template or aggregate is touched. The version is read
+    before the view reads the data, so a tag never claims newer data than
+    the body holds. ``daily`` pages (anything using "last 7 days") also
+    change at midnight, in both the ETag and Last-Modified. The member is the view's ``member_id`` argument
+    (API routes) or the session's. Pages carrying one-off flash messages
+    are never cached.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if session.get('_flashes'):
+                response = make_response(view(*args, **kwargs))
+                response.cache_control.no_store = True
+                return response
+            member_id = kwargs.get('member_id', current_member())
+            version, modified = get_store().data_version(member_id)
+            extra = ()
+            if daily:
+                today = datetime.now().date()
+                extra = (today.isoformat(),)
+                # A client revalidating by date alone must not keep yesterday's page.
+                modified = max(modified or 0, datetime.combine(today, datetime.min.time()).timestamp())
+            etag = page_etag(member_id, version, *extra)
+            last_modified = datetime.fromtimestamp(modified, timezone.utc) if modified else None
+            if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
+
+
+def weekly_progress(view, today=None):
+    """(calories in the last 7 days, weekly goal, percent of goal reached) for a MemberView."""
+    weekly_calories = view.aggregates.weekly_calories(today or datetime.now().date())
+    goal = view.profile.get('weekly_cal_goal', 2000) if view.profile else 2000
+    weekly_progress_percent = min(100, int((weekly_calories / goal) * 100)) if goal else 0
+    return weekly_calories, goal, weekly_progress_percent
+
+
+@conditional_get(daily=True)
 def index():
     version = os.environ.get('APP_VERSION', 'unknown')
-    total_sessions = sum(len(sessions) for sessions in workouts.values())
-    progress_totals = {category: sum(entry['duration'] for entry in sessions) for category, sessions in workouts.items()}
-    total_minutes = sum(progress_totals.values())
+    # Only the newest entries of each category are embedded; older ones are
+    # fetched page by page from /workouts/more.
+    view = get_store().read_recent(current_member(), HOME_LOG_SIZE)
+    workouts = view.workouts
+    user_info = view.profile
+    aggregates = view.aggregates
+    total_sessions = aggregates.total_sessions
+    progress_totals = aggregates.progress_totals()
+    total_minutes = aggregates.total_minutes
     # Weekly calories progress (last 7 days including today)
-    weekly_calories = 0
-    try:
-        today = datetime.now().date()
-        week_start = today - timedelta(days=6)
-        for cat, sessions in workouts.items():
-            for entry in sessions:
-                try:
-                    d = datetime.strptime(entry['timestamp'], "%Y-%m-%d %H:%M:%S").date()
-                except Exception:
-                    # Fallback: ignore malformed timestamps
-                    continue
-                if d >= week_start:
-                    weekly_calories += int(entry.get('calories', 0))
-    except Exception:
-        weekly_calories = 0
-    goal = user_info.get('weekly_cal_goal', 2000) if user_info else 2000
-    weekly_progress_percent = min(100, int((weekly_calories / goal) * 100)) if goal else 0
-    return render_template_string(
-        HTML_TEMPLATE,
+    weekly_calories, goal, weekly_progress_percent = weekly_progress(view)
+    fragments = current_app.extensions['aceest_fragments']
+    return render_template(
+        'index.html',
         workouts=workouts,
         categories=CATEGORIES,
         default_category="Workout",
         total_sessions=total_sessions,
+        session_counts=aggregates.sessions,
         version=version,
-        workout_chart=WORKOUT_CHART_DATA,
-        diet_plans=DIET_PLANS,
+        chart_tab=fragments['chart_tab'],
+        diet_tab=fragments['diet_tab'],
         progress_totals=progress_totals,
         total_minutes=total_minutes,
         user_info=user_info,
@@ -506,7 +220,271 @@ def index():
         weekly_progress_percent=weekly_progress_percent,
     )
 
-@app.route('/add', methods=['POST'])
+@conditional_get()
+def more_workouts():
+    """Next page of one category's log for the home page's "load more" button.
+
+    ``before`` is the cursor of the last entry shown; returns the rendered
+    entries and the cursor to continue from (null once the log is exhausted).
+    """
+    category = request.args.get('category')
+    before = parse_cursor(request.args.get('before'))
+    if category not in CATEGORIES or before is None:
+        return jsonify(error="category and a valid before cursor are required"), 400
+    limit = min(max(request.args.get('limit', HOME_LOG_SIZE, type=int), 1), MAX_LOG_PAGE_SIZE)
+    entries = get_store().workouts_before(current_member(), category, before, limit + 1)
+    next_cursor = make_cursor(entries[limit - 1]) if len(entries) > limit else None
+    html = render_template('_workout_items.html', entries=entries[:limit])
+    return jsonify(html=html, next=next_cursor)
+
+
+# ----- JSON API (v1) -----
+#
+# Reads return the same numbers as the HTML pages, serialized straight from
+# the store's views with no template rendering. They carry the same ETag and
+# Last-Modified validators as the pages, so pollers mostly get 304s. Writes
+# take whole batches and answer 201 with the new ids instead of a redirect.
+
+def entry_json(entry):
+    return {
+        'id': entry.id,
+        'category': entry.category,
+        'workout': entry.workout,
+        'duration': entry.duration,
+        'calories': entry.calories,
+        'ts': entry.ts,
+        'timestamp': entry.timestamp,
+    }
+
+
+@conditional_get()
+def api_profile(member_id):
+    profile = get_store().get_profile(member_id)
+    if not profile:
+        return jsonify(error="no profile saved for this member"), 404
+    return jsonify(profile)
+
+
+@conditional_get()
+def api_entries(member_id):
+    """Entries newest first; ``category`` filters, ``before``/``next`` page like /workouts/more."""
+    categories = request.args.getlist('category') or list(CATEGORIES)
+    if any(category not in CATEGORIES for category in categories):
+        return jsonify(error=f"category must be one of {', '.join(CATEGORIES)}"), 400
+    before = request.args.get('before')
+    if before is not None and parse_cursor(before) is None:
+        return jsonify(error="invalid before cursor"), 400
+    limit = min(max(request.args.get('limit', HOME_LOG_SIZE, type=int), 1), MAX_LOG_PAGE_SIZE)
+    store = get_store()
+    if before is None:
+        view = store.read_recent(member_id, limit + 1)
+        pages = [view.workouts[category] for category in categories]
+    else:
+        pages = [store.workouts_before(member_id, category, parse_cursor(before), limit + 1)
+                 for category in categories]
+    entries = heapq.nlargest(limit + 1, itertools.chain.from_iterable(pages), key=entry_position)
+    next_cursor = make_cursor(entries[limit - 1]) if len(entries) > limit else None
+    return jsonify(entries=[entry_json(entry) for entry in entries[:limit]], next=next_cursor)
+
+
+@conditional_get()
+def api_totals(member_id):
+    aggregates = get_store().aggregates(member_id)
+    return jsonify(
+        sessions=aggregates.sessions,
+        minutes=aggregates.progress_totals(),
+        total_sessions=aggregates.total_sessions,
+        total_minutes=aggregates.total_minutes,
+    )
+
+
+@conditional_get(daily=True)
+def api_progress(member_id):
+    view = get_store().read_recent(member_id, 0)  # profile and aggregates, no entries
+    weekly_calories, goal, percent = weekly_progress(view)
+    return jsonify(
+        weekly_calories=weekly_calories,
+        weekly_cal_goal=goal,
+        weekly_progress_percent=percent,
+        progress_totals=view.aggregates.progress_totals(),
+    )
+
+
+def api_add_entries(member_id):
+    """Log a batch of entries: all valid and applied together (201), or none (422).
+
+    The body is a JSON array of entry objects, or ``{"entries": [...]}``;
+    see ingest.entry_from_record for the fields. Calories left out are
+    estimated from MET_VALUES and the member's saved weight.
+    """
+    body = request.get_json(silent=True)
+    records = body.get('entries') if isinstance(body, dict) else body
+    if not isinstance(records, list) or not records:
+        return jsonify(error="expected a non-empty JSON array of entries"), 400
+    if len(records) > MAX_BATCH_SIZE:
+        return jsonify(error=f"at most {MAX_BATCH_SIZE} entries per batch"), 413
+    store = get_store()
+    weight = store.get_profile(member_id).get('weight', DEFAULT_WEIGHT_KG)
+    try:
+        entries = entries_from_records(records, weight)
+    except ValidationError as exc:
+        errors = [{'index': index, 'error': message} for index, message in exc.errors.items()]
+        return jsonify(error=str(exc), errors=errors), 422
+    store.add_workouts(member_id, entries)
+    return jsonify(
+        count=len(entries),
+        results=[{'id': entry.id, 'calories': entry.calories} for entry in entries],
+    ), 201
+
+
+def api_import():
+    """Bulk-load workout history from CSV or NDJSON, parsed as it streams in.
+
+    The body is the file itself (Content-Type text/csv or
+    application/x-ndjson) or a multipart upload in field ``file``;
+    ``?format=`` overrides the type (``npz`` restores an npz export). Rows
+    name their member in ``regn_id``, defaulting to ``?regn_id=``. Answers
+    with the import report; invalid rows are listed there and skipped.
+    """
+    upload = request.files.get('file')
+    if upload is not None:
+        stream, fmt = upload.stream, detect_format(upload.filename, upload.mimetype)
+    else:
+        stream, fmt = request.stream, detect_format(mimetype=request.mimetype)
+    fmt = request.args.get('format', fmt)
+    if fmt not in BULK_FORMATS:
+        return jsonify(error=f"format must be one of {', '.join(BULK_FORMATS)}"), 400
+    report = import_stream(get_store(), stream, fmt, request.args.get('regn_id'))
+    return jsonify(report.as_dict()), 400 if report.error else 200
+
+
+def api_export():
+    """Stream the workout log as CSV or NDJSON (``?format=``, default csv), or send it as npz.
+
+    Filters: ``regn_id``, ``category`` (repeatable) and inclusive ``start``
+    / ``end`` dates. Rows are formatted and sent in chunks as the store
+    yields them, so the export never sits in memory whole.
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in BULK_FORMATS:
+        return jsonify(error=f"format must be one of {', '.join(BULK_FORMATS)}"), 400
+    categories = request.args.getlist('category') or None
+    if categories and any(category not in CATEGORIES for category in categories):
+        return jsonify(error=f"category must be one of {', '.join(CATEGORIES)}"), 400
+    try:
+        start_ts, end_ts = day_bounds(request.args.get('start'), request.args.get('end'))
+    except ValueError:
+        return jsonify(error="start and end must look like 2025-01-06"), 400
+    if fmt == 'npz':
+        # Typed columns need a seekable zip file, so this one is built first.
+        spool = tempfile.SpooledTemporaryFile(SPOOL_MAX_SIZE)
+        export_npz(get_store(), spool, request.args.get('regn_id'), categories, start_ts, end_ts)
+        spool.seek(0)
+        return send_file(spool, mimetype=BULK_MIMETYPES[fmt], as_attachment=True,
+                         download_name='aceest-workouts.npz')
+    rows = get_store().export_workouts(request.args.get('regn_id'), categories, start_ts, end_ts)
+    response = current_app.response_class(export_chunks(rows, fmt), mimetype=BULK_MIMETYPES[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="aceest-workouts.{fmt}"'
+    return response
+
+
+def api_batch_reports():
+    """Every member's weekly PDF report in one streamed ZIP (``regn_id`` repeatable to pick some).
+
+    The reports are rendered across ACEEST_BATCH_PROCESSES processes (one
+    per core by default); the ZIP ends with a summary.json of the run. Only
+    one batch runs at a time across the workers sharing the report cache:
+    503 while another is being sent.
+    """
+    lock = try_batch_lock(os.path.join(current_app.config['ACEEST_REPORT_CACHE_DIR'], BATCH_LOCK_NAME))
+    if lock is None:
+        return jsonify(error="another batch of reports is being rendered"), 503, {'Retry-After': '60'}
+    store = get_store()
+    member_ids = request.args.getlist('regn_id') or None
+    chunks = zip_chunks(store, member_ids, current_app.config['ACEEST_BATCH_PROCESSES'] or None,
+                        chart_dir=current_app.extensions['aceest_charts'].directory)
+    response = current_app.response_class(chunks, mimetype='application/zip')
+    response.call_on_close(lock.close)
+    filename = f"aceest-weekly-reports-{datetime.now().date().isoformat()}.zip"
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def report_json(member_id, report_id, job):
+    body = {
+        'id': report_id,
+        'status': job.status,
+        'status_url': url_for('api_report_status', member_id=member_id, report_id=report_id),
+    }
+    if job.status == REPORT_DONE:
+        body['download_url'] = url_for('api_report_pdf', member_id=member_id, report_id=report_id)
+    if job.error:
+        body['error'] = job.error
+    return body
+
+
+def api_request_report(member_id):
+    """Ask for the member's current PDF report: 200 if it is cached, else 202 and a job to poll."""
+    if not get_store().get_profile(member_id):
+        return jsonify(error="no profile saved for this member"), 404
+    try:
+        report_id, job = request_report(member_id)
+    except ReportQueueFull:
+        return jsonify(error="report queue is full"), 503, {'Retry-After': '30'}
+    body = report_json(member_id, report_id, job)
+    if job.status == REPORT_DONE:
+        return jsonify(body), 200
+    return jsonify(body), 202, {'Location': body['status_url']}
+
+
+def api_report_status(member_id, report_id):
+    """Job status of one report.
+
+    Jobs live in the worker process that queued them; a poll landing on
+    another worker finds the report in the shared cache once it is done,
+    or queues the same report there if it is still the current one.
+    """
+    job = current_app.extensions['aceest_reports'].status(report_key(member_id, report_id))
+    if job is None and get_store().get_profile(member_id) and current_report(member_id)[0] == report_id:
+        try:
+            job = request_report(member_id)[1]
+        except ReportQueueFull:
+            return jsonify(error="report queue is full"), 503, {'Retry-After': '30'}
+    if job is None:
+        return jsonify(error="unknown or outdated report; request a new one"), 404
+    return jsonify(report_json(member_id, report_id, job))
+
+
+def api_report_pdf(member_id, report_id):
+    """A finished report. Its content never changes, so clients may cache it."""
+    report = current_app.extensions['aceest_reports'].cache.open(report_key(member_id, report_id))
+    if report is None:
+        return jsonify(error="report is not ready"), 404
+    return send_file(report, mimetype='application/pdf', download_name=f"report-{report_id}.pdf",
+                     etag=report_id, max_age=REPORT_MAX_AGE, conditional=True)
+
+
+def make_cursor(entry):
+    """Opaque position of an entry in the recent-first listings."""
+    ts, entry_id = entry_position(entry)
+    return f"{ts}.{entry_id}"
+
+
+def parse_cursor(value):
+    """(ts, id) from make_cursor() output, or None if it is malformed.
+
+    Both parts must fit SQLite's 64-bit integers.
+    """
+    try:
+        ts, entry_id = (value or '').split('.')
+        cursor = int(ts), int(entry_id)
+    except ValueError:
+        return None
+    if not all(INT64_MIN <= part <= INT64_MAX for part in cursor):
+        return None
+    return cursor
+
+
 def add_workout():
     workout = request.form.get('workout')
     duration = request.form.get('duration')
@@ -536,22 +514,15 @@ def add_workout():
         flash("Calories cannot be negative.", "error")
         return redirect(url_for('index'))
 
-    entry = {
-        'workout': workout.strip(),
-        'duration': duration,
-        'calories': calories,
-        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-    }
-    workouts[category].append(entry)
-    # Track daily workouts (parity with Tkinter)
-    today_iso = datetime.now().date().isoformat()
-    if today_iso not in daily_workouts:
-        daily_workouts[today_iso] = {c: [] for c in CATEGORIES}
-    daily_workouts[today_iso][category].append(entry)
-    flash(f"✅ Added {entry['workout']} ({duration} min) to {category}.", "info")
+    if duration > MAX_ENTRY_VALUE or calories > MAX_ENTRY_VALUE:
+        flash("Duration and calories are too large.", "error")
+        return redirect(url_for('index'))
+
+    entry = WorkoutEntry.create(category, workout.strip(), duration, calories)
+    get_store().add_workout(current_member(), entry)
+    flash(f"✅ Added {entry.workout} ({duration} min) to {category}.", "info")
     return redirect(url_for('index'))
 
-@app.route('/add-auto', methods=['POST'])
 def add_workout_auto():
     """Add a workout with calories auto-calculated from MET and user weight."""
     workout = request.form.get('workout')
@@ -577,27 +548,33 @@ def add_workout_auto():
         return redirect(url_for('index'))
 
     # Compute calories via MET formula
-    weight = (user_info or {}).get('weight', 70)
-    met = MET_VALUES.get(category, 5)
-    calories = int(round((met * 3.5 * float(weight) / 200.0) * duration))
-
-    entry = {
-        'workout': workout.strip(),
-        'duration': duration,
-        'calories': calories,
-        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-    }
-    workouts[category].append(entry)
-    today_iso = datetime.now().date().isoformat()
-    if today_iso not in daily_workouts:
-        daily_workouts[today_iso] = {c: [] for c in CATEGORIES}
-    daily_workouts[today_iso][category].append(entry)
-    flash(f"✅ Added {entry['workout']} ({duration} min, ~{calories} kcal) to {category}.", "info")
+    member_id = current_member()
+    weight = get_store().get_profile(member_id).get('weight', DEFAULT_WEIGHT_KG)
+    calories = met_calories(category, duration, weight)
+
+    if duration > MAX_ENTRY_VALUE or calories > MAX_ENTRY_VALUE:
+        flash("Duration and calories are too large.", "error")
+        return redirect(url_for('index'))
+
+    entry = WorkoutEntry.create(category, workout.strip(), duration, calories)
+    get_store().add_workout(member_id, entry)
+    flash(f"✅ Added {entry.workout} ({duration} min, ~{calories} kcal) to {category}.", "info")
     return redirect(url_for('index'))
 
-@app.route('/summary', methods=['GET'])
+@conditional_get()
 def summary():
-    total_time = sum(entry['duration'] for sessions in workouts.values() for entry in sessions)
+    """Workout summary, paginated per category and streamed as it renders.
+
+    ``page`` (from 1 to SUMMARY_MAX_PAGE) and ``per_page`` (up to
+    SUMMARY_MAX_PAGE_SIZE) select the same window of every category's log;
+    only that window is read.
+    """
+    per_page = min(max(request.args.get('per_page', SUMMARY_PAGE_SIZE, type=int), 1), SUMMARY_MAX_PAGE_SIZE)
+    page = min(max(request.args.get('page', 1, type=int), 1), SUMMARY_MAX_PAGE)
+    offset = (page - 1) * per_page
+    view = get_store().read_page(current_member(), offset, per_page)
+    workouts = view.workouts
+    total_time = view.aggregates.total_minutes
     if total_time < 30:
         motivation = "Good start! Keep moving 💪"
     elif total_time < 60:
@@ -605,15 +582,20 @@ def summary():
     else:
         motivation = "Excellent dedication! Keep up the great work 🏆"
 
-    return render_template_string(
-        SUMMARY_TEMPLATE,
+    longest = max(view.aggregates.sessions.values(), default=0)
+    return stream_page(
+        'summary.html',
         workouts=workouts,
+        session_counts=view.aggregates.sessions,
+        offset=offset,
+        page=page,
+        per_page=per_page,
+        has_next=offset + per_page < longest,
         total_time=total_time,
         motivation=motivation,
     )
 
 
-@app.route('/user/save', methods=['POST'])
 def save_user_info():
     """Save user info and compute BMI/BMR (mimics Tkinter behavior)."""
     try:
@@ -631,8 +613,7 @@ def save_user_info():
             bmr = 10 * weight_kg + 6.25 * height_cm - 5 * age + 5
         else:
             bmr = 10 * weight_kg + 6.25 * height_cm - 5 * age - 161
-        user_info.clear()
-        user_info.update({
+        get_store().save_profile(regn_id, {
             "name": name,
             "regn_id": regn_id,
             "age": age,
@@ -643,51 +624,290 @@ def save_user_info():
             "bmr": bmr,
             "weekly_cal_goal": weekly_cal_goal,
         })
+        # Later requests from this browser read and write this member's shard.
+        session['regn_id'] = regn_id
         flash(f"User info saved! BMI={bmi:.1f}, BMR={bmr:.0f} kcal/day", "info")
     except Exception as e:
         flash(f"Invalid input: {e}", "error")
     return redirect(url_for('index'))
 
 
-@app.route('/export/pdf', methods=['GET'])
+def render_pdf_report(user_info, workouts, totals, chart_cache=None, charts_key=None):
+    """Write the weekly report for one member; returns a spooled file positioned at 0.
+
+    ``workouts`` maps each category to an iterable of its entries. They are
+    read one page at a time, so the report can have any number of pages.
+    ``totals`` (a ReportTotals) fills the summary lines and the charts,
+    which come from ``chart_cache`` under ``charts_key`` once drawn.
+    """
+    charts = report_charts(totals.lifetime['minutes'], totals.daily_calories, totals.today, chart_cache, charts_key)
+    rows = (report_row(category, entry) for category, entries in workouts.items() for entry in entries)
+    out = spooled_pdf()
+    write_weekly_report(out, user_info, report_lines(user_info, totals.week, totals.lifetime), rows, charts)
+    out.seek(0)
+    return out
+
+
+def render_member_report(store, member_id, today, chart_cache=None, version=None):
+    """Render a member's report straight from the store (runs on the report pool).
+
+    Rows, totals and charts all come from one store.read() snapshot. If
+    ``version`` is given (the version the report was requested, and is
+    keyed, at) and the snapshot is newer, raises ReportOutdated instead.
+    """
+    view = store.read(member_id)
+    if version is not None and view.version != version:
+        raise ReportOutdated("the member's data changed; request the report again")
+    totals = ReportTotals(today)
+    for category, entries in view.workouts.items():
+        for entry in entries:
+            totals.add(category, entry)
+    return render_pdf_report(dict(view.profile), view.workouts, totals, chart_cache,
+                             chart_key(store.epoch, member_id, view.version, today))
+
+
+def report_key(member_id, report_id, store=None):
+    """ReportCache key of one member's report ``report_id`` in ``store`` (default: the current one)."""
+    return (store or get_store()).epoch, member_id, report_id
+
+
+def make_report_id(version, today):
+    """Reports cover the "last 7 days", so they are identified by data version and day."""
+    return f"{version}-{today.isoformat()}"
+
+
+def current_report(member_id):
+    """(report_id, version, today) of the report on the member's current data."""
+    version, _ = get_store().data_version(member_id)
+    today = datetime.now().date()
+    return make_report_id(version, today), version, today
+
+
+def request_report(member_id):
+    """Find or queue the report for the member's current data: (report_id, job).
+
+    Raises ReportQueueFull when the pool is saturated.
+    """
+    store = get_store()
+    report_id, version, today = current_report(member_id)
+    jobs = current_app.extensions['aceest_reports']
+    charts = current_app.extensions['aceest_charts']
+    return report_id, jobs.submit(report_key(member_id, report_id), store, member_id, today, charts, version)
+
+
+def prerender_members(app, start_ts, end_ts):
+    """Members who trained in [start_ts, end_ts): their reports are pre-rendered."""
+    return app.extensions['aceest_store'].active_members(start_ts, end_ts)
+
+
+def prerender_report(app, member_id, today):
+    """Render a member's report for ``today`` into the cache unless it is there; returns whether it rendered."""
+    store = app.extensions['aceest_store']
+    if not store.get_profile(member_id):
+        return False
+    version, _ = store.data_version(member_id)
+    key = report_key(member_id, make_report_id(version, today), store)
+    cache = app.extensions['aceest_reports'].cache
+    if key in cache:
+        return False
+    try:
+        report = render_member_report(store, member_id, today, app.extensions['aceest_charts'], version)
+    except ReportOutdated:
+        return False  # logged meanwhile; the member's next download renders it
+    try:
+        cache.put(key, report)
+    finally:
+        report.close()
+    return True
+
+
+@conditional_get(daily=True)
 def export_weekly_pdf():
-    """Export a simple PDF report of all logged workouts and user info."""
+    """Download the PDF report of all logged workouts and user info.
+
+    Served from the report cache; on a miss the report is rendered on the
+    background pool and this request waits up to ACEEST_REPORT_WAIT seconds
+    for it before asking the member to come back.
+    """
+    member_id = current_member()
+    user_info = get_store().get_profile(member_id)
     if not user_info:
         flash("Please save user info first!", "error")
         return redirect(url_for('index'))
 
-    buffer = io.BytesIO()
-    c = pdf_canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(50, height - 50, f"Weekly Fitness Report - {user_info['name']}")
-
-    # User info block
-    c.setFont("Helvetica", 11)
-    c.drawString(50, height - 80, f"Regn-ID: {user_info['regn_id']} | Age: {user_info['age']} | Gender: {user_info['gender']}")
-    c.drawString(50, height - 100, f"Height: {user_info['height']} cm | Weight: {user_info['weight']} kg | BMI: {user_info['bmi']:.1f} | BMR: {user_info['bmr']:.0f} kcal/day")
-
-    # Table of workouts
-    y = height - 140
-    table_data = [["Category", "Exercise", "Duration(min)", "Calories(kcal)", "Date"]]
-    for cat, sessions in workouts.items():
-        for e in sessions:
-            date_str = (e.get('timestamp') or '').split(' ')[0]
-            table_data.append([cat, e.get('workout', ''), str(e.get('duration', '')), str(e.get('calories', '')), date_str])
-    table = Table(table_data, colWidths=[80, 150, 100, 100, 80])
-    table.setStyle(TableStyle([
-        ("BACKGROUND", (0, 0), (-1, 0), rl_colors.lightblue),
-        ("GRID", (0, 0), (-1, -1), 0.5, rl_colors.black),
-    ]))
-    table.wrapOn(c, width - 100, y)
-    table.drawOn(c, 50, max(40, y - 20 - 18 * len(table_data)))
-
-    c.showPage()
-    c.save()
-    buffer.seek(0)
-
+    try:
+        report_id, job = request_report(member_id)
+    except ReportQueueFull:
+        flash("Reports are busy right now, please try again in a minute.", "error")
+        return redirect(url_for('index'))
+    if not job.wait(current_app.config['ACEEST_REPORT_WAIT']):
+        flash("Your report is being prepared; download it again in a moment.", "info")
+        return redirect(url_for('index'))
+    report = current_app.extensions['aceest_reports'].cache.open(report_key(member_id, report_id))
+    if report is None:
+        flash("The report could not be generated, please try again.", "error")
+        return redirect(url_for('index'))
     filename = f"{user_info['name'].replace(' ', '_')}_weekly_report.pdf"
-    return send_file(buffer, as_attachment=True, download_name=filename, mimetype='application/pdf')
+    return send_file(report, as_attachment=True, download_name=filename, mimetype='application/pdf')
+
+
+def healthz():
+    """Liveness: the process is up and serving requests."""
+    return "ok", 200, {'Content-Type': 'text/plain', 'Cache-Control': 'no-store'}
+
+
+def readyz():
+    """Readiness: 200 once warm_up() has run, 503 until then.
+
+    If nothing warmed the app at startup, the first probe does it, so a pod
+    is only put behind the Service after the warm-up has finished.
+    """
+    headers = {'Content-Type': 'text/plain', 'Cache-Control': 'no-store'}
+    if not current_app.extensions['aceest_ready'].is_set():
+        try:
+            warm_up(current_app)
+        except Exception:
+            current_app.logger.exception("warm-up failed")
+            return "warming up", 503, headers
+    return "ready", 200, headers
+
+
+# Stand-in profile for the warm-up PDF render.
+WARMUP_PROFILE = {
+    'name': 'Warm-up', 'regn_id': GUEST_MEMBER, 'age': 0, 'gender': '-',
+    'height': 0, 'weight': 0, 'bmi': 0.0, 'bmr': 0.0,
+}
+
+# Browser cache lifetime of a finished report download (its URL is versioned).
+REPORT_MAX_AGE = 24 * 3600
+
+# Modules only some requests need; imported on first use, or up front by warm_up().
+HEAVY_MODULES = (
+    'reportlab.pdfgen.canvas',
+    'reportlab.lib.pagesizes',
+    'reportlab.platypus',
+    'reportlab.lib.colors',
+    'reportlab.graphics.renderPDF',
+    'reportlab.graphics.charts.barcharts',
+    'reportlab.graphics.charts.linecharts',
+)
+
+
+def warm_up(app):
+    """Pay the first-request costs up front, then mark the app ready.
+
+    Imports the lazily loaded modules, compiles the page templates, reads
+    the persisted state (journal replay, which also fills the memory store's
+    columnar mirror, already ran when the store was opened; this opens the
+    SQLite connection without loading the whole log) and renders a
+    throwaway PDF. Runs at startup when ACEEST_WARMUP=1 (once
+    in the preloading master under gunicorn), otherwise on the first /readyz.
+    """
+    with app.extensions['aceest_warmup_lock']:
+        if app.extensions['aceest_ready'].is_set():
+            return
+        for name in HEAVY_MODULES:
+            importlib.import_module(name)
+        for name in TEMPLATES:
+            app.jinja_env.get_template(name)
+        store = app.extensions['aceest_store']
+        store.read(GUEST_MEMBER)
+        empty = {category: [] for category in CATEGORIES}
+        render_pdf_report(WARMUP_PROFILE, empty, ReportTotals(datetime.now().date()))
+        app.extensions['aceest_ready'].set()
+
+
+def create_app(config=None):
+    """Build the Flask app.
+
+    ``config`` overrides app.config. ACEEST_STORE, ACEEST_DB_PATH and
+    ACEEST_JOURNAL_DIR select the store and default to the environment.
+    Everything built here is read-only after startup except the store, so
+    with ``gunicorn --preload`` the workers share it copy-on-write; anything
+    that must be private to a worker goes in ``worker_init`` hooks.
+    """
+    app = Flask(__name__)
+    app.config.update(
+        SECRET_KEY=os.environ.get("FLASK_SECRET_KEY", "aceest-dev-secret"),
+        ACEEST_STORE=None,
+        ACEEST_DB_PATH=None,
+        ACEEST_JOURNAL_DIR=None,
+        ACEEST_TEMPLATE_CACHE_DIR=os.environ.get('ACEEST_TEMPLATE_CACHE_DIR'),
+        ACEEST_WARMUP=os.environ.get('ACEEST_WARMUP', '') == '1',
+        ACEEST_REPORT_CACHE_DIR=default_cache_dir(),
+        ACEEST_REPORT_WORKERS=int(os.environ.get('ACEEST_REPORT_WORKERS', '2')),
+        ACEEST_REPORT_WAIT=float(os.environ.get('ACEEST_REPORT_WAIT', '10')),
+        ACEEST_REPORT_CACHE_SIZE=int(os.environ.get('ACEEST_REPORT_CACHE_SIZE', str(REPORT_CACHE_SIZE))),
+        ACEEST_BATCH_PROCESSES=int(os.environ.get('ACEEST_BATCH_PROCESSES', '0')),
+        ACEEST_PRERENDER=os.environ.get('ACEEST_PRERENDER', '') == '1',
+        ACEEST_PRERENDER_HOURS=os.environ.get('ACEEST_PRERENDER_HOURS', '1-6'),
+    )
+    app.config.update(config or {})
+    app.add_url_rule('/', view_func=index, methods=['GET'])
+    app.add_url_rule('/add', view_func=add_workout, methods=['POST'])
+    app.add_url_rule('/add-auto', view_func=add_workout_auto, methods=['POST'])
+    app.add_url_rule('/workouts/more', view_func=more_workouts, methods=['GET'])
+    app.add_url_rule('/summary', view_func=summary, methods=['GET'])
+    app.add_url_rule('/user/save', view_func=save_user_info, methods=['POST'])
+    app.add_url_rule('/export/pdf', view_func=export_weekly_pdf, methods=['GET'])
+    app.add_url_rule('/api/v1/members/<member_id>/profile', view_func=api_profile, methods=['GET'])
+    app.add_url_rule('/api/v1/members/<member_id>/entries', view_func=api_entries, methods=['GET'])
+    app.add_url_rule('/api/v1/members/<member_id>/entries', view_func=api_add_entries, methods=['POST'])
+    app.add_url_rule('/api/v1/members/<member_id>/totals', view_func=api_totals, methods=['GET'])
+    app.add_url_rule('/api/v1/members/<member_id>/progress', view_func=api_progress, methods=['GET'])
+    app.add_url_rule('/api/v1/members/<member_id>/reports', view_func=api_request_report, methods=['POST'])
+    app.add_url_rule('/api/v1/members/<member_id>/reports/<report_id>', view_func=api_report_status,
+                     methods=['GET'])
+    app.add_url_rule('/api/v1/members/<member_id>/reports/<report_id>/pdf', view_func=api_report_pdf,
+                     methods=['GET'])
+    app.add_url_rule('/api/v1/reports/weekly.zip', view_func=api_batch_reports, methods=['GET'])
+    app.add_url_rule('/api/v1/import', view_func=api_import, methods=['POST'])
+    app.add_url_rule('/api/v1/export', view_func=api_export, methods=['GET'])
+    app.add_url_rule('/healthz', view_func=healthz, methods=['GET'])
+    app.add_url_rule('/readyz', view_func=readyz, methods=['GET'])
+
+    # Workouts, aggregates and member profiles live in the store
+    # (in-memory by default, SQLite when ACEEST_STORE=sqlite).
+    store = create_store(app.config['ACEEST_STORE'], app.config['ACEEST_DB_PATH'], app.config['ACEEST_JOURNAL_DIR'])
+    atexit.register(store.close)
+    app.extensions['aceest_store'] = store
+    # PDF reports render on a small per-process pool into a cache on disk.
+    reports = ReportJobs(
+        ReportCache(app.config['ACEEST_REPORT_CACHE_DIR'], app.config['ACEEST_REPORT_CACHE_SIZE']),
+        render_member_report, workers=app.config['ACEEST_REPORT_WORKERS'])
+    app.extensions['aceest_reports'] = reports
+    app.extensions['aceest_charts'] = ChartCache(os.path.join(app.config['ACEEST_REPORT_CACHE_DIR'], 'charts'))
+    # Last week's reports are rendered early on Monday, before members ask.
+    prerender = WeeklyPrerender(
+        functools.partial(prerender_members, app), functools.partial(prerender_report, app),
+        os.path.join(app.config['ACEEST_REPORT_CACHE_DIR'], PRERENDER_LOCK),
+        hours=parse_hours(app.config['ACEEST_PRERENDER_HOURS']), logger=app.logger)
+    app.extensions['aceest_prerender'] = prerender
+    if app.config['ACEEST_PRERENDER']:
+        # Started by a worker's first request, never in a preloading master.
+        app.before_request(prerender.start)
+    app.extensions['aceest_worker_init'] = [store.after_fork, reports.after_fork, prerender.after_fork]
+    # Compiled templates are kept by Jinja per process; the bytecode cache
+    # lets new workers and restarts skip compiling them again.
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['ACEEST_TEMPLATE_CACHE_DIR'])
+    app.add_template_global(make_cursor)
+    app.extensions['aceest_fragments'] = render_fragments(app)
+    app.extensions['aceest_ready'] = threading.Event()
+    app.extensions['aceest_warmup_lock'] = threading.Lock()
+    if app.config['ACEEST_WARMUP']:
+        warm_up(app)
+    return app
+
+
+def init_worker(app):
+    """Run the app's per-worker hooks; gunicorn calls this after forking each worker."""
+    for hook in app.extensions['aceest_worker_init']:
+        hook()
+
+
+# `src.app:app` for gunicorn and `flask run`; `store` is its store.
+app = create_app()
+store = app.extensions['aceest_store']
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
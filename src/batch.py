@@ -0,0 +1,273 @@
+# Gym-wide batch rendering of the weekly PDF reports, delivered as one ZIP
+#
+# Rendering a report is CPU-bound ReportLab work that holds the GIL, so
+# threads do not help with hundreds of members. The parent reads each
+# member's profile and log from the store (member_payload) and hands the
+# plain rows to a ProcessPoolExecutor with one process per core, which
+# renders the PDFs in parallel (render_payload). The children never touch
+# the store, so any backend works and nothing is shared across fork().
+#
+# The charts are recorded once per data version in the ChartCache shared
+# with the web app (see src/charts.py), so a batch over unchanged data, or
+# after members downloaded their reports, only replays them.
+#
+# Only a few payloads per process are in flight at once and each finished
+# PDF is written to the ZIP as it arrives, so memory stays flat however
+# many members there are. The ZIP is written to a sink that cannot seek,
+# so it can be streamed straight into an HTTP response. PDFs are already
+# compressed, so the entries are stored rather than deflated. A closing
+# summary.json records the throughput (see BatchStats).
+#
+# A batch keeps every core busy, so the web app runs one at a time per
+# pod: its workers share the report cache directory, and a batch holds the
+# lock file BATCH_LOCK_NAME there until its ZIP is sent (try_batch_lock).
+#
+#   python -m src.batch -o reports.zip --store sqlite --db aceest.db
+#   python -m src.batch -o two.zip --member M1 --member M2 --processes 2 --store sqlite
+#   curl -o reports.zip http://localhost:5000/api/v1/reports/weekly.zip
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import date
+
+try:
+    import fcntl
+except ImportError:  # Windows: batches are not serialized
+    fcntl = None
+
+from src.charts import ChartCache, chart_key, report_charts
+from src.reports import (
+    ReportTotals, default_cache_dir, report_lines, report_row, spooled_pdf, write_weekly_report,
+)
+from src.journal import JournalInUse
+from src.storage import create_cli_store
+
+# Payloads queued per pool process; enough to keep every core busy.
+IN_FLIGHT_PER_PROCESS = 4
+# Imported once by the forkserver so every pool process starts warm.
+PRELOAD_MODULES = [
+    'src.charts', 'reportlab.pdfgen.canvas', 'reportlab.platypus', 'reportlab.graphics.renderPDF',
+    'reportlab.graphics.charts.barcharts', 'reportlab.graphics.charts.linecharts',
+]
+SUMMARY_NAME = 'summary.json'
+BATCH_LOCK_NAME = 'batch.lock'
+
+
+def default_processes():
+    """One process per core this process may run on."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def report_members(store, member_ids=None):
+    """The members to report on: ``member_ids``, or everyone, keeping those with a profile."""
+    for member_id in store.members() if member_ids is None else member_ids:
+        if store.get_profile(member_id):
+            yield member_id
+
+
+def member_payload(store, member_id, today, chart_dir=None):
+    """Everything render_payload() needs for one member, as picklable plain data.
+
+    Rows, totals and chart data come from one store.read() snapshot, whose
+    version keys the charts.
+    """
+    view = store.read(member_id)
+    totals = ReportTotals(today)
+    rows = []
+    for category, entries in view.workouts.items():
+        for entry in entries:
+            rows.append(report_row(category, entry))
+            totals.add(category, entry)
+    return {
+        'member_id': member_id, 'profile': dict(view.profile), 'today': today,
+        'week': totals.week, 'lifetime': totals.lifetime, 'daily_calories': totals.daily_calories, 'rows': rows,
+        'chart_dir': chart_dir, 'chart_key': chart_key(store.epoch, member_id, view.version, today),
+    }
+
+
+def render_payload(payload):
+    """Render one member_payload() to PDF bytes; runs in a pool process.
+
+    Returns (member_id, profile, pdf, error): ``pdf`` is None and ``error``
+    set if rendering failed, so one bad profile does not stop the batch.
+    """
+    member_id, profile = payload['member_id'], payload['profile']
+    try:
+        cache = ChartCache(payload['chart_dir']) if payload['chart_dir'] else None
+        charts = report_charts(payload['lifetime']['minutes'], payload['daily_calories'], payload['today'],
+                               cache, payload['chart_key'])
+        lines = report_lines(profile, payload['week'], payload['lifetime'])
+        with spooled_pdf() as out:
+            write_weekly_report(out, profile, lines, payload['rows'], charts)
+            out.seek(0)
+            return member_id, profile, out.read(), None
+    except Exception as exc:
+        return member_id, profile, None, str(exc) or type(exc).__name__
+
+
+def pool_context():
+    """forkserver where available: pool processes are forked from a clean,
+    single-threaded server rather than from a threaded web worker."""
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(PRELOAD_MODULES)
+    return context
+
+
+def render_all(store, member_ids=None, processes=None, today=None, chart_dir=None):
+    """Yield render_payload() results for every report, in completion order."""
+    today = today or date.today()
+    processes = processes or default_processes()
+    payloads = (
+        member_payload(store, member_id, today, chart_dir) for member_id in report_members(store, member_ids)
+    )
+    with ProcessPoolExecutor(processes, mp_context=pool_context()) as pool:
+        pending = set()
+        for payload in payloads:
+            pending.add(pool.submit(render_payload, payload))
+            if len(pending) >= processes * IN_FLIGHT_PER_PROCESS:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in pending:
+            yield future.result()
+
+
+class BatchStats:
+    """Counts and throughput of one batch run."""
+
+    def __init__(self, processes):
+        self.processes = processes
+        self.rendered = 0
+        self.failed = {}
+        self.pdf_bytes = 0
+        self.started = time.monotonic()
+        self.seconds = 0.0
+
+    def finish(self):
+        self.seconds = time.monotonic() - self.started
+
+    @property
+    def reports_per_second(self):
+        return self.rendered / self.seconds if self.seconds else 0.0
+
+    def as_dict(self):
+        return {
+            'processes': self.processes,
+            'rendered': self.rendered,
+            'failed': self.failed,
+            'pdf_bytes': self.pdf_bytes,
+            'seconds': round(self.seconds, 3),
+            'reports_per_second': round(self.reports_per_second, 1),
+        }
+
+
+class _ChunkSink:
+    """Write-only, unseekable file that collects what ZipFile writes."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data, self.chunks = b''.join(self.chunks), []
+        return data
+
+
+def try_batch_lock(lock_path):
+    """The open, locked ``lock_path`` while no other batch holds it, else None.
+
+    The lock is released when the file is closed.
+    """
+    lock_file = open(lock_path, 'a')
+    if fcntl is not None:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+    return lock_file
+
+
+def report_filename(member_id, taken):
+    """``{regn_id}_weekly_report.pdf`` with path characters replaced and clashes numbered."""
+    stem = re.sub(r'[^A-Za-z0-9._-]', '_', member_id).lstrip('.') or 'member'
+    name, n = f"{stem}_weekly_report.pdf", 1
+    while name in taken:
+        n += 1
+        name = f"{stem}-{n}_weekly_report.pdf"
+    taken.add(name)
+    return name
+
+
+def zip_chunks(store, member_ids=None, processes=None, today=None, stats=None, chart_dir=None):
+    """Yield a ZIP of every member's weekly report, a few bytes-chunks per report.
+
+    ``stats`` (a BatchStats) is filled in as the batch runs and is final
+    once the generator is exhausted. Charts are cached under ``chart_dir``.
+    """
+    processes = processes or default_processes()
+    stats = stats or BatchStats(processes)
+    sink, taken = _ChunkSink(), set()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_STORED) as archive:
+        for member_id, profile, pdf, error in render_all(store, member_ids, processes, today, chart_dir):
+            if pdf is None:
+                stats.failed[member_id] = error
+                continue
+            archive.writestr(report_filename(member_id, taken), pdf)
+            stats.rendered += 1
+            stats.pdf_bytes += len(pdf)
+            yield sink.drain()
+        stats.finish()
+        archive.writestr(SUMMARY_NAME, json.dumps(stats.as_dict(), indent=2))
+    yield sink.drain()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m src.batch',
+                                     description="Render every member's weekly PDF report into one ZIP.")
+    parser.add_argument('--output', '-o', required=True, help='ZIP file to write ("-" for stdout)')
+    parser.add_argument('--member', action='append', help='only this Regn-ID; repeat for several')
+    parser.add_argument('--processes', type=int, help='render processes (default: one per core)')
+    parser.add_argument('--chart-cache', help='recorded chart directory (default: charts in ACEEST_REPORT_CACHE_DIR)')
+    parser.add_argument('--store', help='memory or sqlite (default: ACEEST_STORE)')
+    parser.add_argument('--db', help='SQLite path (default: ACEEST_DB_PATH)')
+    parser.add_argument('--journal-dir', help="a stopped app's MemoryStore journal (default: ACEEST_JOURNAL_DIR)")
+    args = parser.parse_args(argv)
+
+    try:
+        store = create_cli_store(args.store, args.db, args.journal_dir)
+    except (ValueError, JournalInUse) as exc:
+        parser.error(str(exc))
+    stats = BatchStats(args.processes or default_processes())
+    output = sys.stdout.buffer if args.output == '-' else open(args.output, 'wb')
+    try:
+        chart_dir = args.chart_cache or os.path.join(default_cache_dir(), 'charts')
+        for chunk in zip_chunks(store, args.member, stats.processes, stats=stats, chart_dir=chart_dir):
+            output.write(chunk)
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+        store.close()
+    print(json.dumps(stats.as_dict(), indent=2), file=sys.stderr)
+    return 1 if stats.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,187 @@
+# Vector charts for the weekly PDF report (ReportLab graphics)
+#
+# The Tkinter apps in versions/ showed "Total Minutes per Category" as a
+# matplotlib bar chart; the PDF gets the same chart plus the daily calorie
+# trend of the report's 7 days, drawn with reportlab.graphics so they stay
+# sharp at any zoom.
+#
+# Turning a chart into PDF drawing operators costs far more than the rest
+# of a short report, and the charts only change with the member's data. So
+# each chart is recorded once as the operators ReportLab emits for it
+# (RecordedChart) and kept in a ChartCache on disk, keyed by data version
+# and day. Report threads, batch processes and later exports replay the
+# operators into their own document instead of drawing the chart again.
+#
+# ReportLab has no public API for this, so recording reads the canvas's
+# private operator list and font table. requirements.txt pins ReportLab
+# exactly, tests/test_charts.py fails if those internals change, and charts
+# recorded by another ReportLab version are drawn again, not replayed.
+#
+# ReportLab is imported inside the functions, as in src/reports.py.
+import io
+import json
+import re
+from datetime import timedelta
+
+from src.models import CATEGORIES
+from src.reports import ReportCache
+
+CHART_WIDTH = 240
+CHART_HEIGHT = 150
+# Bar colours of the v1.3 progress tab: blue, green, amber.
+CATEGORY_COLORS = ('#2196F3', '#4CAF50', '#FFC107')
+TREND_COLOR = '#4CAF50'
+TEXT_COLOR = '#343A40'
+# Recorded charts kept on disk before the least recently used are evicted.
+CHART_CACHE_SIZE = 5000
+
+# Font selection in recorded operators ("/F1 8 Tf"); font names are per document.
+FONT_OPERATOR = re.compile(r'/F\d+(?= [\d.]+ Tf)')
+
+
+class RecordedChart:
+    """A chart as the PDF operators that draw it, ready to replay into any canvas.
+
+    ``fonts`` maps each font's PostScript name to its name in ``operators``;
+    replaying renames them to the target document's. ``renderer`` is the
+    ReportLab version that emitted them. Charts must be opaque: transparency
+    would need graphics-state resources that are not recorded.
+    """
+
+    __slots__ = ('width', 'height', 'fonts', 'operators', 'renderer')
+
+    def __init__(self, width, height, fonts, operators, renderer):
+        self.width = width
+        self.height = height
+        self.fonts = fonts
+        self.operators = operators
+        self.renderer = renderer
+
+    @classmethod
+    def record(cls, drawing):
+        """Draw ``drawing`` once on a scratch canvas and keep the operators."""
+        from reportlab import Version
+        from reportlab.graphics import renderPDF
+        from reportlab.pdfgen import canvas as pdf_canvas
+
+        scratch = pdf_canvas.Canvas(io.BytesIO())
+        start = len(scratch._code)
+        renderPDF.draw(drawing, scratch, 0, 0)
+        return cls(drawing.width, drawing.height, dict(scratch._doc.fontMapping),
+                   '\n'.join(scratch._code[start:]), Version)
+
+    def draw_on(self, canvas, x, y):
+        """Replay the chart with its lower left corner at (x, y)."""
+        names = {recorded: canvas._doc.getInternalFontName(font) for font, recorded in self.fonts.items()}
+        canvas.saveState()
+        canvas.translate(x, y)
+        canvas.addLiteral(FONT_OPERATOR.sub(lambda match: names[match.group(0)], self.operators))
+        canvas.restoreState()
+
+    def as_dict(self):
+        return {'width': self.width, 'height': self.height, 'fonts': self.fonts, 'operators': self.operators,
+                'renderer': self.renderer}
+
+
+class ChartCache(ReportCache):
+    """Recorded charts on disk as JSON, shared by every process like ReportCache."""
+
+    suffix = '.json'
+
+    def __init__(self, directory, max_files=CHART_CACHE_SIZE):
+        super().__init__(directory, max_files)
+
+    def get(self, key):
+        """The cached charts for ``key``, or None."""
+        from reportlab import Version
+
+        cached = self.open(key)
+        if cached is None:
+            return None
+        with cached:
+            try:
+                charts = [RecordedChart(**chart) for chart in json.load(cached)]
+            except (ValueError, TypeError):
+                return None  # written by an incompatible version; draw again
+        if any(chart.renderer != Version for chart in charts):
+            return None  # recorded by another ReportLab; its operators may not fit this one
+        return charts
+
+    def set(self, key, charts):
+        self.put(key, io.BytesIO(json.dumps([chart.as_dict() for chart in charts]).encode('utf-8')))
+
+
+def _colors():
+    from reportlab.lib import colors as rl_colors
+    return rl_colors.HexColor
+
+
+def category_chart(minutes):
+    """Bar chart of total minutes per category (``minutes`` maps category to minutes)."""
+    from reportlab.graphics.charts.barcharts import VerticalBarChart
+    from reportlab.graphics.shapes import Drawing, String
+
+    color = _colors()
+    drawing = Drawing(CHART_WIDTH, CHART_HEIGHT)
+    chart = VerticalBarChart()
+    chart.x, chart.y, chart.width, chart.height = 40, 25, CHART_WIDTH - 50, CHART_HEIGHT - 50
+    chart.data = [[minutes.get(category, 0) for category in CATEGORIES]]
+    chart.categoryAxis.categoryNames = list(CATEGORIES)
+    chart.categoryAxis.labels.fontSize = 8
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.labels.fontSize = 8
+    chart.valueAxis.visibleGrid = True
+    chart.valueAxis.gridStrokeColor = color('#DEE2E6')
+    chart.bars.strokeColor = None
+    for index, fill in enumerate(CATEGORY_COLORS):
+        chart.bars[(0, index)].fillColor = color(fill)
+    drawing.add(chart)
+    drawing.add(String(CHART_WIDTH / 2, CHART_HEIGHT - 12, "Total Minutes per Category",
+                       fontName='Helvetica-Bold', fontSize=10, fillColor=color(TEXT_COLOR), textAnchor='middle'))
+    return drawing
+
+
+def trend_chart(calories, today):
+    """Line chart of calories burnt on each of the 7 days ending with ``today``."""
+    from reportlab.graphics.charts.linecharts import HorizontalLineChart
+    from reportlab.graphics.shapes import Drawing, String
+    from reportlab.graphics.widgets.markers import makeMarker
+
+    color = _colors()
+    drawing = Drawing(CHART_WIDTH, CHART_HEIGHT)
+    chart = HorizontalLineChart()
+    chart.x, chart.y, chart.width, chart.height = 40, 25, CHART_WIDTH - 50, CHART_HEIGHT - 50
+    chart.data = [list(calories)]
+    chart.categoryAxis.categoryNames = [(today - timedelta(days=6 - n)).strftime('%a') for n in range(7)]
+    chart.categoryAxis.labels.fontSize = 8
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.labels.fontSize = 8
+    chart.valueAxis.visibleGrid = True
+    chart.valueAxis.gridStrokeColor = color('#DEE2E6')
+    chart.lines[0].strokeColor = color(TREND_COLOR)
+    chart.lines[0].strokeWidth = 2
+    chart.lines[0].symbol = makeMarker('FilledCircle', size=4, fillColor=color(TREND_COLOR))
+    drawing.add(chart)
+    drawing.add(String(CHART_WIDTH / 2, CHART_HEIGHT - 12, "Calories, Last 7 Days",
+                       fontName='Helvetica-Bold', fontSize=10, fillColor=color(TEXT_COLOR), textAnchor='middle'))
+    return drawing
+
+
+def chart_key(epoch, member_id, version, today):
+    """ChartCache key of a member's report charts: their data version and the report day."""
+    return epoch, member_id, version, today.isoformat()
+
+
+def report_charts(minutes, calories, today, cache=None, key=None):
+    """The weekly report's charts, recorded; from ``cache`` under ``key`` when already drawn.
+
+    ``key`` must change whenever the numbers do (see chart_key).
+    """
+    if cache is not None:
+        charts = cache.get(key)
+        if charts is not None:
+            return charts
+    charts = [RecordedChart.record(category_chart(minutes)), RecordedChart.record(trend_chart(calories, today))]
+    if cache is not None:
+        cache.set(key, charts)
+    return charts
@@ -0,0 +1,262 @@
+# Columnar analytics mirror of the workout log
+#
+# Typed NumPy columns, appended alongside the row-oriented log, so gym-wide
+# reductions (category totals, weekly windows, report summaries) run as
+# vectorized passes instead of Python loops over entry objects.
+from datetime import date, datetime, time as dt_time, timedelta
+
+import numpy as np
+
+from src.models import CATEGORIES
+
+CATEGORY_CODES = {category: code for code, category in enumerate(CATEGORIES)}
+# Layout version written into .npz exports.
+NPZ_FORMAT = 1
+
+
+class ColumnStore:
+    """Append-only typed columns with amortized doubling growth.
+
+    Columns: category code (int8), exercise code (int32, dictionary encoded
+    in ``exercise_names``), duration and calories (int32), epoch seconds
+    (int64), member code (int32, dictionary encoded in ``member_ids``) and
+    the entry id (int64). Rows beyond ``len(self)`` are unused capacity.
+    """
+
+    COLUMNS = (
+        ('category', np.int8),
+        ('exercise', np.int32),
+        ('duration', np.int32),
+        ('calories', np.int32),
+        ('ts', np.int64),
+        ('member', np.int32),
+        ('id', np.int64),
+    )
+
+    def __init__(self, capacity=1024):
+        self._size = 0
+        self._capacity = max(1, capacity)
+        self._arrays = {name: np.zeros(self._capacity, dtype) for name, dtype in self.COLUMNS}
+        self.exercise_names = []
+        self._exercise_codes = {}
+        self.member_ids = []
+        self._member_codes = {}
+
+    def __len__(self):
+        return self._size
+
+    @staticmethod
+    def _encode(value, codes, table):
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(table)
+            table.append(value)
+        return code
+
+    def _reserve(self, extra):
+        needed = self._size + extra
+        if needed <= self._capacity:
+            return
+        capacity = max(1, self._capacity)
+        while capacity < needed:
+            capacity *= 2
+        for name, dtype in self.COLUMNS:
+            grown = np.zeros(capacity, dtype)
+            grown[:self._size] = self._arrays[name][:self._size]
+            self._arrays[name] = grown
+        self._capacity = capacity
+
+    def append(self, entry, member_id=''):
+        """Mirror one WorkoutEntry."""
+        self._reserve(1)
+        i = self._size
+        arrays = self._arrays
+        arrays['category'][i] = CATEGORY_CODES[entry.category]
+        arrays['exercise'][i] = self._encode(entry.workout, self._exercise_codes, self.exercise_names)
+        arrays['duration'][i] = entry.duration
+        arrays['calories'][i] = entry.calories
+        arrays['ts'][i] = entry.ts
+        arrays['member'][i] = self._encode(member_id, self._member_codes, self.member_ids)
+        arrays['id'][i] = entry.id or 0
+        self._size = i + 1
+
+    def extend(self, entries, member_id=''):
+        """Mirror many entries with one resize and column-wise copies."""
+        entries = list(entries)
+        if not entries:
+            return
+        self._reserve(len(entries))
+        start, stop = self._size, self._size + len(entries)
+        arrays = self._arrays
+        arrays['category'][start:stop] = [CATEGORY_CODES[e.category] for e in entries]
+        arrays['exercise'][start:stop] = [
+            self._encode(e.workout, self._exercise_codes, self.exercise_names) for e in entries
+        ]
+        arrays['duration'][start:stop] = [e.duration for e in entries]
+        arrays['calories'][start:stop] = [e.calories for e in entries]
+        arrays['ts'][start:stop] = [e.ts for e in entries]
+        arrays['member'][start:stop] = self._encode(member_id, self._member_codes, self.member_ids)
+        arrays['id'][start:stop] = [e.id or 0 for e in entries]
+        self._size = stop
+
+    def frozen(self):
+        """A read-only copy-free view of the rows appended so far.
+
+        Rows below ``len(self)`` are never rewritten and growth copies into
+        new arrays, so the view stays valid while appends continue.
+        """
+        view = ColumnStore.__new__(ColumnStore)
+        view._size = self._size
+        view._capacity = self._size
+        view._arrays = {name: array[:self._size] for name, array in self._arrays.items()}
+        view.exercise_names = list(self.exercise_names)
+        view._exercise_codes = dict(self._exercise_codes)
+        view.member_ids = list(self.member_ids)
+        view._member_codes = dict(self._member_codes)
+        return view
+
+    def column(self, name):
+        """Read-only view of the filled part of one column."""
+        view = self._arrays[name][:self._size]
+        view.flags.writeable = False
+        return view
+
+    def columns(self):
+        return {name: self.column(name) for name, _ in self.COLUMNS}
+
+    def select(self, keep):
+        """A new ColumnStore holding only the rows where ``keep`` is true.
+
+        Name tables shrink to the names those rows use, renumbered in their
+        original order, so an export of one member names no one else.
+        """
+        view = ColumnStore.__new__(ColumnStore)
+        view._arrays = {name: array[keep] for name, array in self.columns().items()}
+        view._size = view._capacity = len(view._arrays['id'])
+        view.exercise_names = view._compact('exercise', self.exercise_names)
+        view._exercise_codes = {name: code for code, name in enumerate(view.exercise_names)}
+        view.member_ids = view._compact('member', self.member_ids)
+        view._member_codes = {member_id: code for code, member_id in enumerate(view.member_ids)}
+        return view
+
+    def _compact(self, column, names):
+        """Recode ``column`` to the used entries of ``names``; returns those entries."""
+        used, codes = np.unique(self._arrays[column], return_inverse=True)
+        self._arrays[column] = codes.reshape(-1).astype(self._arrays[column].dtype)
+        return [names[code] for code in used.tolist()]
+
+    def save_npz(self, file, compress=True):
+        """Write the columns and name tables to ``file`` (a path or binary file) as .npz.
+
+        Every member is a plain typed array (names as fixed-width unicode),
+        so np.load() needs neither parsing nor pickle.
+        """
+        save = np.savez_compressed if compress else np.savez
+        save(
+            file,
+            format=np.int32(NPZ_FORMAT),
+            categories=np.array(CATEGORIES, dtype=str),
+            exercise_names=np.array(self.exercise_names, dtype=str),
+            member_ids=np.array(self.member_ids, dtype=str),
+            **self.columns(),
+        )
+
+    @classmethod
+    def load_npz(cls, file):
+        """Rebuild a ColumnStore written by save_npz(); raises ValueError for other files."""
+        with np.load(file, allow_pickle=False) as data:
+            if 'format' not in data.files or int(data['format']) != NPZ_FORMAT:
+                raise ValueError("not an ACEest .npz export")
+            if tuple(data['categories'].tolist()) != CATEGORIES:
+                raise ValueError("export uses different workout categories")
+            missing = [name for name, _ in cls.COLUMNS if name not in data.files]
+            if missing:
+                raise ValueError(f"missing columns: {', '.join(missing)}")
+            arrays = {name: data[name].astype(dtype, copy=False) for name, dtype in cls.COLUMNS}
+            exercise_names = data['exercise_names'].tolist()
+            member_ids = data['member_ids'].tolist()
+        sizes = {len(array) for array in arrays.values()}
+        if len(sizes) != 1:
+            raise ValueError("columns have different lengths")
+        columns = cls.__new__(cls)
+        columns._arrays = arrays
+        columns._size = columns._capacity = sizes.pop()
+        columns.exercise_names = exercise_names
+        columns._exercise_codes = {name: code for code, name in enumerate(exercise_names)}
+        columns.member_ids = member_ids
+        columns._member_codes = {member_id: code for code, member_id in enumerate(member_ids)}
+        return columns
+
+    def mask(self, member_id=None, start_ts=None, end_ts=None):
+        """Boolean row filter: optional member and half-open [start_ts, end_ts) window."""
+        keep = np.ones(self._size, dtype=bool)
+        if member_id is not None:
+            code = self._member_codes.get(member_id)
+            if code is None:
+                return np.zeros(self._size, dtype=bool)
+            keep &= self.column('member') == code
+        ts = self.column('ts')
+        if start_ts is not None:
+            keep &= ts >= start_ts
+        if end_ts is not None:
+            keep &= ts < end_ts
+        return keep
+
+    def _by_category(self, column, keep):
+        codes = self.column('category')[keep]
+        values = self.column(column)[keep].astype(np.int64)
+        sums = np.bincount(codes, weights=values, minlength=len(CATEGORIES))
+        return {category: int(sums[code]) for category, code in CATEGORY_CODES.items()}
+
+    def progress_totals(self, member_id=None):
+        """Minutes per category (same shape as AggregateTracker.progress_totals)."""
+        return self._by_category('duration', self.mask(member_id))
+
+    def weekly_calories(self, today=None, member_id=None):
+        """Calories logged in the 7 days ending with ``today``."""
+        start_ts, end_ts = week_window(today)
+        keep = self.mask(member_id, start_ts, end_ts)
+        return int(self.column('calories')[keep].sum(dtype=np.int64))
+
+    def daily_totals(self, column, member_id=None, today=None):
+        """Sum of ``column`` on each of the 7 local days ending with ``today``, oldest first."""
+        bounds = week_days(today)
+        keep = self.mask(member_id, bounds[0], bounds[-1])
+        days = np.searchsorted(bounds, self.column('ts')[keep], side='right') - 1
+        sums = np.bincount(days, weights=self.column(column)[keep].astype(np.int64), minlength=7)
+        return [int(total) for total in sums]
+
+    def active_members(self, start_ts=None, end_ts=None):
+        """Ids of the members who logged a session in [start_ts, end_ts)."""
+        codes = np.unique(self.column('member')[self.mask(None, start_ts, end_ts)])
+        return [self.member_ids[code] for code in codes]
+
+    def report_summary(self, member_id=None, start_ts=None, end_ts=None):
+        """Per-category sessions/minutes/calories plus overall totals."""
+        keep = self.mask(member_id, start_ts, end_ts)
+        codes = self.column('category')[keep]
+        sessions = np.bincount(codes, minlength=len(CATEGORIES))
+        minutes = self._by_category('duration', keep)
+        calories = self._by_category('calories', keep)
+        return {
+            'sessions': {category: int(sessions[code]) for category, code in CATEGORY_CODES.items()},
+            'minutes': minutes,
+            'calories': calories,
+            'total_sessions': int(sessions.sum()),
+            'total_minutes': sum(minutes.values()),
+            'total_calories': sum(calories.values()),
+        }
+
+
+def week_window(today=None):
+    """Epoch bounds [start, end) of the 7 local days ending with ``today``."""
+    today = today or date.today()
+    start = datetime.combine(today - timedelta(days=6), dt_time.min)
+    end = datetime.combine(today + timedelta(days=1), dt_time.min)
+    return int(start.timestamp()), int(end.timestamp())
+
+
+def week_days(today=None):
+    """The 8 epoch bounds of the 7 local days ending with ``today`` (DST-safe)."""
+    today = today or date.today()
+    return [int(datetime.combine(today - timedelta(days=6 - n), dt_time.min).timestamp()) for n in range(8)]
@@ -0,0 +1,103 @@
+# Validation of workout entries submitted as data (JSON batches, bulk imports)
+#
+# The HTML forms check one entry and flash a message; API clients send many
+# at once and need to know which ones were rejected and why.
+import time
+from collections.abc import Mapping
+from datetime import datetime
+
+from src.models import CATEGORIES, MAX_CLOCK_SKEW, MAX_ENTRY_VALUE, MET_VALUES, MIN_ENTRY_TS, WorkoutEntry
+
+# Body weight used for MET calories when the member has no profile.
+DEFAULT_WEIGHT_KG = 70
+
+
+class ValidationError(ValueError):
+    """Some records were invalid; ``errors`` maps record index to message."""
+
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} invalid entr{'y' if len(errors) == 1 else 'ies'}")
+        self.errors = errors
+
+
+def met_calories(category, duration, weight):
+    """Calories burnt in ``duration`` minutes of ``category`` at ``weight`` kg (MET formula)."""
+    met = MET_VALUES.get(category, 5)
+    return int(round((met * 3.5 * float(weight) / 200.0) * duration))
+
+
+def _whole_number(value, field):
+    # Exact type checks first: bulk imports call this twice per row.
+    if type(value) is not str and type(value) is not int:
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise ValueError(f"{field} must be a whole number")
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"{field} must be a whole number") from None
+    if number > MAX_ENTRY_VALUE:
+        raise ValueError(f"{field} is too large")
+    return number
+
+
+def entry_from_record(record, weight=DEFAULT_WEIGHT_KG, now=None):
+    """Validate one record and build its WorkoutEntry; raises ValueError.
+
+    Fields: ``workout`` and ``duration`` (minutes) are required;
+    ``category`` defaults to "Workout"; missing ``calories`` are estimated
+    from MET_VALUES and ``weight``; the time is ``ts`` (epoch seconds) or
+    ``timestamp`` (ISO 8601: "YYYY-MM-DD HH:MM:SS" local time, a bare date
+    for backfilled history, or with a UTC offset), else ``now``; it must
+    lie between 1970 and a day after ``now``. Values may be strings, as
+    read from CSV.
+    """
+    now = int(time.time()) if now is None else now
+    if type(record) is not dict and not isinstance(record, Mapping):
+        raise ValueError("entry must be an object")
+    workout = record.get('workout')
+    if not isinstance(workout, str) or not workout.strip():
+        raise ValueError("workout is required")
+    category = record.get('category') or 'Workout'
+    if category not in CATEGORIES:
+        raise ValueError(f"category must be one of {', '.join(CATEGORIES)}")
+    if record.get('duration') in (None, ''):
+        raise ValueError("duration is required")
+    duration = _whole_number(record['duration'], 'duration')
+    if duration <= 0:
+        raise ValueError("duration must be a positive number")
+    if record.get('calories') in (None, ''):
+        calories = met_calories(category, duration, weight)
+        if calories > MAX_ENTRY_VALUE:
+            raise ValueError("calories is too large")
+    else:
+        calories = _whole_number(record['calories'], 'calories')
+        if calories < 0:
+            raise ValueError("calories cannot be negative")
+    if record.get('ts') not in (None, ''):
+        ts = _whole_number(record['ts'], 'ts')
+    elif record.get('timestamp'):
+        try:
+            ts = int(datetime.fromisoformat(record['timestamp']).timestamp())
+        except (TypeError, ValueError, OverflowError, OSError):
+            raise ValueError("timestamp must look like 2025-01-06 07:30:00 or 2025-01-06") from None
+    else:
+        ts = now
+    if not MIN_ENTRY_TS <= ts <= now + MAX_CLOCK_SKEW:
+        raise ValueError("time must be between 1970-01-01 and tomorrow")
+    return WorkoutEntry(category, workout.strip(), duration, calories, ts)
+
+
+def entries_from_records(records, weight=DEFAULT_WEIGHT_KG, now=None):
+    """Validate every record in one pass; raises ValidationError listing all failures."""
+    now = int(time.time()) if now is None else now
+    entries, errors = [], {}
+    for index, record in enumerate(records):
+        try:
+            entries.append(entry_from_record(record, weight, now))
+        except ValueError as exc:
+            errors[index] = str(exc)
+    if errors:
+        raise ValidationError(errors)
+    return entries
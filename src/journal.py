@@ -0,0 +1,425 @@
+# Append-only durability journal for the in-memory store
+#
+# Every mutation is framed and appended to the current journal segment. A
+# background thread fsyncs on an interval (group commit), so a request only
+# pays for a buffered write. Periodically the store state is written to a
+# snapshot and the segments it covers are deleted; at boot the snapshot and
+# the remaining segments are replayed.
+#
+# A failed fsync is permanent: the kernel may already have dropped the dirty
+# pages and cleared the error, so a retry that "succeeds" proves nothing.
+# From then on appends raise rather than acknowledge writes that may never
+# reach the disk, until a restart replays what actually did.
+#
+# A journal directory belongs to one process: a lock file there makes a
+# second process, such as a bulk import run beside the app, fail instead of
+# appending to the same segments. Under gunicorn --preload the master opens
+# the journal and forks; the master then stops journaling and a single
+# worker takes the journal over, replaying it from disk (so a replacement
+# worker sees what a dead one wrote). A second live worker cannot: each
+# would hold its own state and checkpoint away the other's records, so it
+# fails with JournalInUse. Run one worker with threads, or use SQLite.
+import os
+import glob
+import json
+import logging
+import struct
+import threading
+import weakref
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # Windows: the directory is not locked
+    fcntl = None
+
+from src.models import CATEGORIES, WorkoutEntry
+
+KIND_WORKOUT = 1
+KIND_PROFILE = 2
+KIND_CLEAR = 3
+KIND_BATCH = 4
+
+# Frame: payload length, crc32 of kind+payload, kind.
+FRAME = struct.Struct('<IIB')
+# Workout payload: id, ts, duration, calories, category code, name length,
+# member id length; then the name and member id bytes.
+WORKOUT = struct.Struct('<qqqqBII')
+# Batch payload: member id length, then the member id; then per entry a
+# length-prefixed workout payload.
+BATCH = struct.Struct('<I')
+BATCH_ITEM = struct.Struct('<I')
+# Profile payload: member id length; then the member id and profile JSON.
+PROFILE = struct.Struct('<I')
+SNAPSHOT_MAGIC = b'ACESNAP1'
+SNAPSHOT_HEADER = struct.Struct('<8sQ')
+LOCK_NAME = 'journal.lock'
+# Held by the forked worker that took the journal over.
+WORKER_LOCK_NAME = 'worker.lock'
+# Longest wait, in seconds, between retries of a failed checkpoint.
+MAX_RETRY_DELAY = 5.0
+
+_CATEGORY_CODES = {category: code for code, category in enumerate(CATEGORIES)}
+
+
+def encode_workout(member_id, entry):
+    name = entry.workout.encode('utf-8')
+    member = member_id.encode('utf-8')
+    header = WORKOUT.pack(entry.id or 0, entry.ts, entry.duration, entry.calories,
+                          _CATEGORY_CODES[entry.category], len(name), len(member))
+    return header + name + member
+
+
+def decode_workout(payload):
+    """Return (member_id, WorkoutEntry)."""
+    entry_id, ts, duration, calories, code, name_len, member_len = WORKOUT.unpack_from(payload)
+    offset = WORKOUT.size
+    name = bytes(payload[offset:offset + name_len]).decode('utf-8')
+    offset += name_len
+    member_id = bytes(payload[offset:offset + member_len]).decode('utf-8')
+    return member_id, WorkoutEntry(CATEGORIES[code], name, duration, calories, ts, id=entry_id)
+
+
+def encode_batch(member_id, entries):
+    member = member_id.encode('utf-8')
+    parts = [BATCH.pack(len(member)), member]
+    for entry in entries:
+        payload = encode_workout(member_id, entry)
+        parts.append(BATCH_ITEM.pack(len(payload)))
+        parts.append(payload)
+    return b''.join(parts)
+
+
+def decode_batch(payload):
+    """Return (member_id, [WorkoutEntry])."""
+    (member_len,) = BATCH.unpack_from(payload)
+    offset = BATCH.size
+    member_id = bytes(payload[offset:offset + member_len]).decode('utf-8')
+    offset += member_len
+    entries = []
+    while offset < len(payload):
+        (length,) = BATCH_ITEM.unpack_from(payload, offset)
+        offset += BATCH_ITEM.size
+        entries.append(decode_workout(payload[offset:offset + length])[1])
+        offset += length
+    return member_id, entries
+
+
+def encode_profile(member_id, profile):
+    member = member_id.encode('utf-8')
+    return PROFILE.pack(len(member)) + member + json.dumps(profile, separators=(',', ':')).encode('utf-8')
+
+
+def decode_profile(payload):
+    """Return (member_id, profile)."""
+    (member_len,) = PROFILE.unpack_from(payload)
+    offset = PROFILE.size
+    member_id = bytes(payload[offset:offset + member_len]).decode('utf-8')
+    return member_id, json.loads(bytes(payload[offset + member_len:]).decode('utf-8'))
+
+
+def frame(kind, payload):
+    crc = zlib.crc32(payload, zlib.crc32(bytes((kind,))))
+    return FRAME.pack(len(payload), crc, kind) + payload
+
+
+def iter_frames(data, offset=0):
+    """Yield (kind, payload, end_offset) until the data ends or a frame is torn/corrupt."""
+    view = memoryview(data)
+    size = len(data)
+    while offset + FRAME.size <= size:
+        length, crc, kind = FRAME.unpack_from(view, offset)
+        start = offset + FRAME.size
+        end = start + length
+        if end > size:
+            return
+        payload = view[start:end]
+        if zlib.crc32(payload, zlib.crc32(bytes((kind,)))) != crc:
+            return
+        yield kind, payload, end
+        offset = end
+
+
+class JournalInUse(RuntimeError):
+    """Another process already journals to this directory."""
+
+
+class Journal:
+    """Segmented write-ahead journal with group commit and snapshots.
+
+    ``append`` is called by the store while it holds its write lock; it only
+    writes to the OS buffer. The flusher thread fsyncs every
+    ``flush_interval`` seconds and, once ``snapshot_every`` records have
+    been written since the last snapshot, asks the store to checkpoint.
+
+    The journal belongs to one process; once it forks, the parent stops
+    journaling and one child may take over (see after_fork). Multi-worker
+    deployments should use the SQLite backend instead. Flusher failures
+    are logged to ``logger``.
+    """
+
+    def __init__(self, directory, flush_interval=0.05, snapshot_every=50000, logger=None):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.snapshot_every = snapshot_every
+        self.logger = logger or logging.getLogger(__name__)
+        os.makedirs(directory, exist_ok=True)
+        self.snapshot_path = os.path.join(directory, 'snapshot.bin')
+        self._lock_file = None
+        self._worker_lock_file = None
+        self._fork_hooks = False
+        # Set in a process that forked: its child journals from then on.
+        self.handed_off = False
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._file = None
+        self._generation = 0
+        self._dirty = False
+        # Duplicated descriptors of written segments still to be fsynced.
+        self._unsynced = []
+        # The first fsync failure; appends are refused from then on.
+        self.error = None
+        self._since_snapshot = 0
+        self._checkpoint = None
+        self._thread = None
+
+    def _segment_path(self, generation):
+        return os.path.join(self.directory, f'journal-{generation:08d}.bin')
+
+    def _segments(self):
+        paths = glob.glob(os.path.join(self.directory, 'journal-*.bin'))
+        return sorted((int(os.path.basename(p)[8:16]), p) for p in paths)
+
+    # ----- boot -----
+
+    def _lock_directory(self):
+        """Hold the directory's lock file until close(); raises JournalInUse if another process does."""
+        if fcntl is None or self._lock_file is not None:
+            return
+        lock_file = open(os.path.join(self.directory, LOCK_NAME), 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise JournalInUse(f"journal {self.directory} is in use by another process") from None
+        self._lock_file = lock_file
+
+    def replay(self, apply):
+        """Feed every durable record to ``apply(kind, payload)``; returns the record count.
+
+        Locks the directory first (see JournalInUse).
+        """
+        self._lock_directory()
+        count = 0
+        logged = 0  # records in segments, which the next snapshot will fold in
+        covered = 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'rb') as f:
+                data = f.read()
+            magic, covered = SNAPSHOT_HEADER.unpack_from(data)
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError(f"{self.snapshot_path} is not an ACEest snapshot")
+            for kind, payload, _ in iter_frames(data, SNAPSHOT_HEADER.size):
+                apply(kind, payload)
+                count += 1
+        last = covered
+        for generation, path in self._segments():
+            if generation <= covered:
+                os.remove(path)  # left behind by a checkpoint interrupted after its rename
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            good = 0
+            for kind, payload, end in iter_frames(data):
+                apply(kind, payload)
+                good = end
+                logged += 1
+            if good < len(data):
+                # Torn tail from a crash mid-write: drop it.
+                with open(path, 'r+b') as f:
+                    f.truncate(good)
+            last = generation
+        self._generation = last
+        self._since_snapshot = logged
+        return count + logged
+
+    def start(self, checkpoint=None):
+        """Open a fresh segment and start the group-commit thread."""
+        self._checkpoint = checkpoint
+        if not self._fork_hooks and hasattr(os, 'register_at_fork'):
+            # Weak, so a closed journal does not stay alive for the hooks.
+            journal = weakref.ref(self)
+            os.register_at_fork(before=lambda: _call(journal, '_before_fork'),
+                                after_in_parent=lambda: _call(journal, '_hand_off'))
+            self._fork_hooks = True
+        with self._lock:
+            self._open_next_segment()
+        self._thread = threading.Thread(target=self._run, name='aceest-journal', daemon=True)
+        self._thread.start()
+
+    # ----- request path -----
+
+    def append(self, kind, payload):
+        record = frame(kind, payload)
+        if self.handed_off:
+            raise JournalInUse(f"journal {self.directory} was handed to a forked worker")
+        if self.error is not None:
+            raise OSError(f"journal {self.directory} cannot be synced to disk: {self.error}")
+        with self._lock:
+            self._file.write(record)
+            self._dirty = True
+            self._since_snapshot += 1
+
+    # ----- background -----
+
+    def _open_next_segment(self):
+        self._generation += 1
+        self._file = open(self._segment_path(self._generation), 'ab')
+        self._dirty = False
+
+    def sync(self):
+        """Flush buffered records to disk (one fsync for the whole group).
+
+        Segments sealed by rotate() are fsynced here too, so that never
+        happens under the store's write lock. Raises OSError if an fsync
+        fails, then and on every later call (see ``error``).
+        """
+        if self.error is not None:
+            raise OSError(f"journal {self.directory} cannot be synced to disk: {self.error}")
+        with self._lock:
+            if self._dirty:
+                self._file.flush()
+                # A duplicate stays valid if rotate() closes the segment meanwhile.
+                self._unsynced.append(os.dup(self._file.fileno()))
+                self._dirty = False
+            fds, self._unsynced = self._unsynced, []
+        try:
+            while fds:
+                os.fsync(fds[0])
+                os.close(fds.pop(0))
+        except OSError as exc:
+            self.error = exc
+            for fd in fds:
+                os.close(fd)
+            raise
+
+    def _run(self):
+        delay = self.flush_interval
+        while not self._stopped.is_set():
+            self._wakeup.wait(delay)
+            self._wakeup.clear()
+            try:
+                self.sync()
+                if self._checkpoint and self._since_snapshot >= self.snapshot_every:
+                    self._checkpoint()
+                delay = self.flush_interval
+            except (OSError, ValueError) as exc:
+                if self._stopped.is_set():
+                    break  # closed underneath us during shutdown
+                if self.error is not None:
+                    self.logger.exception("journal %s: fsync failed, refusing writes until restart",
+                                          self.directory)
+                    break
+                self.logger.exception("journal %s: checkpoint failed, retrying", self.directory)
+                delay = min(max(delay, self.flush_interval) * 2, MAX_RETRY_DELAY)
+
+    def rotate(self):
+        """Seal the current segment; returns its generation. Call with the store's write lock held.
+
+        The sealed segment is only flushed to the OS here; the next sync()
+        fsyncs it.
+        """
+        with self._lock:
+            sealed = self._generation
+            self._file.flush()
+            self._unsynced.append(os.dup(self._file.fileno()))
+            self._file.close()
+            self._open_next_segment()
+            self._since_snapshot = 0
+        return sealed
+
+    def write_snapshot(self, generation, records):
+        """Write a snapshot covering segments up to ``generation`` and delete them."""
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, generation))
+            for kind, payload in records:
+                f.write(frame(kind, payload))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        for segment_generation, path in self._segments():
+            if segment_generation <= generation:
+                os.remove(path)
+
+    def _before_fork(self):
+        # Buffered records would otherwise be written by parent and child.
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def _hand_off(self):
+        """In the parent after a fork: the child journals from now on."""
+        self.handed_off = True
+        self._stopped.set()
+        self._wakeup.set()
+
+    def after_fork(self):
+        """Take the journal over in a forked child, before the store replays and start()s it again.
+
+        Raises JournalInUse if another live child already did. The parent's
+        segment is left to the parent; threads do not survive fork anyway.
+        """
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        if fcntl is not None:
+            worker_lock = open(os.path.join(self.directory, WORKER_LOCK_NAME), 'a')
+            try:
+                fcntl.flock(worker_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                worker_lock.close()
+                raise JournalInUse(f"journal {self.directory} is used by another worker; "
+                                   "run one worker with a journaled memory store, or use SQLite") from None
+            if self._worker_lock_file is not None:
+                self._worker_lock_file.close()
+            self._worker_lock_file = worker_lock
+        if self._file is not None:
+            self._file.close()  # flushed before the fork; the parent's descriptor stays open
+            self._file = None
+        for fd in self._unsynced:
+            os.close(fd)
+        self._unsynced = []
+        self._dirty = False
+        self.handed_off = False
+
+    def close(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                if self.error is None:
+                    os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+            for fd in self._unsynced:
+                if self.error is None:
+                    os.fsync(fd)
+                os.close(fd)
+            self._unsynced = []
+        for lock_file in (self._lock_file, self._worker_lock_file):
+            if lock_file is not None:
+                lock_file.close()
+        self._lock_file = self._worker_lock_file = None
+
+
+def _call(reference, method):
+    journal = reference()
+    if journal is not None:
+        getattr(journal, method)()
@@ -0,0 +1,89 @@
+# Workout entry record and shared constants
+import sys
+import time
+from datetime import date, datetime
+
+CATEGORIES = ("Warm-up", "Workout", "Cool-down")
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+# MET values (from Tkinter v1.3), for calories estimated from duration and weight.
+MET_VALUES = {
+    "Warm-up": 3,
+    "Workout": 6,
+    "Cool-down": 2.5,
+}
+# Durations and calories are stored as int32 columns.
+MAX_ENTRY_VALUE = 2 ** 31 - 1
+# Entry times run from the epoch to a day past the clock (time zones, clock
+# skew). Earlier or later ones cannot be turned into local dates on every
+# platform and fall outside every report window.
+MIN_ENTRY_TS = 0
+MAX_CLOCK_SKEW = 24 * 3600
+
+
+def parse_timestamp(value):
+    """Parse a "YYYY-MM-DD HH:MM:SS" local time into epoch seconds."""
+    return int(datetime.strptime(value, TIMESTAMP_FORMAT).timestamp())
+
+
+class WorkoutEntry:
+    """One logged session.
+
+    Stored with ``__slots__`` and an integer epoch instead of a dict with a
+    formatted timestamp string; exercise names are interned so the same
+    "Running" is shared by every entry. ``timestamp`` and item access
+    (``entry['calories']``) keep templates and older callers working.
+    """
+
+    __slots__ = ('id', 'category', 'workout', 'duration', 'calories', 'ts')
+
+    def __init__(self, category, workout, duration, calories, ts, id=None):
+        self.id = id
+        self.category = category
+        self.workout = sys.intern(workout)
+        self.duration = duration
+        self.calories = calories
+        self.ts = ts
+
+    @classmethod
+    def create(cls, category, workout, duration, calories, ts=None):
+        """New entry stamped with the current time unless ``ts`` is given."""
+        return cls(category, workout, duration, calories, int(time.time()) if ts is None else ts)
+
+    @property
+    def timestamp(self):
+        """Local time as "YYYY-MM-DD HH:MM:SS" (the format the UI has always shown)."""
+        return time.strftime(TIMESTAMP_FORMAT, time.localtime(self.ts))
+
+    @property
+    def day(self):
+        return date.fromtimestamp(self.ts)
+
+    @property
+    def date_str(self):
+        return self.day.isoformat()
+
+    def __getitem__(self, key):
+        if key not in self.__slots__ and key != 'timestamp':
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def to_dict(self):
+        return {
+            'category': self.category,
+            'workout': self.workout,
+            'duration': self.duration,
+            'calories': self.calories,
+            'timestamp': self.timestamp,
+        }
+
+    def __eq__(self, other):
+        if not isinstance(other, WorkoutEntry):
+            return NotImplemented
+        return (self.category, self.workout, self.duration, self.calories, self.ts) == (
+            other.category, other.workout, other.duration, other.calories, other.ts)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return (f"WorkoutEntry(id={self.id!r}, category={self.category!r}, workout={self.workout!r}, "
+                f"duration={self.duration!r}, calories={self.calories!r}, ts={self.ts!r})")
@@ -0,0 +1,336 @@
+# Paginated PDF reports (ReportLab Platypus)
+#
+# A member's report lists every logged session, so it can run to any number
+# of pages. Rows are pulled from an iterator one page at a time and laid out
+# as a Platypus Table with fixed row heights, so each page's capacity is
+# known up front and the header row is repeated at the top of every page.
+# Only one page of rows is ever held; the finished document is written to a
+# SpooledTemporaryFile (in memory while small, on disk beyond
+# PDF_SPOOL_SIZE) that the view streams back in chunks.
+#
+# ReportLab is imported inside the functions so that importing the app
+# stays cheap (see HEAVY_MODULES in src/app.py).
+#
+# Rendering is slow, so requests do not do it themselves: ReportJobs runs
+# at most a few renders at a time on a background pool and stores each
+# result in a ReportCache keyed by (member, data version, day). A report is
+# built once per change to the member's data; every later download is a
+# file read, from any worker sharing the cache directory.
+#
+# The summary lines and chart data are summed from the member's own entries
+# (ReportTotals), never from the gym-wide ColumnStore: on SQLite that would
+# load every member's log once per report. Rows, totals and charts all come
+# from one store.read() snapshot, whose version is the one in the key.
+import bisect
+import hashlib
+import itertools
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from src.columnar import week_days
+from src.models import CATEGORIES
+
+# Spooled PDFs move from memory to a temporary file past this many bytes.
+PDF_SPOOL_SIZE = 1024 * 1024
+MARGIN = 50
+ROW_HEIGHT = 18
+# Gap between the last table row and the page number.
+FOOTER_OFFSET = 20
+# Space between charts, and between the charts and the table.
+CHART_GAP = 15
+# Reports kept on disk before the least recently used are evicted.
+REPORT_CACHE_SIZE = 500
+# Failed jobs remembered (for status polls) before the oldest are forgotten.
+MAX_FAILED_JOBS = 1000
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+# Columns of the weekly report's workout table.
+REPORT_COLUMNS = ["Category", "Exercise", "Duration(min)", "Calories(kcal)", "Date"]
+REPORT_COLUMN_WIDTHS = [80, 150, 100, 100, 80]
+
+
+def default_cache_dir():
+    """ACEEST_REPORT_CACHE_DIR, else aceest-reports in the temporary directory."""
+    return os.environ.get('ACEEST_REPORT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'aceest-reports'))
+
+
+def spooled_pdf():
+    """A fresh spooled temporary file to write a PDF into."""
+    return tempfile.SpooledTemporaryFile(PDF_SPOOL_SIZE)
+
+
+def report_lines(user_info, week, lifetime):
+    """Header lines of the weekly report: profile, then last-7-days and lifetime totals."""
+    return [
+        f"Regn-ID: {user_info['regn_id']} | Age: {user_info['age']} | Gender: {user_info['gender']}",
+        f"Height: {user_info['height']} cm | Weight: {user_info['weight']} kg | "
+        f"BMI: {user_info['bmi']:.1f} | BMR: {user_info['bmr']:.0f} kcal/day",
+        f"Last 7 days: {week['total_sessions']} sessions | {week['total_minutes']} min | {week['total_calories']} kcal"
+        f"   Lifetime: {lifetime['total_sessions']} sessions | {lifetime['total_minutes']} min",
+    ]
+
+
+class ReportTotals:
+    """Last-7-days and lifetime totals of one member, summed one entry at a time.
+
+    ``week`` and ``lifetime`` are what report_lines() takes; lifetime also
+    has ``minutes`` per category and ``daily_calories`` covers the 7 days
+    ending with ``today``, oldest first (the charts' data).
+    """
+
+    def __init__(self, today):
+        self.today = today
+        self.days = week_days(today)
+        self.week = {'total_sessions': 0, 'total_minutes': 0, 'total_calories': 0}
+        self.lifetime = {'total_sessions': 0, 'total_minutes': 0, 'minutes': dict.fromkeys(CATEGORIES, 0)}
+        self.daily_calories = [0] * 7
+
+    def add(self, category, entry):
+        self.lifetime['total_sessions'] += 1
+        self.lifetime['total_minutes'] += entry.duration
+        self.lifetime['minutes'][category] += entry.duration
+        if self.days[0] <= entry.ts < self.days[-1]:
+            self.week['total_sessions'] += 1
+            self.week['total_minutes'] += entry.duration
+            self.week['total_calories'] += entry.calories
+            self.daily_calories[bisect.bisect_right(self.days, entry.ts) - 1] += entry.calories
+
+
+def report_row(category, entry):
+    return [category, entry.workout, str(entry.duration), str(entry.calories), entry.date_str]
+
+
+def write_weekly_report(out, user_info, lines, rows, charts=()):
+    """The weekly report layout (parity with Tkinter v1.3 export); returns the page count."""
+    return write_table_pdf(out, f"Weekly Fitness Report - {user_info['name']}", lines,
+                           REPORT_COLUMNS, rows, REPORT_COLUMN_WIDTHS, charts)
+
+
+def write_table_pdf(out, title, lines, header, rows, col_widths, charts=()):
+    """Write a paginated PDF to the binary file ``out``; returns the page count.
+
+    Page 1 starts with ``title``, the info ``lines`` and ``charts`` side by
+    side (objects with ``width``, ``height`` and ``draw_on(canvas, x, y)``,
+    see src/charts.py); then ``rows`` (lists of strings, consumed lazily)
+    fill a table with ``header`` repeated at the top of each page and
+    "Page N" at the foot.
+    """
+    from reportlab.lib import colors as rl_colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas as pdf_canvas
+    from reportlab.platypus import Table, TableStyle
+
+    width, height = A4
+    c = pdf_canvas.Canvas(out, pagesize=A4, pageCompression=1)
+    c.setTitle(title)
+    style = TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), rl_colors.lightblue),
+        ("GRID", (0, 0), (-1, -1), 0.5, rl_colors.black),
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+    ])
+
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(MARGIN, height - MARGIN, title)
+    c.setFont("Helvetica", 11)
+    top = height - MARGIN - 30
+    for line in lines:
+        c.drawString(MARGIN, top, line)
+        top -= 20
+    if charts:
+        top -= max(chart.height for chart in charts) - 10
+        x = MARGIN
+        for chart in charts:
+            chart.draw_on(c, x, top)
+            x += chart.width + CHART_GAP
+        top -= CHART_GAP
+
+    rows = iter(rows)
+    carry, page = [], 0
+    while True:
+        page += 1
+        capacity = int((top - MARGIN - FOOTER_OFFSET) // ROW_HEIGHT) - 1
+        chunk = carry + list(itertools.islice(rows, capacity - len(carry)))
+        table = Table([header] + chunk, colWidths=col_widths, rowHeights=ROW_HEIGHT, style=style)
+        table.wrapOn(c, width - 2 * MARGIN, top - MARGIN)
+        table.drawOn(c, MARGIN, top - ROW_HEIGHT * (len(chunk) + 1))
+        c.setFont("Helvetica", 9)
+        c.drawRightString(width - MARGIN, MARGIN - FOOTER_OFFSET + 10, f"Page {page}")
+        c.showPage()
+        # Peek one row ahead so a table that ends exactly at a page break
+        # does not leave an empty trailing page.
+        carry = list(itertools.islice(rows, 1))
+        if not carry:
+            break
+        top = height - MARGIN
+    c.save()
+    return page
+
+
+class ReportQueueFull(RuntimeError):
+    """Too many reports are already waiting to be rendered."""
+
+
+class ReportOutdated(RuntimeError):
+    """The member's data changed after their report was requested."""
+
+
+class ReportCache:
+    """Finished PDFs on disk, one file per key, shared by every worker process.
+
+    Files are written under a temporary name and renamed into place, so a
+    reader never sees a partial report. Beyond ``max_files`` the least
+    recently read are deleted.
+    """
+
+    suffix = '.pdf'
+
+    def __init__(self, directory, max_files=REPORT_CACHE_SIZE):
+        self.directory = directory
+        self.max_files = max_files
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        name = hashlib.blake2b(repr(key).encode('utf-8'), digest_size=16).hexdigest()
+        return os.path.join(self.directory, name + self.suffix)
+
+    def open(self, key):
+        """The cached report for ``key`` as an open binary file, or None."""
+        path = self._path(key)
+        try:
+            report = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass  # evicted meanwhile; the open file is still readable
+        return report
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def put(self, key, source):
+        """Store the contents of the binary file ``source`` as ``key``."""
+        path = self._path(key)
+        with tempfile.NamedTemporaryFile(dir=self.directory, suffix='.tmp', delete=False) as tmp:
+            shutil.copyfileobj(source, tmp)
+        os.replace(tmp.name, path)
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        with os.scandir(self.directory) as listing:
+            for entry in listing:
+                if entry.name.endswith(self.suffix):
+                    try:
+                        entries.append((entry.stat().st_mtime, entry.path))
+                    except FileNotFoundError:
+                        pass
+        for _, path in sorted(entries)[:max(0, len(entries) - self.max_files)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class ReportJob:
+    """One requested report: its key, state and, once failed, the error."""
+
+    __slots__ = ('key', 'status', 'error', 'finished')
+
+    def __init__(self, key, status=QUEUED):
+        self.key = key
+        self.status = status
+        self.error = None
+        self.finished = threading.Event()
+        if status == DONE:
+            self.finished.set()
+
+    def wait(self, timeout=None):
+        """Block until the job is done or failed; returns whether it finished."""
+        return self.finished.wait(timeout)
+
+
+class ReportJobs:
+    """Bounded background pool that renders reports into a ReportCache.
+
+    ``render(*args)`` returns a binary file holding the PDF. At most
+    ``workers`` renders run at once and at most ``max_pending`` jobs are
+    queued or running; submit() raises ReportQueueFull beyond that. A key
+    already cached, queued or running is never rendered twice. The pool
+    threads start on first use and are replaced by after_fork(), so a
+    preloading gunicorn master never forks with a pool half set up.
+    """
+
+    def __init__(self, cache, render, workers=2, max_pending=32):
+        self.cache = cache
+        self.render = render
+        self.workers = workers
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._executor = None
+        self._active = {}
+        self._failed = OrderedDict()
+
+    def submit(self, key, *args):
+        """The job producing report ``key``, started with ``render(*args)`` if needed."""
+        with self._lock:
+            job = self._active.get(key)
+            if job is not None:
+                return job
+            if key in self.cache:
+                return ReportJob(key, DONE)
+            if len(self._active) >= self.max_pending:
+                raise ReportQueueFull(f"{len(self._active)} reports already pending")
+            self._failed.pop(key, None)
+            job = self._active[key] = ReportJob(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='aceest-report')
+            self._executor.submit(self._run, job, args)
+            return job
+
+    def status(self, key):
+        """The job for ``key`` if it is cached, pending or recently failed, else None."""
+        with self._lock:
+            job = self._active.get(key) or self._failed.get(key)
+        if job is None and key in self.cache:
+            job = ReportJob(key, DONE)
+        return job
+
+    def _run(self, job, args):
+        job.status = RUNNING
+        try:
+            report = self.render(*args)
+            try:
+                self.cache.put(job.key, report)
+            finally:
+                report.close()
+            job.status = DONE
+        except Exception as exc:
+            job.status, job.error = FAILED, str(exc) or type(exc).__name__
+        with self._lock:
+            self._active.pop(job.key, None)
+            if job.status == FAILED:
+                self._failed[job.key] = job
+                while len(self._failed) > MAX_FAILED_JOBS:
+                    self._failed.popitem(last=False)
+        job.finished.set()
+
+    def after_fork(self):
+        """Drop the parent's pool and jobs: threads do not survive fork()."""
+        self._lock = threading.Lock()
+        self._executor = None
+        self._active = {}
+        self._failed = OrderedDict()
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
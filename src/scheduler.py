@@ -0,0 +1,175 @@
+# Weekly report pre-rendering at ISO week rollover
+#
+# Members download last week's report on Monday morning, when the gym floor
+# (and the app) is busiest. Once the ISO week has closed, WeeklyPrerender
+# renders the report of every member who trained that week into the
+# ReportCache during an off-peak window early on Monday (ACEEST_PRERENDER_HOURS,
+# local time), so those downloads are cache hits. A report is keyed by the
+# member's data version and the day, so a member who logs a session before
+# downloading simply gets a fresh one.
+#
+# The work runs on one daemon thread per worker process, started by the
+# first request the worker serves. On Linux the thread lowers its own
+# scheduling priority (nice 19), and it pauses between reports so request
+# threads get the interpreter often. Workers share the cache directory; a
+# lock file there lets one worker render at a time, and the others find
+# the reports already cached and skip them. Rendering stops when the
+# window closes and the rest waits for next week.
+import logging
+import os
+import sys
+import threading
+from datetime import datetime, time as dt_time, timedelta
+
+try:
+    import fcntl
+except ImportError:  # Windows: workers may render the same report twice
+    fcntl = None
+
+# Off-peak window on Mondays, as [start, end) local hours.
+DEFAULT_HOURS = (1, 6)
+# Seconds between two reports, so requests are never starved.
+DEFAULT_PAUSE = 0.2
+# Longest single sleep, so clock changes (DST, NTP) are noticed.
+MAX_SLEEP = 3600
+# Seconds between attempts to take the lock another worker holds.
+LOCK_RETRY = 60
+LOCK_NAME = 'prerender.lock'
+
+
+def parse_hours(value):
+    """``"1-6"`` -> (1, 6): the off-peak window in local hours."""
+    start, _, end = value.partition('-')
+    start, end = int(start), int(end)
+    if not 0 <= start < end <= 24:
+        raise ValueError(f"off-peak hours must look like 1-6, not {value!r}")
+    return start, end
+
+
+def closed_week(monday):
+    """Epoch bounds [start, end) of the ISO week that ended as ``monday`` began."""
+    end = datetime.combine(monday, dt_time.min)
+    return int((end - timedelta(days=7)).timestamp()), int(end.timestamp())
+
+
+def lower_thread_priority():
+    """Make the calling thread the first to give way (Linux: per-thread nice 19)."""
+    if sys.platform.startswith('linux'):
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError):
+            pass
+
+
+class WeeklyPrerender:
+    """Pre-render last week's reports on Monday in the off-peak ``hours``.
+
+    ``members(start_ts, end_ts)`` lists who to render for a closed week and
+    ``render(member_id, today)`` renders one report unless it is already
+    cached, returning whether it did. ``lock_path`` (a file) serializes the
+    runs of all worker processes. Failures are logged to ``logger``.
+    """
+
+    def __init__(self, members, render, lock_path, hours=DEFAULT_HOURS, pause=DEFAULT_PAUSE,
+                 clock=datetime.now, logger=None):
+        self.members = members
+        self.render = render
+        self.lock_path = lock_path
+        self.hours = hours
+        self.pause = pause
+        self.clock = clock
+        self.logger = logger or logging.getLogger(__name__)
+        self.after_fork()
+
+    def after_fork(self):
+        """Forget the parent's thread: threads do not survive fork()."""
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._done_week = None
+        self.started = False
+
+    def start(self):
+        """Start the background thread once per process."""
+        if self.started:
+            return
+        with self._lock:
+            if self.started:
+                return
+            self.started = True
+            self._thread = threading.Thread(target=self._loop, name='aceest-prerender', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def _window(self, day):
+        start, end = self.hours
+        midnight = datetime.combine(day, dt_time.min)
+        return midnight + timedelta(hours=start), midnight + timedelta(hours=end)
+
+    def next_run(self, now):
+        """When the next run should start: ``now`` inside an unfinished window, else next Monday's."""
+        monday = now.date() - timedelta(days=now.weekday())
+        opens, closes = self._window(monday)
+        if now < opens:
+            return opens
+        if now < closes and self._done_week != monday.isocalendar()[:2]:
+            return now
+        return self._window(monday + timedelta(days=7))[0]
+
+    def _loop(self):
+        lower_thread_priority()
+        while not self._stop.is_set():
+            now = self.clock()
+            wait = (self.next_run(now) - now).total_seconds()
+            if wait > 0:
+                self._stop.wait(min(wait, MAX_SLEEP))
+                continue
+            try:
+                self.run_once(now.date())
+            except Exception:
+                self.logger.exception("weekly report pre-rendering failed")
+                self._stop.wait(60)
+
+    def run_once(self, monday):
+        """Render the reports of the week closed by ``monday``; returns how many were rendered.
+
+        Stops early, leaving the rest uncached, if the window closes or the
+        scheduler is stopped.
+        """
+        closes = self._window(monday)[1]
+        with open(self.lock_path, 'a') as lock_file:
+            while not self._try_lock(lock_file):
+                if self._stop.wait(LOCK_RETRY) or self.clock() >= closes:
+                    return 0
+            rendered, finished = 0, True
+            for member_id in self.members(*closed_week(monday)):
+                if self._stop.is_set() or self.clock() >= closes:
+                    finished = False
+                    break
+                try:
+                    if not self.render(member_id, monday):
+                        continue
+                except Exception:
+                    self.logger.exception("pre-rendering the report of %s failed", member_id)
+                    continue
+                rendered += 1
+                self._stop.wait(self.pause)
+        if finished:
+            self._done_week = monday.isocalendar()[:2]
+        return rendered
+
+    @staticmethod
+    def _try_lock(lock_file):
+        # Released when the file is closed.
+        if fcntl is None:
+            return True
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
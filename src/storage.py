@@ -0,0 +1,1038 @@
+# Storage backends for ACEestFitness and Gym
+#
+# The Flask routes talk to a store object instead of module-level dicts so the
+# app can run on several gunicorn workers against one shared SQLite file.
+# All state is partitioned by member (the Regn-ID); GUEST_MEMBER holds logs
+# made before a profile is saved.
+#
+# Concurrency model (MemoryStore, for gunicorn gthread workers):
+#   * Read-copy-update. Each MemberShard publishes an immutable ShardVersion
+#     (profile, visible log lengths, position indexes, aggregates). Writers (add_workout,
+#     save_profile) serialize on the shard's mutex, append to the member's
+#     append-only logs, build the next version and publish it with a single
+#     attribute store. Journal record and publish happen under that mutex.
+#   * Readers take no lock: read(member_id) grabs the current version once
+#     and returns a MemberView over it. A long /summary render or PDF export
+#     keeps a self-consistent snapshot and never blocks /add.
+#   * _shards_lock guards the shard directory. It is taken to create a shard
+#     and, before any shard mutex, by clear() and checkpoint().
+#   * Writers do not touch the gym-wide ColumnStore: they queue their rows
+#     and columns() folds the queue in under _columns_lock (a writer helps
+#     only when the queue is long and the lock is free), then returns a
+#     frozen view that later appends cannot change. So a write never waits
+#     on another member's write or on the arrays growing.
+# SQLite handles this itself: writes are transactions and read() runs its
+# queries inside one read transaction (a WAL snapshot), which writers do
+# not block.
+import os
+import json
+import bisect
+import heapq
+import sqlite3
+import threading
+import time
+import itertools
+import weakref
+from collections import deque
+from collections.abc import Sequence
+from datetime import date
+from types import MappingProxyType
+
+from src.aggregates import AggregateTracker
+from src.columnar import ColumnStore
+from src.journal import (
+    KIND_BATCH,
+    KIND_CLEAR,
+    KIND_PROFILE,
+    KIND_WORKOUT,
+    Journal,
+    decode_batch,
+    decode_profile,
+    decode_workout,
+    encode_batch,
+    encode_profile,
+    encode_workout,
+)
+from src.models import CATEGORIES, WorkoutEntry
+
+GUEST_MEMBER = ''
+# Rows fetched per query by SQLiteStore.export_workouts.
+EXPORT_PAGE_SIZE = 1000
+# Queued columnar batches past which a writer folds them in, if no reader is.
+COLUMNS_QUEUE_LIMIT = 256
+CATEGORY_INDEX = {category: index for index, category in enumerate(CATEGORIES)}
+
+
+class MemberView:
+    """A consistent read of one member: profile, log and aggregates from the same moment.
+
+    Treat it as read-only; the memory store shares it between requests.
+    ``version`` and ``modified`` are the member's data version and the time
+    of its last change (see WorkoutStore.data_version).
+    """
+
+    __slots__ = ('member_id', 'profile', 'workouts', 'aggregates', 'version', 'modified')
+
+    def __init__(self, member_id, profile, workouts, aggregates, version=0, modified=None):
+        self.member_id = member_id
+        self.profile = profile
+        self.workouts = workouts
+        self.aggregates = aggregates
+        self.version = version
+        self.modified = modified
+
+
+class WorkoutStore:
+    """Interface shared by all storage backends.
+
+    Every mutation gives the affected member a new data version drawn from
+    one store-wide increasing counter, so a version is never reused, not
+    even after clear(). ``epoch`` identifies the counter: it changes
+    whenever the counter may have restarted (a new memory store, a new
+    database file).
+    """
+
+    epoch = ''
+
+    def read(self, member_id):
+        """Return a MemberView of one member."""
+        raise NotImplementedError
+
+    def read_recent(self, member_id, limit):
+        """Like read(), but each category's log holds only its ``limit`` newest entries.
+
+        "Newest" orders by (ts, id), newest first, so entries backfilled with
+        old timestamps land where they belong.
+        """
+        raise NotImplementedError
+
+    def workouts_before(self, member_id, category, before, limit):
+        """Up to ``limit`` entries of one category older than ``before``, newest first.
+
+        ``before`` is a (ts, id) position, usually that of the last entry of
+        the previous page; later additions never shift the next page.
+        """
+        raise NotImplementedError
+
+    def read_page(self, member_id, offset, limit):
+        """Like read(), but each category's log holds only entries [offset, offset + limit).
+
+        Profile and aggregates still cover the whole history, so
+        ``aggregates.sessions[category]`` gives each log's full length.
+        """
+        raise NotImplementedError
+
+    def export_workouts(self, member_id=None, categories=None, start_ts=None, end_ts=None):
+        """Lazily yield (member_id, entry) for one member, or everyone, oldest first.
+
+        Filters: ``categories`` and the half-open window [start_ts, end_ts).
+        Rows come grouped by member (in members() order) and by id within a
+        member. No lock or transaction is held between rows, so a long
+        export never stalls writers; entries added while it runs may or may
+        not be included.
+        """
+        raise NotImplementedError
+
+    def add_workout(self, member_id, entry):
+        """Append one WorkoutEntry to a member's log; assigns ``entry.id``."""
+        raise NotImplementedError
+
+    def add_workouts(self, member_id, entries):
+        """Append a batch of entries atomically, under one lock or transaction.
+
+        Readers and crash recovery see all of the batch or none of it.
+        Assigns each ``entry.id``.
+        """
+        raise NotImplementedError
+
+    def import_workouts(self, batches):
+        """Append entries for many members: ``batches`` maps member id to entries.
+
+        Each member's entries are added atomically, as by add_workouts;
+        stores may commit the whole mapping at once (bulk imports).
+        """
+        for member_id, entries in batches.items():
+            self.add_workouts(member_id, entries)
+
+    def data_version(self, member_id):
+        """Return (version, modified) for one member without reading its data.
+
+        ``version`` is 0 and ``modified`` (epoch seconds) is None for a
+        member that has never changed.
+        """
+        raise NotImplementedError
+
+    def workouts(self, member_id):
+        """Return {category: [entries]} for one member, in insertion order."""
+        raise NotImplementedError
+
+    def daily_workouts(self, member_id):
+        """Return {ISO date: {category: [entries]}} for one member."""
+        raise NotImplementedError
+
+    def aggregates(self, member_id):
+        """Return an AggregateTracker with one member's running totals."""
+        raise NotImplementedError
+
+    def columns(self):
+        """Return a ColumnStore with the gym-wide log, for vectorized reports."""
+        raise NotImplementedError
+
+    def get_profile(self, member_id):
+        """Return a member's saved profile, or an empty dict."""
+        raise NotImplementedError
+
+    def save_profile(self, member_id, profile):
+        """Replace a member's saved profile."""
+        raise NotImplementedError
+
+    def members(self):
+        """Return the ids of every member with a profile or a logged workout."""
+        raise NotImplementedError
+
+    def active_members(self, start_ts, end_ts):
+        """Return the ids of the members who logged a session in [start_ts, end_ts)."""
+        raise NotImplementedError
+
+    def clear(self):
+        """Drop every member's workouts and profile."""
+        raise NotImplementedError
+
+    def after_fork(self):
+        """Re-create process-local resources in a freshly forked worker."""
+
+    def close(self):
+        pass
+
+
+class LogSlice(Sequence):
+    """Read-only view of the first ``length`` entries of an append-only list.
+
+    Writers only ever append to the backing list, so the prefix a version
+    points at never changes and can be shared without copying.
+    """
+
+    __slots__ = ('_entries', '_length')
+
+    def __init__(self, entries, length):
+        self._entries = entries
+        self._length = length
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            entries = self._entries
+            return [entries[i] for i in range(self._length)[index]]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('log index out of range')
+        return self._entries[index]
+
+    def __iter__(self):
+        return itertools.islice(self._entries, self._length)
+
+    def __eq__(self, other):
+        if isinstance(other, Sequence) and not isinstance(other, str):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self):
+        return f"LogSlice({list(self)!r})"
+
+
+def entry_position(entry):
+    """Sort key of the recent-first listings: (timestamp, id)."""
+    return entry.ts, entry.id
+
+
+def _window(entries, index, start_ts, end_ts):
+    """Entries with ``start_ts <= ts < end_ts``, in log order.
+
+    ``index`` is the log sorted by position (a LogSlice of the same
+    length), or None when the log itself is; either way the window is found
+    by bisecting.
+    """
+    if start_ts is None and end_ts is None:
+        return iter(entries)
+    by_ts = entries if index is None else index
+    start = 0 if start_ts is None else bisect.bisect_left(by_ts, start_ts, key=_entry_ts)
+    end = len(by_ts) if end_ts is None else bisect.bisect_left(by_ts, end_ts, key=_entry_ts)
+    window = (by_ts[position] for position in range(start, end))
+    # Ids grow along the log, so sorting by id restores log order.
+    return window if index is None else iter(sorted(window, key=_entry_id))
+
+
+def _entry_ts(entry):
+    return entry.ts
+
+
+def _entry_id(entry):
+    return entry.id
+
+
+def _newest(entries, before, limit):
+    """The ``limit`` entries with the largest position below ``before``, newest first.
+
+    ``entries`` must be sorted by position (see MemberShard.by_position).
+    """
+    end = len(entries) if before is None else bisect.bisect_left(entries, tuple(before), key=entry_position)
+    return entries[max(0, end - limit):end][::-1]
+
+
+class ShardVersion:
+    """Immutable state of one member, published by writers and shared by readers."""
+
+    __slots__ = ('version', 'modified', 'profile', 'lengths', 'indexes', 'aggregates')
+
+    def __init__(self, version, profile, lengths, aggregates, modified=None, indexes=None):
+        self.version = version        # store-wide data version of this state
+        self.modified = modified      # epoch seconds it was published
+        self.profile = profile        # MappingProxyType, never mutated
+        self.lengths = lengths        # tuple: visible log length per category
+        # tuple: per category, the log sorted by position, or None while the
+        # log itself is; like the logs, only ever appended to past lengths
+        self.indexes = indexes or (None,) * len(lengths)
+        self.aggregates = aggregates  # AggregateTracker, never mutated once published
+
+
+class MemberShard:
+    """One member's log plus the currently published ShardVersion.
+
+    ``lock`` serializes writers. Readers take no lock at all: they read
+    ``current`` once (an atomic attribute load) and use that version for
+    the whole request.
+    """
+
+    __slots__ = ('member_id', 'lock', 'logs', 'current')
+
+    def __init__(self, member_id):
+        self.member_id = member_id
+        self.lock = threading.Lock()
+        self.logs = tuple([] for _ in CATEGORIES)
+        self.current = ShardVersion(0, MappingProxyType({}), (0,) * len(CATEGORIES), AggregateTracker())
+
+    def apply(self, entries, version):
+        """Append entries and publish them together as ``version`` (call with ``lock`` held).
+
+        Readers see either none or all of ``entries``. Everything that can
+        fail runs before the first log is touched, so an exception leaves
+        the shard as it was.
+
+        Entries arriving in position order are appended to the category's
+        index too. An older one (a backfill) goes into a sorted copy of the
+        index, made once per batch, so versions already published keep
+        theirs unchanged.
+        """
+        old = self.current
+        lengths = list(old.lengths)
+        indexes = list(old.indexes)
+        copied = set()
+        aggregates = old.aggregates.copy()
+        codes = []
+        for entry in entries:
+            code = CATEGORY_INDEX[entry.category]
+            aggregates.add(entry.category, entry.duration, entry.calories, entry.day)
+            lengths[code] += 1
+            codes.append(code)
+        for code, entry in zip(codes, entries):
+            log, index = self.logs[code], indexes[code]
+            in_order = not log or entry_position(entry) > entry_position((log if index is None else index)[-1])
+            if not in_order and code not in copied:
+                index = indexes[code] = list(log if index is None else index)
+                copied.add(code)
+            log.append(entry)
+            if index is not None:
+                if in_order:
+                    index.append(entry)
+                else:
+                    bisect.insort(index, entry, key=entry_position)
+        self.current = ShardVersion(version, old.profile, tuple(lengths), aggregates, time.time(), tuple(indexes))
+
+    def set_profile(self, profile, version):
+        """Publish ``profile`` as ``version`` (call with ``lock`` held)."""
+        old = self.current
+        self.current = ShardVersion(version, MappingProxyType(dict(profile)), old.lengths, old.aggregates,
+                                    time.time(), old.indexes)
+
+    def by_position(self, code, version=None):
+        """Category ``code``'s log in ``version``, sorted by (timestamp, id)."""
+        version = version or self.current
+        index = version.indexes[code]
+        return LogSlice(self.logs[code] if index is None else index, version.lengths[code])
+
+    def view(self, version=None):
+        version = version or self.current
+        workouts = {
+            category: LogSlice(log, length)
+            for category, log, length in zip(CATEGORIES, self.logs, version.lengths)
+        }
+        return MemberView(self.member_id, version.profile, workouts, version.aggregates,
+                          version.version, version.modified)
+
+
+class MemoryStore(WorkoutStore):
+    """Process-local store (default), sharded per member.
+
+    Writers lock only their member's shard, so members never contend with
+    each other, and readers never lock (see the concurrency model at the
+    top of this module).
+
+    State is lost on restart unless a Journal is attached, in which case
+    every mutation is journaled before it is applied and the journal is
+    replayed on construction.
+    """
+
+    def __init__(self, journal=None):
+        self._shards_lock = threading.Lock()
+        self._columns_lock = threading.Lock()
+        self._journal = None
+        # Not part of _reset(): versions must keep increasing across clear().
+        self._versions = itertools.count(1)
+        self.epoch = os.urandom(4).hex()
+        self._reset()
+        if journal is not None:
+            self._recover(journal)
+
+    def _recover(self, journal):
+        """Replay ``journal`` into the (empty) store, then journal every change to it."""
+        journal.replay(self._apply_record)
+        self._ids = itertools.count(self._last_replayed_id + 1)
+        journal.start(checkpoint=self.checkpoint)
+        self._journal = journal
+
+    def _reset(self):
+        self._shards = {}
+        with self._columns_lock:
+            self._columns = ColumnStore()
+            # (entries, member_id) batches not yet in _columns.
+            self._columns_queue = deque()
+        self._ids = itertools.count(1)
+        self._last_replayed_id = 0
+
+    def _shard(self, member_id, create=False):
+        shard = self._shards.get(member_id)
+        if shard is None and create:
+            with self._shards_lock:
+                shard = self._shards.get(member_id)
+                if shard is None:
+                    shard = self._shards[member_id] = MemberShard(member_id)
+        return shard
+
+    def _acquire_shard(self, member_id):
+        """Return the member's shard with its writer lock held."""
+        while True:
+            shard = self._shard(member_id, create=True)
+            shard.lock.acquire()
+            if self._shards.get(member_id) is shard:
+                return shard
+            shard.lock.release()  # cleared while we waited; use the new shard
+
+    def _apply(self, shard, entries):
+        shard.apply(entries, next(self._versions))
+        queue = self._columns_queue
+        queue.append((entries, shard.member_id))
+        if len(queue) >= COLUMNS_QUEUE_LIMIT and self._columns_lock.acquire(blocking=False):
+            try:
+                self._fold_columns()
+            finally:
+                self._columns_lock.release()
+
+    def _fold_columns(self):
+        """Move the queued batches into the ColumnStore; call with _columns_lock held."""
+        queue = self._columns_queue
+        for _ in range(len(queue)):
+            entries, member_id = queue.popleft()
+            self._columns.extend(entries, member_id)
+
+    def _apply_record(self, kind, payload):
+        if kind == KIND_WORKOUT:
+            member_id, entry = decode_workout(payload)
+            self._last_replayed_id = max(self._last_replayed_id, entry.id)
+            self._apply(self._shard(member_id, create=True), [entry])
+        elif kind == KIND_BATCH:
+            member_id, entries = decode_batch(payload)
+            self._last_replayed_id = max([self._last_replayed_id] + [entry.id for entry in entries])
+            self._apply(self._shard(member_id, create=True), entries)
+        elif kind == KIND_PROFILE:
+            member_id, profile = decode_profile(payload)
+            self._shard(member_id, create=True).set_profile(profile, next(self._versions))
+        elif kind == KIND_CLEAR:
+            self._reset()
+
+    def _lock_all(self):
+        """Stop the writers: _shards_lock, then every shard lock in member order."""
+        self._shards_lock.acquire()
+        shards = [self._shards[member_id] for member_id in sorted(self._shards)]
+        for shard in shards:
+            shard.lock.acquire()
+        return shards
+
+    def _unlock_all(self, shards):
+        for shard in reversed(shards):
+            shard.lock.release()
+        self._shards_lock.release()
+
+    def add_workout(self, member_id, entry):
+        shard = self._acquire_shard(member_id)
+        try:
+            entry.id = next(self._ids)
+            if self._journal:
+                self._journal.append(KIND_WORKOUT, encode_workout(member_id, entry))
+            self._apply(shard, [entry])
+        finally:
+            shard.lock.release()
+
+    def add_workouts(self, member_id, entries):
+        entries = list(entries)
+        if not entries:
+            return
+        shard = self._acquire_shard(member_id)
+        try:
+            for entry in entries:
+                entry.id = next(self._ids)
+            if self._journal:
+                # One record, so a crash keeps all of the batch or none of it.
+                self._journal.append(KIND_BATCH, encode_batch(member_id, entries))
+            self._apply(shard, entries)
+        finally:
+            shard.lock.release()
+
+    def read(self, member_id):
+        shard = self._shard(member_id)
+        if shard is None:
+            return MemberView(member_id, MappingProxyType({}),
+                              {category: LogSlice([], 0) for category in CATEGORIES}, AggregateTracker())
+        return shard.view()
+
+    def read_recent(self, member_id, limit):
+        shard = self._shard(member_id)
+        if shard is None:
+            return self.read(member_id)
+        version = shard.current
+        view = shard.view(version)
+        workouts = {
+            category: _newest(shard.by_position(code, version), None, limit)
+            for code, category in enumerate(CATEGORIES)
+        }
+        return MemberView(member_id, view.profile, workouts, view.aggregates, view.version, view.modified)
+
+    def workouts_before(self, member_id, category, before, limit):
+        shard = self._shard(member_id)
+        if shard is None:
+            return []
+        return _newest(shard.by_position(CATEGORY_INDEX[category]), before, limit)
+
+    def read_page(self, member_id, offset, limit):
+        view = self.read(member_id)
+        workouts = {category: entries[offset:offset + limit] for category, entries in view.workouts.items()}
+        return MemberView(member_id, view.profile, workouts, view.aggregates, view.version, view.modified)
+
+    def export_workouts(self, member_id=None, categories=None, start_ts=None, end_ts=None):
+        codes = [CATEGORY_INDEX[category] for category in categories or CATEGORIES]
+        for member in self.members() if member_id is None else [member_id]:
+            shard = self._shard(member)
+            if shard is None:
+                continue
+            # One published version per member: its log prefix never changes.
+            version = shard.current
+            logs = [
+                _window(LogSlice(shard.logs[code], version.lengths[code]),
+                        None if version.indexes[code] is None else shard.by_position(code, version), start_ts, end_ts)
+                for code in codes
+            ]
+            for entry in heapq.merge(*logs, key=_entry_id):
+                yield member, entry
+
+    def data_version(self, member_id):
+        shard = self._shard(member_id)
+        if shard is None:
+            return 0, None
+        version = shard.current
+        return version.version, version.modified
+
+    def workouts(self, member_id):
+        return self.read(member_id).workouts
+
+    def daily_workouts(self, member_id):
+        # Derived from the published log rather than kept as a second index.
+        daily = {}
+        for category, entries in self.read(member_id).workouts.items():
+            for entry in entries:
+                day = daily.setdefault(entry.date_str, {c: [] for c in CATEGORIES})
+                day[category].append(entry)
+        return daily
+
+    def aggregates(self, member_id):
+        return self.read(member_id).aggregates
+
+    def columns(self):
+        with self._columns_lock:
+            self._fold_columns()
+            return self._columns.frozen()
+
+    def get_profile(self, member_id):
+        return dict(self.read(member_id).profile)
+
+    def save_profile(self, member_id, profile):
+        profile = dict(profile)
+        shard = self._acquire_shard(member_id)
+        try:
+            if self._journal:
+                self._journal.append(KIND_PROFILE, encode_profile(member_id, profile))
+            shard.set_profile(profile, next(self._versions))
+        finally:
+            shard.lock.release()
+
+    def members(self):
+        return sorted(self._shards)
+
+    def active_members(self, start_ts, end_ts):
+        return sorted(self.columns().active_members(start_ts, end_ts))
+
+    def clear(self):
+        shards = self._lock_all()
+        try:
+            if self._journal:
+                self._journal.append(KIND_CLEAR, b'')
+            self._reset()
+        finally:
+            self._unlock_all(shards)
+
+    def checkpoint(self):
+        """Snapshot the current state and drop the journal segments it covers."""
+        shards = self._lock_all()
+        try:
+            generation = self._journal.rotate()
+            # Published versions are immutable, so they can be serialized
+            # after the writers are released.
+            views = [shard.view() for shard in shards]
+        finally:
+            self._unlock_all(shards)
+        # Outside the writer locks: the sealed segment must reach the disk
+        # even if writing the snapshot fails.
+        self._journal.sync()
+
+        def records():
+            for view in views:
+                if view.profile:
+                    yield KIND_PROFILE, encode_profile(view.member_id, dict(view.profile))
+            streams = [
+                zip(itertools.repeat(view.member_id), entries)
+                for view in views
+                for entries in view.workouts.values()
+            ]
+            for member_id, entry in heapq.merge(*streams, key=lambda item: item[1].id):
+                yield KIND_WORKOUT, encode_workout(member_id, entry)
+
+        self._journal.write_snapshot(generation, records())
+
+    def after_fork(self):
+        # The child has a single thread, so nobody holds these; locks taken
+        # by parent threads at fork time would otherwise stay locked forever.
+        self._shards_lock = threading.Lock()
+        self._columns_lock = threading.Lock()
+        for shard in self._shards.values():
+            shard.lock = threading.Lock()
+        if self._journal:
+            # The parent's state may be older than the journal (a worker
+            # replacing a dead one), so rebuild it from disk. Versions
+            # restart from the parent's counter, hence a new epoch.
+            journal, self._journal = self._journal, None
+            journal.after_fork()
+            self._reset()
+            self.epoch = os.urandom(4).hex()
+            self._recover(journal)
+
+    def close(self):
+        if self._journal:
+            self._journal.close()
+            self._journal = None
+
+
+class _ThreadConnection:
+    """One thread's SQLite connection, closed once the thread is gone."""
+
+    __slots__ = ('conn', 'close', '__weakref__')
+
+    def __init__(self, conn):
+        self.conn = conn
+        # Only the thread's threading.local holds this, and drops it when the thread ends.
+        self.close = weakref.finalize(self, conn.close)
+
+
+class SQLiteStore(WorkoutStore):
+    """SQLite store in WAL mode, safe to share between gunicorn workers.
+
+    Each thread gets its own connection (sqlite3 connections must not cross
+    threads or forks), closed when the thread ends. Statements are constant
+    strings so the per-connection statement cache keeps them prepared. Every
+    table is keyed by member id first, so per-member pages only touch that
+    member's index range.
+    """
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS workouts (
+            id INTEGER PRIMARY KEY,
+            member_id TEXT NOT NULL,
+            category TEXT NOT NULL,
+            workout TEXT NOT NULL,
+            duration INTEGER NOT NULL,
+            calories INTEGER NOT NULL,
+            ts INTEGER NOT NULL,
+            day TEXT NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_workouts_member ON workouts (member_id, id)",
+        # Created by earlier versions; no query uses it.
+        "DROP INDEX IF EXISTS idx_workouts_member_ts",
+        "CREATE INDEX IF NOT EXISTS idx_workouts_member_category ON workouts (member_id, category, id)",
+        "CREATE INDEX IF NOT EXISTS idx_workouts_member_category_ts ON workouts (member_id, category, ts, id)",
+        # Running totals, updated in the same transaction as each insert.
+        """CREATE TABLE IF NOT EXISTS category_totals (
+            member_id TEXT NOT NULL,
+            category TEXT NOT NULL,
+            sessions INTEGER NOT NULL,
+            minutes INTEGER NOT NULL,
+            PRIMARY KEY (member_id, category)
+        )""",
+        """CREATE TABLE IF NOT EXISTS daily_calories (
+            member_id TEXT NOT NULL,
+            day TEXT NOT NULL,
+            calories INTEGER NOT NULL,
+            PRIMARY KEY (member_id, day)
+        )""",
+        """CREATE TABLE IF NOT EXISTS profiles (
+            member_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        )""",
+        # Data versions: one store-wide counter, and each member's latest value.
+        """CREATE TABLE IF NOT EXISTS store_meta (
+            key TEXT PRIMARY KEY,
+            value NOT NULL
+        )""",
+        "INSERT OR IGNORE INTO store_meta (key, value) VALUES ('epoch', lower(hex(randomblob(4))))",
+        "INSERT OR IGNORE INTO store_meta (key, value) VALUES ('version', 0)",
+        """CREATE TABLE IF NOT EXISTS member_versions (
+            member_id TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            modified REAL NOT NULL
+        )""",
+    )
+
+    SQL_INSERT_WORKOUT = (
+        "INSERT INTO workouts (member_id, category, workout, duration, calories, ts, day) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)"
+    )
+    SQL_SELECT_WORKOUTS = (
+        "SELECT id, category, workout, duration, calories, ts, day FROM workouts "
+        "WHERE member_id = ? ORDER BY id"
+    )
+    SQL_SELECT_CATEGORY_PAGE = (
+        "SELECT id, category, workout, duration, calories, ts, day FROM workouts "
+        "WHERE member_id = ? AND category = ? ORDER BY id LIMIT ? OFFSET ?"
+    )
+    SQL_SELECT_RECENT = (
+        "SELECT id, category, workout, duration, calories, ts, day FROM workouts "
+        "WHERE member_id = ? AND category = ? ORDER BY ts DESC, id DESC LIMIT ?"
+    )
+    SQL_SELECT_BEFORE = (
+        "SELECT id, category, workout, duration, calories, ts, day FROM workouts "
+        "WHERE member_id = ? AND category = ? AND (ts, id) < (?, ?) ORDER BY ts DESC, id DESC LIMIT ?"
+    )
+    # Export pages, resumed after the last id sent.
+    SQL_EXPORT_PAGE = (
+        "SELECT id, category, workout, duration, calories, ts FROM workouts "
+        "WHERE member_id = ? AND id > ? AND ts >= ? AND ts < ? ORDER BY id LIMIT ?"
+    )
+    SQL_SELECT_ALL_WORKOUTS = (
+        "SELECT id, category, workout, duration, calories, ts, member_id FROM workouts ORDER BY id"
+    )
+    SQL_BUMP_CATEGORY = (
+        "INSERT INTO category_totals (member_id, category, sessions, minutes) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT (member_id, category) DO UPDATE SET "
+        "sessions = sessions + excluded.sessions, minutes = minutes + excluded.minutes"
+    )
+    SQL_BUMP_DAY = (
+        "INSERT INTO daily_calories (member_id, day, calories) VALUES (?, ?, ?) "
+        "ON CONFLICT (member_id, day) DO UPDATE SET calories = calories + excluded.calories"
+    )
+    SQL_SELECT_CATEGORY_TOTALS = "SELECT category, sessions, minutes FROM category_totals WHERE member_id = ?"
+    SQL_SELECT_RECENT_DAYS = (
+        "SELECT day, calories FROM daily_calories WHERE member_id = ? ORDER BY day DESC LIMIT 7"
+    )
+    SQL_SELECT_PROFILE = "SELECT data FROM profiles WHERE member_id = ?"
+    SQL_UPSERT_PROFILE = (
+        "INSERT INTO profiles (member_id, data) VALUES (?, ?) "
+        "ON CONFLICT (member_id) DO UPDATE SET data = excluded.data"
+    )
+    SQL_SELECT_EPOCH = "SELECT value FROM store_meta WHERE key = 'epoch'"
+    SQL_BUMP_VERSION = "UPDATE store_meta SET value = value + 1 WHERE key = 'version'"
+    SQL_TOUCH_MEMBER = (
+        "INSERT INTO member_versions (member_id, version, modified) "
+        "SELECT ?, value, ? FROM store_meta WHERE key = 'version' "
+        "ON CONFLICT (member_id) DO UPDATE SET version = excluded.version, modified = excluded.modified"
+    )
+    SQL_SELECT_VERSION = "SELECT version, modified FROM member_versions WHERE member_id = ?"
+    SQL_SELECT_ACTIVE_MEMBERS = "SELECT DISTINCT member_id FROM workouts WHERE ts >= ? AND ts < ? ORDER BY 1"
+    SQL_SELECT_MEMBERS = (
+        "SELECT member_id FROM profiles UNION SELECT member_id FROM category_totals ORDER BY 1"
+    )
+
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        # Live threads' connections, for close(); a finished thread's is closed and dropped.
+        self._connections = weakref.WeakSet()
+        self._connections_lock = threading.Lock()
+        self._pid = os.getpid()
+        conn = self._conn()
+        with conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+            self._backfill_aggregates(conn)
+        self.epoch = conn.execute(self.SQL_SELECT_EPOCH).fetchone()[0]
+
+    @staticmethod
+    def _backfill_aggregates(conn):
+        # Databases created before the totals tables existed: rebuild them once.
+        if conn.execute("SELECT 1 FROM category_totals LIMIT 1").fetchone():
+            return
+        conn.execute(
+            "INSERT INTO category_totals (member_id, category, sessions, minutes) "
+            "SELECT member_id, category, COUNT(*), SUM(duration) FROM workouts GROUP BY member_id, category"
+        )
+        conn.execute("DELETE FROM daily_calories")
+        conn.execute(
+            "INSERT INTO daily_calories (member_id, day, calories) "
+            "SELECT member_id, day, SUM(calories) FROM workouts GROUP BY member_id, day"
+        )
+
+    def _conn(self):
+        # A forked worker must not reuse its parent's connections.
+        if self._pid != os.getpid():
+            self._local = threading.local()
+            self._connections = weakref.WeakSet()
+            self._pid = os.getpid()
+        holder = getattr(self._local, 'holder', None)
+        if holder is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False, cached_statements=64)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            holder = self._local.holder = _ThreadConnection(conn)
+            with self._connections_lock:
+                self._connections.add(holder)
+        return holder.conn
+
+    @staticmethod
+    def _row_to_entry(row):
+        return WorkoutEntry(row[1], row[2], row[3], row[4], row[5], id=row[0])
+
+    def add_workout(self, member_id, entry):
+        self.add_workouts(member_id, [entry])
+
+    def add_workouts(self, member_id, entries):
+        self.import_workouts({member_id: entries})
+
+    def import_workouts(self, batches):
+        conn = self._conn()
+        with conn:
+            for member_id, entries in batches.items():
+                self._insert(conn, member_id, entries)
+
+    def _insert(self, conn, member_id, entries):
+        """Insert one member's entries (inside the caller's transaction); assigns ids."""
+        entries = list(entries)
+        if not entries:
+            return
+        # Totals are summed per batch, so a large import bumps each category
+        # and day row once instead of once per entry.
+        rows, sessions, minutes, calories = [], {}, {}, {}
+        for entry in entries:
+            day = entry.date_str
+            rows.append((member_id, entry.category, entry.workout, entry.duration, entry.calories, entry.ts, day))
+            sessions[entry.category] = sessions.get(entry.category, 0) + 1
+            minutes[entry.category] = minutes.get(entry.category, 0) + entry.duration
+            calories[day] = calories.get(day, 0) + entry.calories
+        conn.executemany(self.SQL_INSERT_WORKOUT, rows)
+        # The transaction holds the write lock, so the rows got consecutive
+        # rowids ending at the last one inserted.
+        last = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        conn.executemany(self.SQL_BUMP_CATEGORY, [
+            (member_id, category, count, minutes[category]) for category, count in sessions.items()
+        ])
+        conn.executemany(self.SQL_BUMP_DAY, [(member_id, day, total) for day, total in calories.items()])
+        self._touch(conn, member_id)
+        for entry_id, entry in enumerate(entries, last - len(entries) + 1):
+            entry.id = entry_id
+
+    def _touch(self, conn, member_id):
+        """Give ``member_id`` the next data version (inside the caller's transaction)."""
+        conn.execute(self.SQL_BUMP_VERSION)
+        conn.execute(self.SQL_TOUCH_MEMBER, (member_id, time.time()))
+
+    def read(self, member_id):
+        conn = self._conn()
+        # One read transaction, so every query sees the same WAL snapshot.
+        conn.execute("BEGIN")
+        try:
+            version, modified = self.data_version(member_id)
+            return MemberView(member_id, self.get_profile(member_id), self.workouts(member_id),
+                              self.aggregates(member_id), version, modified)
+        finally:
+            conn.rollback()
+
+    def read_recent(self, member_id, limit):
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            version, modified = self.data_version(member_id)
+            workouts = {
+                category: [self._row_to_entry(row) for row in conn.execute(
+                    self.SQL_SELECT_RECENT, (member_id, category, limit))]
+                for category in CATEGORIES
+            }
+            return MemberView(member_id, self.get_profile(member_id), workouts,
+                              self.aggregates(member_id), version, modified)
+        finally:
+            conn.rollback()
+
+    def workouts_before(self, member_id, category, before, limit):
+        ts, entry_id = before
+        rows = self._conn().execute(self.SQL_SELECT_BEFORE, (member_id, category, ts, entry_id, limit))
+        return [self._row_to_entry(row) for row in rows]
+
+    def read_page(self, member_id, offset, limit):
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            version, modified = self.data_version(member_id)
+            workouts = {
+                category: [self._row_to_entry(row) for row in conn.execute(
+                    self.SQL_SELECT_CATEGORY_PAGE, (member_id, category, limit, offset))]
+                for category in CATEGORIES
+            }
+            return MemberView(member_id, self.get_profile(member_id), workouts,
+                              self.aggregates(member_id), version, modified)
+        finally:
+            conn.rollback()
+
+    def export_workouts(self, member_id=None, categories=None, start_ts=None, end_ts=None):
+        wanted = set(categories or CATEGORIES)
+        start_ts = -2 ** 63 if start_ts is None else start_ts
+        end_ts = 2 ** 63 - 1 if end_ts is None else end_ts
+        for member in self.members() if member_id is None else [member_id]:
+            last_id = 0
+            while True:
+                # Each page is its own short read, so no snapshot is pinned
+                # (and no WAL checkpoint held back) for the whole export.
+                rows = self._conn().execute(
+                    self.SQL_EXPORT_PAGE, (member, last_id, start_ts, end_ts, EXPORT_PAGE_SIZE)).fetchall()
+                for row in rows:
+                    if row[1] in wanted:
+                        yield member, self._row_to_entry(row)
+                if len(rows) < EXPORT_PAGE_SIZE:
+                    break
+                last_id = rows[-1][0]
+
+    def data_version(self, member_id):
+        row = self._conn().execute(self.SQL_SELECT_VERSION, (member_id,)).fetchone()
+        return (row[0], row[1]) if row else (0, None)
+
+    def workouts(self, member_id):
+        result = {category: [] for category in CATEGORIES}
+        for row in self._conn().execute(self.SQL_SELECT_WORKOUTS, (member_id,)):
+            result[row[1]].append(self._row_to_entry(row))
+        return result
+
+    def daily_workouts(self, member_id):
+        result = {}
+        for row in self._conn().execute(self.SQL_SELECT_WORKOUTS, (member_id,)):
+            day = result.setdefault(row[6], {c: [] for c in CATEGORIES})
+            day[row[1]].append(self._row_to_entry(row))
+        return result
+
+    def aggregates(self, member_id):
+        # Reads at most len(CATEGORIES) + 7 rows, whatever the log size.
+        conn = self._conn()
+        tracker = AggregateTracker()
+        for category, sessions, minutes in conn.execute(self.SQL_SELECT_CATEGORY_TOTALS, (member_id,)):
+            tracker.sessions[category] = sessions
+            tracker.minutes[category] = minutes
+        for day, calories in conn.execute(self.SQL_SELECT_RECENT_DAYS, (member_id,)):
+            tracker.add_day_calories(date.fromisoformat(day).toordinal(), calories)
+        return tracker
+
+    def columns(self):
+        rows = self._conn().execute(self.SQL_SELECT_ALL_WORKOUTS).fetchall()
+        columns = ColumnStore(capacity=len(rows))
+        for member_id, group in itertools.groupby(rows, key=lambda row: row[6]):
+            columns.extend((self._row_to_entry(row) for row in group), member_id)
+        return columns
+
+    def get_profile(self, member_id):
+        row = self._conn().execute(self.SQL_SELECT_PROFILE, (member_id,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def save_profile(self, member_id, profile):
+        conn = self._conn()
+        with conn:
+            conn.execute(self.SQL_UPSERT_PROFILE, (member_id, json.dumps(profile)))
+            self._touch(conn, member_id)
+
+    def members(self):
+        return [row[0] for row in self._conn().execute(self.SQL_SELECT_MEMBERS)]
+
+    def active_members(self, start_ts, end_ts):
+        return [row[0] for row in self._conn().execute(self.SQL_SELECT_ACTIVE_MEMBERS, (start_ts, end_ts))]
+
+    def clear(self):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM workouts")
+            conn.execute("DELETE FROM category_totals")
+            conn.execute("DELETE FROM daily_calories")
+            conn.execute("DELETE FROM profiles")
+            conn.execute("DELETE FROM member_versions")
+
+    def after_fork(self):
+        self._connections_lock = threading.Lock()
+        self._conn()  # drops the parent's connections and opens this worker's own
+
+    def close(self):
+        with self._connections_lock:
+            for holder in list(self._connections):
+                holder.close()
+            self._connections = weakref.WeakSet()
+        self._local = threading.local()
+
+
+def create_store(backend=None, path=None, journal_dir=None):
+    """Build the store selected by ACEEST_STORE ("memory" or "sqlite").
+
+    The memory store is journaled to ACEEST_JOURNAL_DIR when that is set.
+    """
+    backend = (backend or os.environ.get('ACEEST_STORE', 'memory')).lower()
+    if backend == 'memory':
+        journal_dir = journal_dir or os.environ.get('ACEEST_JOURNAL_DIR')
+        return MemoryStore(journal=Journal(journal_dir) if journal_dir else None)
+    if backend == 'sqlite':
+        return SQLiteStore(path or os.environ.get('ACEEST_DB_PATH', 'aceest.db'))
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+def create_cli_store(backend=None, path=None, journal_dir=None):
+    """create_store() for the command-line tools, which run beside the app rather than in it.
+
+    Raises ValueError for a memory store without a journal: the tool would
+    see an empty gym and whatever it wrote would be lost when it exits. A
+    journal directory must belong to a stopped app (else JournalInUse).
+    """
+    backend = (backend or os.environ.get('ACEEST_STORE', 'memory')).lower()
+    if backend == 'memory' and not (journal_dir or os.environ.get('ACEEST_JOURNAL_DIR')):
+        raise ValueError("the memory store keeps nothing after the command exits; "
+                         "use --store sqlite --db PATH, or --journal-dir with a stopped app's journal")
+    return create_store(backend, path, journal_dir)
@@ -0,0 +1,14 @@
+import pytest
+
+from src.storage import MemoryStore, SQLiteStore
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    """Run each test against every storage backend."""
+    if request.param == 'memory':
+        backend = MemoryStore()
+    else:
+        backend = SQLiteStore(str(tmp_path / 'aceest.db'))
+    yield backend
+    backend.close()
@@ -0,0 +1,49 @@
+from datetime import date, timedelta
+
+from src.aggregates import RING_DAYS, AggregateTracker
+
+
+def test_totals_per_category():
+    tracker = AggregateTracker()
+    day = date(2025, 1, 6)
+    tracker.add('Workout', 30, 300, day)
+    tracker.add('Workout', 15, 100, day)
+    tracker.add('Cool-down', 10, 20, day)
+    assert tracker.sessions == {'Warm-up': 0, 'Workout': 2, 'Cool-down': 1}
+    assert tracker.progress_totals() == {'Warm-up': 0, 'Workout': 45, 'Cool-down': 10}
+    assert tracker.total_sessions == 3
+    assert tracker.total_minutes == 55
+
+
+def test_weekly_calories_rolling_window():
+    tracker = AggregateTracker()
+    today = date(2025, 1, 13)
+    for offset in range(10):
+        tracker.add('Workout', 10, 100, today - timedelta(days=offset))
+    # Only today and the six days before it count.
+    assert tracker.weekly_calories(today) == 700
+    # Two days later the two oldest in-window days have dropped out.
+    assert tracker.weekly_calories(today + timedelta(days=2)) == 500
+
+
+def test_ring_bucket_reused_by_newer_day():
+    tracker = AggregateTracker()
+    old = date(2025, 1, 1)
+    tracker.add('Workout', 10, 500, old)
+    newer = old + timedelta(days=RING_DAYS)  # same ring slot
+    tracker.add('Workout', 10, 40, newer)
+    assert tracker.weekly_calories(newer) == 40
+    # A late entry for a day that already left the ring is ignored.
+    tracker.add('Workout', 10, 999, old)
+    assert tracker.weekly_calories(newer) == 40
+    assert tracker.total_minutes == 30
+
+
+def test_entry_stamped_tomorrow_keeps_the_oldest_day_in_window():
+    tracker = AggregateTracker()
+    today = date(2025, 1, 13)
+    tracker.add('Workout', 10, 500, today - timedelta(days=6))
+    # Allowed by the clock-skew margin; must not evict today-6.
+    tracker.add('Workout', 10, 80, today + timedelta(days=1))
+    assert tracker.weekly_calories(today) == 500
+    assert tracker.weekly_calories(today + timedelta(days=1)) == 80
@@ -1,26 +1,44 @@
 import html
+import io
+import json
+import os
 import re
+import subprocess
+import sys
+import time
+import zipfile
+from datetime import date, datetime, timedelta
 import pytest
+from markupsafe import Markup
 from src.app import (
     app,
-    workouts,
+    create_app,
+    init_worker,
+    make_report_id,
+    render_member_report,
+    report_key,
+    HEAVY_MODULES,
+    HOME_LOG_SIZE,
+    TEMPLATES,
+    FRAGMENTS,
+    store,
     CATEGORIES,
     WORKOUT_CHART_DATA,
     DIET_PLANS,
-    user_info,
     MET_VALUES,
 )
+from src.batch import BATCH_LOCK_NAME, try_batch_lock
+from src.models import WorkoutEntry
+from src.reports import ReportOutdated, ReportQueueFull
+from src.storage import GUEST_MEMBER, MemoryStore
 
 @pytest.fixture(autouse=True)
 def client():
-    """Provide a test client and clear global mutable state for isolation."""
+    """Provide a test client and clear the store for isolation."""
     app.config['TESTING'] = True
     app.config['SECRET_KEY'] = 'test-secret'
-    # Clear workouts
-    for entries in workouts.values():
-        entries.clear()
-    # Clear user profile
-    user_info.clear()
+    # Clear workouts and user profile
+    store.clear()
     with app.test_client() as client:
         yield client
 
@@ -48,7 +66,7 @@ def test_add_workout_valid(client):
     assert b'30 min' in response.data
     assert b'250 cal' in response.data
     assert '✅ Added Running (30 min) to Workout.'.encode() in response.data
-    assert len(workouts['Workout']) == 1
+    assert len(store.workouts(GUEST_MEMBER)['Workout']) == 1
 
 def test_add_workout_invalid(client):
     # Missing fields
@@ -61,7 +79,7 @@ def test_add_workout_invalid(client):
     assert response.status_code == 200
     assert b'Please fill in all fields before submitting.' in response.data
     assert b'No workouts logged yet.' in response.data
-    assert sum(len(entries) for entries in workouts.values()) == 0
+    assert sum(len(entries) for entries in store.workouts(GUEST_MEMBER).values()) == 0
 
 def test_multiple_workouts(client):
     client.post('/add', data={'workout': 'Cycling', 'duration': '45', 'calories': '400', 'category': 'Warm-up'}, follow_redirects=True)
@@ -121,6 +139,11 @@ def test_add_workout_boundary_and_invalid_values(client):
     assert b'1000000 min' in resp.data
     assert b'999999999 cal' in resp.data
 
+    # Beyond the int32 columns: rejected rather than overflowing
+    resp = client.post('/add', data={'workout': 'Huge', 'duration': str(2 ** 31), 'calories': '1', 'category': 'Workout'}, follow_redirects=True)
+    assert b'Duration and calories are too large.' in resp.data
+    assert b'Huge' not in resp.data
+
 
 def test_index_returns_html_and_contains_form(client):
     """GET / should return HTML and include the workout form fields."""
@@ -223,6 +246,7 @@ def test_user_info_save_valid(client):
     # Flash message present
     assert b'User info saved! BMI=' in resp.data
     # Derived values
+    user_info = store.get_profile('R123')
     assert user_info['name'] == 'Test User'
     assert user_info['bmi'] == pytest.approx(80 / (1.8 * 1.8))
     # BMR (M): 10*80 + 6.25*180 - 5*30 + 5 = 800 + 1125 - 150 + 5 = 1780
@@ -243,7 +267,7 @@ def test_user_info_save_invalid_gender(client):
     }, follow_redirects=True)
     assert resp.status_code == 200
     assert b'Invalid input:' in resp.data
-    assert user_info == {}
+    assert store.members() == []
 
 
 def test_add_workout_auto_valid(client):
@@ -257,7 +281,7 @@ def test_add_workout_auto_valid(client):
     # Calories estimate: MET=3, weight=70, duration=10 -> round((3*3.5*70/200)*10)=37
     assert b'QuickIntervals' in resp.data
     assert b'37 kcal' in resp.data or b'~37 kcal' in resp.data
-    assert len(workouts['Warm-up']) == 1
+    assert len(store.workouts(GUEST_MEMBER)['Warm-up']) == 1
 
 
 def test_add_workout_auto_with_user_weight(client):
@@ -273,7 +297,7 @@ def test_add_workout_auto_with_user_weight(client):
     # Calories: (3*3.5*55/200)*20 = (577.5/200)*20 = 2.8875*20=57.75 -> 58
     assert b'WarmFlow' in resp.data
     assert b'58 kcal' in resp.data or b'~58 kcal' in resp.data
-    assert workouts['Warm-up'][0]['calories'] == 58
+    assert store.workouts('R9')['Warm-up'][0]['calories'] == 58
 
 
 def test_export_pdf_requires_user_info(client):
@@ -309,3 +333,432 @@ def test_weekly_calories_progress_bar(client):
     assert re.search(r'Weekly Calories:\s*(?:</?[^>]+>\s*)*400\s*/\s*500', page)
     # Progress percent should be 80%
     assert 'width: 80%' in page
+
+
+def test_logged_entry_renders_timestamp(client):
+    client.post('/add', data={'workout': 'Row', 'duration': '12', 'calories': '90', 'category': 'Workout'})
+    entry = store.workouts(GUEST_MEMBER)['Workout'][0]
+    assert isinstance(entry.ts, int)
+    page = client.get('/').get_data(as_text=True)
+    assert f'Logged at {entry.timestamp}' in page
+    summary = client.get('/summary').get_data(as_text=True)
+    assert f'Logged: {entry.date_str}' in summary
+
+
+def test_members_are_partitioned_by_regn_id(client):
+    profile = {'age': '30', 'gender': 'F', 'height': '170', 'weight': '60', 'weekly_cal_goal': '2000'}
+    client.post('/user/save', data=dict(profile, name='Alice', regn_id='A1'))
+    client.post('/add', data={'workout': 'AliceRun', 'duration': '30', 'calories': '300', 'category': 'Workout'})
+    with app.test_client() as other:
+        other.post('/user/save', data=dict(profile, name='Bob', regn_id='B2'))
+        other.post('/add', data={'workout': 'BobSwim', 'duration': '40', 'calories': '350', 'category': 'Workout'})
+        bob_page = other.get('/').get_data(as_text=True)
+    alice_page = client.get('/').get_data(as_text=True)
+    assert 'AliceRun' in alice_page and 'BobSwim' not in alice_page
+    assert 'BobSwim' in bob_page and 'AliceRun' not in bob_page
+    # Saving Bob's profile did not overwrite Alice's.
+    assert 'value="Alice"' in alice_page
+    assert store.get_profile('A1')['name'] == 'Alice'
+    assert store.members() == ['A1', 'B2']
+
+
+def test_create_app_builds_an_isolated_app(tmp_path):
+    other = create_app({'TESTING': True, 'ACEEST_STORE': 'sqlite', 'ACEEST_DB_PATH': str(tmp_path / 'f.db')})
+    other_store = other.extensions['aceest_store']
+    assert other_store is not store
+    with other.test_client() as other_client:
+        other_client.post('/add', data={'workout': 'Row', 'duration': '12', 'calories': '90', 'category': 'Workout'})
+    assert len(other_store.workouts(GUEST_MEMBER)['Workout']) == 1
+    assert len(store.workouts(GUEST_MEMBER)['Workout']) == 0
+    calls = []
+    other.extensions['aceest_worker_init'].append(lambda: calls.append('pool'))
+    init_worker(other)
+    assert calls == ['pool']
+    other_store.close()
+
+
+@pytest.mark.parametrize('warmup', ['0', '1'])
+def test_reportlab_is_loaded_lazily(warmup, tmp_path):
+    code = "import sys, src.app; print(any(m.startswith('reportlab') for m in sys.modules))"
+    env = {'ACEEST_WARMUP': warmup, 'ACEEST_STORE': 'memory', 'PATH': ''}
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, '-c', code], cwd=root, env=env, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ('True' if warmup == '1' else 'False')
+
+
+def test_pdf_export_imports_reportlab_on_demand(client):
+    client.post('/user/save', data={'name': 'Ann', 'regn_id': 'R1', 'age': '30', 'gender': 'F',
+                                    'height': '170', 'weight': '60', 'weekly_cal_goal': '2000'})
+    response = client.get('/export/pdf')
+    assert response.status_code == 200
+    assert all(name in sys.modules for name in HEAVY_MODULES)
+
+
+def test_healthz_is_always_ok(client):
+    response = client.get('/healthz')
+    assert response.status_code == 200
+    assert response.data == b'ok'
+
+
+def test_readyz_warms_up_before_reporting_ready(monkeypatch, tmp_path):
+    fresh = create_app({'TESTING': True, 'ACEEST_WARMUP': False, 'ACEEST_TEMPLATE_CACHE_DIR': str(tmp_path)})
+    assert not fresh.extensions['aceest_ready'].is_set()
+    with fresh.test_client() as fresh_client:
+        monkeypatch.setattr('src.app.render_pdf_report', lambda *args: 1 / 0)
+        assert fresh_client.get('/readyz').status_code == 503
+        monkeypatch.undo()
+        response = fresh_client.get('/readyz')
+    assert response.status_code == 200 and response.data == b'ready'
+    # Pages and fragments were compiled into the bytecode cache.
+    assert len(list(tmp_path.glob('__jinja2_*.cache'))) == len(TEMPLATES) + len(FRAGMENTS)
+    assert all(name in sys.modules for name in HEAVY_MODULES)
+
+
+def test_warm_up_does_not_load_the_sqlite_log(monkeypatch, tmp_path):
+    fresh = create_app({'TESTING': True, 'ACEEST_WARMUP': False, 'ACEEST_STORE': 'sqlite',
+                        'ACEEST_DB_PATH': str(tmp_path / 'aceest.db')})
+    monkeypatch.setattr(fresh.extensions['aceest_store'], 'columns', lambda: 1 / 0)
+    with fresh.test_client() as fresh_client:
+        assert fresh_client.get('/readyz').status_code == 200
+    fresh.extensions['aceest_store'].close()
+
+
+def test_reference_tabs_are_prerendered_once(client, monkeypatch):
+    fragments = app.extensions['aceest_fragments']
+    assert 'Dumbbell Rows' in fragments['chart_tab'] and 'Greek Yogurt' in fragments['diet_tab']
+    # Pages splice the stored fragments instead of rendering the tabs again.
+    monkeypatch.setitem(fragments, 'chart_tab', Markup('<div id="chart-tab">spliced</div>'))
+    page = client.get('/').get_data(as_text=True)
+    assert '<div id="chart-tab">spliced</div>' in page
+    assert 'Greek Yogurt' in page
+
+
+def test_pages_answer_conditional_gets_from_the_data_version(client):
+    first = client.get('/')
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] in ('private, no-cache', 'no-cache, private')
+    cached = client.get('/', headers={'If-None-Match': etag})
+    assert cached.status_code == 304 and cached.data == b''
+    # A mutation bumps the version; the page comes with its flash and no validators.
+    client.post('/add', data={'workout': 'Row', 'duration': '12', 'calories': '90', 'category': 'Workout'})
+    flashed = client.get('/', headers={'If-None-Match': etag})
+    assert flashed.status_code == 200 and 'ETag' not in flashed.headers
+    fresh = client.get('/', headers={'If-None-Match': etag})
+    assert fresh.status_code == 200 and fresh.headers['ETag'] != etag
+    assert client.get('/', headers={'If-None-Match': fresh.headers['ETag']}).status_code == 304
+    summary = client.get('/summary')
+    summary.close()
+    assert summary.headers['ETag'] != fresh.headers['ETag']
+    assert client.get('/summary', headers={'If-None-Match': summary.headers['ETag']}).status_code == 304
+
+
+def test_daily_pages_expire_at_midnight_for_if_modified_since(client, monkeypatch):
+    class Clock(datetime):
+        now_value = datetime.combine(date.today() + timedelta(days=1), datetime.min.time())
+
+        @classmethod
+        def now(cls, tz=None):
+            return cls.now_value
+
+    monkeypatch.setattr('src.app.datetime', Clock)
+    client.post('/add', data={'workout': 'Row', 'duration': '12', 'calories': '90', 'category': 'Workout'})
+    client.get('/')
+    first = client.get('/')
+    since = first.headers['Last-Modified']
+    assert client.get('/', headers={'If-Modified-Since': since}).status_code == 304
+    # The data is unchanged, but "last 7 days" moved on: the date alone must miss.
+    Clock.now_value += timedelta(days=1)
+    after = client.get('/', headers={'If-Modified-Since': since})
+    assert after.status_code == 200
+    assert client.get('/', headers={'If-Modified-Since': after.headers['Last-Modified']}).status_code == 304
+
+
+def test_pdf_export_paginates_long_logs(client):
+    client.post('/user/save', data={'name': 'Ann', 'regn_id': 'R1', 'age': '30', 'gender': 'F',
+                                    'height': '170', 'weight': '60', 'weekly_cal_goal': '2000'})
+    client.get('/')
+    client.post('/api/v1/members/R1/entries', json=[{'workout': f'Set {i}', 'duration': 5} for i in range(150)])
+    pdf = client.get('/export/pdf').data
+    assert pdf.startswith(b'%PDF')
+    # 150 rows no longer fall off a single page; page 1 also holds the charts.
+    assert len(re.findall(rb'/Type /Page\b', pdf)) == 5
+
+
+def test_report_jobs_api_renders_in_the_background_and_serves_from_cache(client):
+    assert client.post('/api/v1/members/R1/reports').status_code == 404
+    client.post('/user/save', data={'name': 'Ann', 'regn_id': 'R1', 'age': '30', 'gender': 'F',
+                                    'height': '170', 'weight': '60', 'weekly_cal_goal': '2000'})
+    client.get('/')
+    requested = client.post('/api/v1/members/R1/reports')
+    assert requested.status_code in (200, 202)
+    job = requested.get_json()
+    for _ in range(200):
+        status = client.get(job['status_url']).get_json()
+        if status['status'] == 'done':
+            break
+        time.sleep(0.02)
+    assert status['status'] == 'done'
+
+    cached = client.post('/api/v1/members/R1/reports')
+    assert cached.status_code == 200 and cached.get_json()['id'] == job['id']
+    pdf = client.get(status['download_url'])
+    assert pdf.data.startswith(b'%PDF') and pdf.headers['ETag'] == f'"{job["id"]}"'
+    assert client.get(status['download_url'], headers={'If-None-Match': pdf.headers['ETag']}).status_code == 304
+    pdf.close()
+
+    # New data makes a new report; the old id is no longer offered.
+    client.post('/api/v1/members/R1/entries', json=[{'workout': 'Row', 'duration': 10}])
+    assert client.post('/api/v1/members/R1/reports').get_json()['id'] != job['id']
+    assert client.get('/api/v1/members/R1/reports/0-2000-01-01').status_code == 404
+    assert client.get('/api/v1/members/R1/reports/0-2000-01-01/pdf').status_code == 404
+
+
+def test_report_status_polls_only_queue_the_current_report(client, monkeypatch):
+    client.post('/user/save', data={'name': 'Ann', 'regn_id': 'R1', 'age': '30', 'gender': 'F',
+                                    'height': '170', 'weight': '60', 'weekly_cal_goal': '2000'})
+    submitted = []
+
+    def full(key, *args):
+        submitted.append(key)
+        raise ReportQueueFull()
+
+    monkeypatch.setattr(app.extensions['aceest_reports'], 'submit', full)
+    assert client.get('/api/v1/members/R1/reports/0-2000-01-01').status_code == 404
+    assert submitted == []
+    current = make_report_id(store.data_version('R1')[0], date.today())
+    response = client.get(f'/api/v1/members/R1/reports/{current}')
+    assert response.status_code == 503 and response.headers['Retry-After'] == '30'
+    assert len(submitted) == 1
+
+
+def test_member_report_reads_only_that_members_entries(monkeypatch):
+    member_store = MemoryStore()
+    member_store.save_profile('R1', {'name': 'Ann', 'regn_id': 'R1', 'age': 30, 'gender': 'F', 'height': 170,
+                                     'weight': 60, 'bmi': 20.8, 'bmr': 1400.0})
+    member_store.add_workout('R1', WorkoutEntry('Workout', 'Run', 30, 300, int(datetime(2025, 1, 9, 7).timestamp())))
+    monkeypatch.setattr(member_store, 'columns', lambda: pytest.fail("loaded the gym-wide columns"))
+    report = render_member_report(member_store, 'R1', date(2025, 1, 10))
+    assert report.read(4) == b'%PDF'
+    # Requested at an older version: the snapshot no longer matches its key.
+    with pytest.raises(ReportOutdated):
+        render_member_report(member_store, 'R1', date(2025, 1, 10), version=member_store.data_version('R1')[0] - 1)
+    member_store.close()
+
+
+def test_batch_reports_endpoint_streams_a_zip(client):
+    for regn_id in ('R1', 'R2'):
+        client.post('/user/save', data={'name': regn_id, 'regn_id': regn_id, 'age': '30', 'gender': 'F',
+                                        'height': '170', 'weight': '60', 'weekly_cal_goal': '2000'})
+    resp = client.get('/api/v1/reports/weekly.zip?regn_id=R2&regn_id=nobody')
+    assert resp.is_streamed and resp.mimetype == 'application/zip'
+    archive = zipfile.ZipFile(io.BytesIO(resp.get_data()))
+    assert archive.namelist() == ['R2_weekly_report.pdf', 'summary.json']
+    assert json.loads(archive.read('summary.json'))['rendered'] == 1
+    resp.close()
+
+
+def test_one_batch_of_reports_at_a_time(client):
+    lock_path = os.path.join(app.config['ACEEST_REPORT_CACHE_DIR'], BATCH_LOCK_NAME)
+    running = try_batch_lock(lock_path)  # a batch in another worker
+    busy = client.get('/api/v1/reports/weekly.zip')
+    assert busy.status_code == 503 and busy.headers['Retry-After'] == '60'
+    running.close()
+    resp = client.get('/api/v1/reports/weekly.zip')
+    assert resp.status_code == 200
+    assert try_batch_lock(lock_path) is None  # held until the ZIP is sent
+    resp.get_data()
+    resp.close()
+    free = try_batch_lock(lock_path)
+    assert free is not None
+    free.close()
+
+
+def test_last_weeks_reports_are_prerendered_into_the_cache(tmp_path):
+    other = create_app({'TESTING': True, 'ACEEST_STORE': 'memory', 'ACEEST_PRERENDER': True,
+                        'ACEEST_REPORT_CACHE_DIR': str(tmp_path / 'reports')})
+    other_store = other.extensions['aceest_store']
+    prerender = other.extensions['aceest_prerender']
+    monday = date(2025, 1, 13)
+    last_week = int(datetime(2025, 1, 10, 7, 30).timestamp())
+    profile = {'name': 'Ann', 'regn_id': '', 'age': 30, 'gender': 'F', 'height': 170, 'weight': 60,
+               'bmi': 20.8, 'bmr': 1400.0}
+    for member_id, ts, has_profile in (('active', last_week, True), ('anonymous', last_week, False),
+                                       ('lapsed', last_week - 30 * 86400, True)):
+        other_store.add_workout(member_id, WorkoutEntry('Workout', 'Run', 30, 300, ts))
+        if has_profile:
+            other_store.save_profile(member_id, dict(profile, regn_id=member_id))
+    prerender.pause, prerender.clock = 0, lambda: datetime(2025, 1, 13, 2)
+    assert prerender.run_once(monday) == 1
+    cache = other.extensions['aceest_reports'].cache
+    # The key a Monday download asks for, as long as nothing was logged since.
+    version = other_store.data_version('active')[0]
+    assert report_key('active', make_report_id(version, monday), other_store) in cache
+    assert report_key('lapsed', make_report_id(other_store.data_version('lapsed')[0], monday), other_store) not in cache
+    assert prerender.run_once(monday) == 0
+    assert prerender in [getattr(hook, '__self__', None) for hook in other.extensions['aceest_worker_init']]
+    assert not prerender.started
+    other.test_client().get('/healthz')
+    # The first request starts the background thread, which sleeps until the next window.
+    assert prerender.started
+    prerender.stop()
+    other_store.close()
+
+
+def test_pdf_export_is_conditional(client):
+    client.post('/user/save', data={'name': 'Ann', 'regn_id': 'R1', 'age': '30', 'gender': 'F',
+                                    'height': '170', 'weight': '60', 'weekly_cal_goal': '2000'})
+    client.get('/')  # consume the flash
+    report = client.get('/export/pdf')
+    assert report.status_code == 200 and report.last_modified is not None
+    again = client.get('/export/pdf', headers={'If-None-Match': report.headers['ETag']})
+    assert again.status_code == 304
+
+
+def test_summary_is_paginated_and_streamed(client):
+    for i in range(5):
+        client.post('/add', data={'workout': f'Run{i}', 'duration': '10', 'calories': '50', 'category': 'Workout'})
+    client.post('/add', data={'workout': 'Stretch', 'duration': '5', 'calories': '10', 'category': 'Cool-down'})
+    client.get('/')  # consume the flashes
+    response = client.get('/summary?page=2&per_page=2')
+    assert response.is_streamed
+    page = response.get_data(as_text=True)
+    assert 'Run2' in page and 'Run3' in page and 'Run1' not in page and 'Run4' not in page
+    assert '3. Run2' in page and 'Showing 3–4 of 5' in page
+    assert 'No more sessions on this page.' in page  # Cool-down has a single entry
+    assert 'page=1&amp;per_page=2' in page and 'page=3&amp;per_page=2' in page
+    last = client.get('/summary?page=3&per_page=2').get_data(as_text=True)
+    assert '5. Run4' in last and 'Next page' not in last
+    # Totals still cover the whole history.
+    assert 'Total Time Spent: 55 minutes' in last
+    # Far past the end: an empty page, not an integer overflow in the store.
+    beyond = client.get(f'/summary?page={10 ** 30}&per_page=5000')
+    assert beyond.status_code == 200 and 'Run0' not in beyond.get_data(as_text=True)
+
+
+def test_home_page_embeds_recent_entries_and_loads_more(client):
+    for i in range(HOME_LOG_SIZE + 5):
+        client.post('/add', data={'workout': f'Lift{i:02d}', 'duration': '5', 'calories': '20', 'category': 'Workout'})
+    client.get('/')  # consume the flashes
+    page = client.get('/').get_data(as_text=True)
+    assert page.count('class="workout-item"') == HOME_LOG_SIZE
+    newest = f'Lift{HOME_LOG_SIZE + 4:02d}'
+    assert newest in page and 'Lift04' not in page
+    cursor = re.search(r'data-before="([^"]+)"', page).group(1)
+    # Entries added after the page was rendered do not shift the next page.
+    client.post('/add', data={'workout': 'Latest', 'duration': '5', 'calories': '20', 'category': 'Workout'})
+    more = client.get('/workouts/more', query_string={'category': 'Workout', 'before': cursor, 'limit': 3}).get_json()
+    assert re.findall(r'Lift\d+', more['html']) == ['Lift04', 'Lift03', 'Lift02']
+    rest = client.get('/workouts/more', query_string={'category': 'Workout', 'before': more['next']}).get_json()
+    assert re.findall(r'Lift\d+', rest['html']) == ['Lift01', 'Lift00']
+    assert rest['next'] is None
+    assert client.get('/workouts/more', query_string={'category': 'Workout', 'before': 'x'}).status_code == 400
+    huge = f'{2 ** 63}.1'  # beyond SQLite's integers
+    assert client.get('/workouts/more', query_string={'category': 'Workout', 'before': huge}).status_code == 400
+
+
+def test_json_api_exposes_the_dashboard_numbers(client):
+    client.post('/user/save', data={'name': 'Ann', 'regn_id': 'R1', 'age': '30', 'gender': 'F',
+                                    'height': '170', 'weight': '60', 'weekly_cal_goal': '500'})
+    for name, category in [('Jog', 'Warm-up'), ('Row', 'Workout'), ('Lift', 'Workout')]:
+        client.post('/add', data={'workout': name, 'duration': '10', 'calories': '100', 'category': category})
+
+    profile = client.get('/api/v1/members/R1/profile').get_json()
+    assert profile['name'] == 'Ann' and round(profile['bmi'], 1) == 20.8
+    totals = client.get('/api/v1/members/R1/totals').get_json()
+    assert totals['sessions'] == {'Warm-up': 1, 'Workout': 2, 'Cool-down': 0}
+    assert totals['total_minutes'] == 30
+    progress = client.get('/api/v1/members/R1/progress').get_json()
+    assert progress['weekly_calories'] == 300 and progress['weekly_progress_percent'] == 60
+
+    first = client.get('/api/v1/members/R1/entries?limit=2').get_json()
+    assert [e['workout'] for e in first['entries']] == ['Lift', 'Row']
+    rest = client.get('/api/v1/members/R1/entries', query_string={'limit': 2, 'before': first['next']}).get_json()
+    assert [e['workout'] for e in rest['entries']] == ['Jog'] and rest['next'] is None
+    only = client.get('/api/v1/members/R1/entries?category=Warm-up').get_json()
+    assert [e['workout'] for e in only['entries']] == ['Jog']
+
+    assert client.get('/api/v1/members/R1/entries?category=Nap').status_code == 400
+    assert client.get('/api/v1/members/R1/entries', query_string={'before': f'1.{-2 ** 64}'}).status_code == 400
+    assert client.get('/api/v1/members/nobody/profile').status_code == 404
+
+
+def test_json_api_is_cacheable(client):
+    client.post('/user/save', data={'name': 'Cy', 'regn_id': 'R9', 'age': '40', 'gender': 'M',
+                                    'height': '180', 'weight': '80', 'weekly_cal_goal': '2000'})
+    client.get('/')  # consume the flash
+    response = client.get('/api/v1/members/R9/totals')
+    etag = response.headers['ETag']
+    assert client.get('/api/v1/members/R9/totals', headers={'If-None-Match': etag}).status_code == 304
+    client.post('/add', data={'workout': 'Row', 'duration': '10', 'calories': '100', 'category': 'Workout'})
+    client.get('/')
+    changed = client.get('/api/v1/members/R9/totals', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.get_json()['total_sessions'] == 1
+
+
+def test_batch_ingest_applies_all_or_nothing(client):
+    client.post('/user/save', data={'name': 'Ann', 'regn_id': 'R1', 'age': '30', 'gender': 'F',
+                                    'height': '170', 'weight': '60', 'weekly_cal_goal': '2000'})
+    rejected = client.post('/api/v1/members/R1/entries', json=[
+        {'workout': 'Row', 'duration': 10, 'calories': 80},
+        {'workout': 'Nap', 'duration': 10, 'category': 'Sleep'},
+    ])
+    assert rejected.status_code == 422
+    assert [e['index'] for e in rejected.get_json()['errors']] == [1]
+    assert store.aggregates('R1').total_sessions == 0
+
+    created = client.post('/api/v1/members/R1/entries', json={'entries': [
+        {'workout': 'Row', 'duration': 10, 'calories': 80},
+        {'workout': 'Walk', 'duration': 20, 'category': 'Cool-down', 'timestamp': '2025-01-06 07:30:00'},
+    ]})
+    assert created.status_code == 201
+    body = created.get_json()
+    assert body['count'] == 2
+    # Calories left out come from MET_VALUES and the saved weight (60 kg).
+    assert body['results'][1]['calories'] == round(MET_VALUES['Cool-down'] * 3.5 * 60 / 200 * 20)
+    assert [e.id for e in store.workouts('R1')['Workout']] == [body['results'][0]['id']]
+    assert client.post('/api/v1/members/R1/entries', json=[]).status_code == 400
+    assert client.post('/api/v1/members/R1/entries', data='nope').status_code == 400
+
+
+def test_bulk_import_endpoint_streams_csv_and_ndjson(client):
+    body = 'regn_id,workout,duration,calories,timestamp\nR1,Run,30,300,2019-05-01\nR1,Run,x,1,2019-05-02\n'
+    resp = client.post('/api/v1/import', data=body, content_type='text/csv')
+    assert resp.status_code == 200
+    report = resp.get_json()
+    assert (report['imported'], report['rejected']) == (1, 1)
+    assert report['errors'][0]['line'] == 3
+
+    upload = client.post('/api/v1/import?regn_id=R2', data={
+        'file': (io.BytesIO(b'{"workout": "Row", "duration": 10}\n'), 'log.ndjson'),
+    })
+    assert upload.get_json()['imported'] == 1
+    assert store.aggregates('R2').total_sessions == 1
+    assert client.post('/api/v1/import', data='x', content_type='text/plain').status_code == 400
+
+
+def test_export_endpoint_streams_filtered_rows(client):
+    client.post('/api/v1/members/R1/entries', json=[
+        {'workout': 'Row', 'duration': 10, 'calories': 80, 'timestamp': '2025-01-06 07:30:00'},
+        {'workout': 'Walk', 'duration': 20, 'category': 'Cool-down', 'timestamp': '2025-01-07 07:30:00'},
+    ])
+    resp = client.get('/api/v1/export?regn_id=R1&start=2025-01-06&end=2025-01-06')
+    assert resp.is_streamed and resp.mimetype == 'text/csv'
+    assert 'attachment' in resp.headers['Content-Disposition']
+    lines = resp.get_data(as_text=True).splitlines()
+    assert len(lines) == 2 and lines[1].startswith('R1,') and ',Row,' in lines[1]
+    ndjson = client.get('/api/v1/export?format=ndjson&category=Cool-down').get_data(as_text=True)
+    assert [json.loads(line)['workout'] for line in ndjson.splitlines()] == ['Walk']
+    assert client.get('/api/v1/export?format=xml').status_code == 400
+    assert client.get('/api/v1/export?start=yesterday').status_code == 400
+
+
+def test_npz_export_and_restore_over_http(client):
+    client.post('/api/v1/members/R1/entries', json=[{'workout': 'Row', 'duration': 10, 'calories': 80}])
+    resp = client.get('/api/v1/export?format=npz')
+    assert resp.status_code == 200 and 'aceest-workouts.npz' in resp.headers['Content-Disposition']
+    payload = resp.get_data()
+    store.clear()
+    restored = client.post('/api/v1/import?format=npz', data=payload, content_type='application/octet-stream')
+    assert restored.get_json()['imported'] == 1
+    assert store.workouts('R1')['Workout'][0].workout == 'Row'
+
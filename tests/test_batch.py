@@ -0,0 +1,100 @@
+import io
+import json
+import zipfile
+from datetime import date, datetime
+
+from src.batch import BatchStats, main, member_payload, render_payload, report_filename, zip_chunks
+from src.models import WorkoutEntry
+from src.storage import MemoryStore, SQLiteStore
+
+TODAY = date(2025, 1, 10)
+
+
+def _profile(member_id, name):
+    return {'name': name, 'regn_id': member_id, 'age': 30, 'gender': 'F',
+            'height': 170, 'weight': 60, 'bmi': 20.8, 'bmr': 1400.0}
+
+
+def _ts(day):
+    return int(datetime(2025, 1, day, 7, 30).timestamp())
+
+
+def test_payload_sums_week_and_lifetime_while_reading_rows(store):
+    store.save_profile('M1', _profile('M1', 'Ann'))
+    store.add_workouts('M1', [
+        WorkoutEntry('Workout', 'Run', 30, 300, _ts(9)),
+        WorkoutEntry('Warm-up', 'Jog', 10, 50, _ts(8)),
+        WorkoutEntry('Workout', 'Row', 20, 200, _ts(1)),
+    ])
+    payload = member_payload(store, 'M1', TODAY)
+    assert (payload['member_id'], payload['profile']['name']) == ('M1', 'Ann')
+    assert payload['week'] == {'total_sessions': 2, 'total_minutes': 40, 'total_calories': 350}
+    assert payload['lifetime']['total_sessions'] == 3 and payload['lifetime']['total_minutes'] == 60
+    # Same rows, in the same order, as the single-member report.
+    assert [row[:2] for row in payload['rows']] == [['Warm-up', 'Jog'], ['Workout', 'Run'], ['Workout', 'Row']]
+    # Same chart data as the columnar path.
+    columns = store.columns()
+    assert payload['lifetime']['minutes'] == columns.report_summary('M1')['minutes']
+    assert payload['daily_calories'] == columns.daily_totals('calories', 'M1', TODAY) == [0, 0, 0, 0, 50, 300, 0]
+
+
+def test_payload_rows_and_totals_come_from_one_snapshot(store, monkeypatch):
+    store.save_profile('M1', _profile('M1', 'Ann'))
+    store.add_workout('M1', WorkoutEntry('Workout', 'Run', 30, 300, _ts(9)))
+    read = store.read
+
+    def read_then_write(member_id):
+        view = read(member_id)
+        store.add_workout(member_id, WorkoutEntry('Workout', 'Row', 20, 200, _ts(9)))
+        return view
+
+    monkeypatch.setattr(store, 'read', read_then_write)
+    payload = member_payload(store, 'M1', TODAY)
+    assert len(payload['rows']) == payload['week']['total_sessions'] == 1
+    assert payload['chart_key'][2] == store.data_version('M1')[0] - 1
+
+
+def test_render_failures_are_returned_not_raised():
+    payload = member_payload(MemoryStore(), 'M1', TODAY)
+    payload['profile'] = {'name': 'Ann'}
+    member_id, _, pdf, error = render_payload(payload)
+    assert member_id == 'M1' and pdf is None and 'regn_id' in error
+
+
+def test_report_filenames_are_safe_and_unique():
+    taken = set()
+    assert report_filename('M1', taken) == 'M1_weekly_report.pdf'
+    assert report_filename('../etc/x', taken) == '_etc_x_weekly_report.pdf'
+    assert report_filename('_etc_x', taken) == '_etc_x-2_weekly_report.pdf'
+
+
+def test_zip_holds_one_report_per_member_with_a_profile(store, tmp_path):
+    for n in range(5):
+        store.save_profile(f'M{n}', _profile(f'M{n}', f'Member {n}'))
+        store.add_workouts(f'M{n}', [WorkoutEntry('Workout', 'Run', 30, 300, _ts(9))] * (n * 30))
+    store.add_workout('ghost', WorkoutEntry('Workout', 'Run', 30, 300, _ts(9)))
+    stats = BatchStats(2)
+    chart_dir = tmp_path / 'charts'
+    chunks = zip_chunks(store, processes=2, today=TODAY, stats=stats, chart_dir=str(chart_dir))
+    archive = zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+    names = sorted(archive.namelist())
+    assert names == [f'M{n}_weekly_report.pdf' for n in range(5)] + ['summary.json']
+    assert all(archive.read(name).startswith(b'%PDF') for name in names[:-1])
+    summary = json.loads(archive.read('summary.json'))
+    assert summary['rendered'] == stats.rendered == 5 and summary['failed'] == {}
+    assert summary['processes'] == 2 and summary['reports_per_second'] > 0
+    # Each member's charts were recorded once, for the next run to replay.
+    assert len(list(chart_dir.glob('*.json'))) == 5
+
+
+def test_cli_writes_zip_and_prints_stats(tmp_path, capsys):
+    db = str(tmp_path / 'cli.db')
+    seeded = SQLiteStore(db)
+    for member_id in ('M1', 'M2'):
+        seeded.save_profile(member_id, _profile(member_id, member_id))
+    seeded.close()
+    out = tmp_path / 'reports.zip'
+    assert main(['-o', str(out), '--member', 'M2', '--processes', '1', '--store', 'sqlite', '--db', db,
+                 '--chart-cache', str(tmp_path / 'charts')]) == 0
+    assert zipfile.ZipFile(out).namelist() == ['M2_weekly_report.pdf', 'summary.json']
+    assert json.loads(capsys.readouterr().err)['rendered'] == 1
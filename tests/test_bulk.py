@@ -0,0 +1,153 @@
+import io
+import json
+
+import pytest
+
+from src.bulk import EXPORT_FIELDS, day_bounds, detect_format, export_chunks, export_npz, import_stream, main
+from src.columnar import ColumnStore
+from src.models import WorkoutEntry
+from src.storage import MemoryStore, SQLiteStore
+
+CSV = (
+    "regn_id,category,workout,duration,calories,timestamp\n"
+    "M1,Workout,Run,30,300,2019-05-01 07:30:00\n"
+    "M2,Warm-up,Jog,10,,2019-05-01\n"
+    "M1,Nap,Sleep,60,0,2019-05-02\n"
+    "\n"
+    ",Cool-down,Walk,15,40,2019-05-03 18:00:00\n"
+).encode()
+
+
+def test_csv_import_validates_rows_and_batches_writes(store):
+    store.save_profile('M2', {'name': 'Bo', 'regn_id': 'M2', 'weight': 80})
+    batches = []
+    report = import_stream(store, io.BytesIO(CSV), 'csv', member_id='M3', batch_size=2,
+                           progress=lambda r: batches.append(r.imported))
+    assert (report.rows, report.imported, report.rejected) == (4, 3, 1)
+    assert report.errors == [{'line': 4, 'error': 'category must be one of Warm-up, Workout, Cool-down'}]
+    assert batches == [2, 3]
+    assert [e.timestamp for e in store.workouts('M1')['Workout']] == ['2019-05-01 07:30:00']
+    # Omitted calories use the member's saved weight; blank regn_id falls back to member_id.
+    assert store.workouts('M2')['Warm-up'][0].calories == 42
+    assert store.aggregates('M3').sessions['Cool-down'] == 1
+    assert store.daily_workouts('M1')['2019-05-01']['Workout'][0].workout == 'Run'
+    ids = [e.id for member in ('M1', 'M2', 'M3') for log in store.workouts(member).values() for e in log]
+    assert len(set(ids)) == 3 and all(ids)
+
+
+def test_ndjson_import_reports_bad_lines(store):
+    lines = [
+        json.dumps({'regn_id': 'M1', 'workout': 'Run', 'duration': 30, 'ts': 1556690400}),
+        '{not json',
+        '',
+        json.dumps(['Run', 30]),
+        json.dumps({'workout': 'Row', 'duration': 5}),
+    ]
+    report = import_stream(store, io.BytesIO('\n'.join(lines).encode()), 'ndjson')
+    assert report.imported == 1
+    assert report.as_dict()['errors'] == [
+        {'line': 2, 'error': 'line is not valid JSON'},
+        {'line': 4, 'error': 'entry must be an object'},
+        {'line': 5, 'error': 'regn_id is required'},
+    ]
+    assert store.workouts('M1')['Workout'][0].ts == 1556690400
+
+
+def test_undecodable_input_keeps_earlier_rows(store):
+    rows = b'regn_id,workout,duration\n' + b'M1,Run,30\n' * 5000
+    report = import_stream(store, io.BytesIO(rows + b'\xff\xfe'), 'csv')
+    assert report.error.startswith('unreadable input after row')
+    assert 0 < report.imported == store.aggregates('M1').total_sessions < 5000
+
+
+def test_format_detection():
+    assert detect_format('history.CSV') == 'csv'
+    assert detect_format('log.jsonl') == detect_format(mimetype='application/x-ndjson') == 'ndjson'
+    assert detect_format('history.xlsx') is None
+
+
+def test_cli_imports_into_sqlite(tmp_path, capsys):
+    source = tmp_path / 'history.csv'
+    source.write_bytes(CSV)
+    db = str(tmp_path / 'cli.db')
+    assert main(['import', str(source), '--store', 'sqlite', '--db', db, '--member', 'M3']) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert (report['imported'], report['rejected'], report['members']) == (3, 1, 3)
+    reopened = SQLiteStore(db)
+    assert reopened.aggregates('M1').total_sessions == 1
+    reopened.close()
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'ndjson'])
+def test_export_round_trips_through_import(store, fmt, monkeypatch):
+    monkeypatch.setattr('src.bulk.EXPORT_CHUNK_ROWS', 2)
+    import_stream(store, io.BytesIO(CSV), 'csv', member_id='M3')
+    chunks = list(export_chunks(store.export_workouts(), fmt))
+    assert len(chunks) == 2
+    text = ''.join(chunks)
+    if fmt == 'csv':
+        assert text.splitlines()[0] == ','.join(EXPORT_FIELDS)
+    else:
+        assert json.loads(text.splitlines()[0])['regn_id'] == 'M1'
+    restored = MemoryStore()
+    report = import_stream(restored, io.BytesIO(text.encode()), fmt)
+    assert report.imported == 3 and report.rejected == 0
+    for member in ('M1', 'M2', 'M3'):
+        assert restored.workouts(member) == store.workouts(member)
+
+
+def test_day_bounds_cover_whole_days():
+    start, end = day_bounds('2025-01-06', '2025-01-06')
+    assert end - start in (23 * 3600, 24 * 3600, 25 * 3600)
+    assert day_bounds() == (None, None)
+    with pytest.raises(ValueError):
+        day_bounds('06/01/2025')
+
+
+def test_cli_exports_a_filtered_log(tmp_path, capsys):
+    db = str(tmp_path / 'cli.db')
+    store = SQLiteStore(db)
+    import_stream(store, io.BytesIO(CSV), 'csv', member_id='M3')
+    store.close()
+    out = tmp_path / 'may.ndjson'
+    assert main(['export', '--store', 'sqlite', '--db', db, '-o', str(out), '--start', '2019-05-02']) == 0
+    assert [json.loads(line)['workout'] for line in out.read_text().splitlines()] == ['Walk']
+
+
+def test_cli_refuses_a_memory_store_without_journal(tmp_path, monkeypatch, capsys):
+    monkeypatch.delenv('ACEEST_JOURNAL_DIR', raising=False)
+    source = tmp_path / 'history.csv'
+    source.write_bytes(CSV)
+    with pytest.raises(SystemExit):
+        main(['import', str(source), '--store', 'memory'])
+    assert 'keeps nothing' in capsys.readouterr().err
+    assert main(['import', str(source), '--store', 'memory', '--journal-dir', str(tmp_path / 'journal'),
+                 '--member', 'M3']) == 0
+
+
+def test_npz_export_restores_into_another_store(store, tmp_path):
+    import_stream(store, io.BytesIO(CSV), 'csv', member_id='M3')
+    path = tmp_path / 'gym.npz'
+    assert export_npz(store, str(path)) == 3
+    assert export_npz(store, str(tmp_path / 'm1.npz'), member_id='M1', categories=['Workout']) == 1
+    restored = MemoryStore()
+    with open(path, 'rb') as stream:
+        report = import_stream(restored, stream, detect_format(str(path)), batch_size=2)
+    assert (report.imported, report.rejected, report.batches) == (3, 0, 2)
+    for member in ('M1', 'M2', 'M3'):
+        assert restored.workouts(member) == store.workouts(member)
+    assert import_stream(restored, io.BytesIO(b'not a zip'), 'npz').error.startswith('unreadable .npz')
+
+
+def test_npz_restore_rejects_out_of_range_times():
+    columns = ColumnStore()
+    columns.extend([WorkoutEntry('Workout', name, 30, 300, ts)
+                    for name, ts in (('Run', 1556695800), ('Row', 2 ** 62), ('Swim', -10 ** 17))], 'M1')
+    buffer = io.BytesIO()
+    columns.save_npz(buffer)
+    buffer.seek(0)
+    restored = MemoryStore()
+    report = import_stream(restored, buffer, 'npz')
+    assert (report.imported, report.rejected) == (1, 2)
+    assert [e.workout for e in restored.workouts('M1')['Workout']] == ['Run']
+
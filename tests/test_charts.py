@@ -0,0 +1,92 @@
+import io
+import os
+import re
+from datetime import date
+
+from src.charts import ChartCache, RecordedChart, category_chart, chart_key, report_charts, trend_chart
+
+TODAY = date(2025, 1, 10)
+MINUTES = {'Warm-up': 30, 'Workout': 240, 'Cool-down': 15}
+CALORIES = [0, 120, 0, 300, 0, 80, 450]
+
+
+def _by_font_name(code, canvas):
+    names = {internal: font for font, internal in canvas._doc.fontMapping.items()}
+    return re.sub(r'/F\d+(?= [\d.]+ Tf)', lambda match: names[match.group(0)], code)
+
+
+def test_replayed_chart_matches_drawing_it_in_place():
+    from reportlab.graphics import renderPDF
+    from reportlab.pdfgen import canvas as pdf_canvas
+
+    drawing = trend_chart(CALORIES, TODAY)
+    direct = pdf_canvas.Canvas(io.BytesIO())
+    direct.setFont('Courier', 10)
+    renderPDF.draw(drawing, direct, 0, 0)
+
+    # The target document numbers its fonts differently from the recording.
+    target = pdf_canvas.Canvas(io.BytesIO())
+    target.setFont('Helvetica-Bold', 10)
+    target.setFont('Courier', 10)
+    RecordedChart.record(drawing).draw_on(target, 0, 0)
+    replayed = target._code[-2]
+    assert _by_font_name(replayed, target) == _by_font_name('\n'.join(direct._code[1:]), direct)
+    assert 'Helvetica-Bold' in _by_font_name(replayed, target)
+
+
+def test_recording_relies_on_canvas_internals_of_the_pinned_reportlab():
+    # RecordedChart reads these private Canvas details. ReportLab is pinned
+    # exactly; an upgrade that changes them must fail here, not in reports.
+    from reportlab.pdfgen import canvas as pdf_canvas
+
+    with open(os.path.join(os.path.dirname(__file__), '..', 'requirements.txt')) as requirements:
+        assert re.search(r'^reportlab==[\w.]+$', requirements.read(), re.MULTILINE)
+    canvas = pdf_canvas.Canvas(io.BytesIO())
+    assert isinstance(canvas._code, list)
+    canvas.setFont('Courier', 10)
+    internal = canvas._doc.getInternalFontName('Courier')
+    assert canvas._doc.fontMapping['Courier'] == internal
+    assert re.search(r'/F\d+(?= [\d.]+ Tf)', canvas._code[-1]).group(0) == internal
+
+
+def test_charts_recorded_by_another_reportlab_are_redrawn(tmp_path):
+    cache = ChartCache(str(tmp_path))
+    key = chart_key('e1', 'M1', 1, TODAY)
+    charts = report_charts(MINUTES, CALORIES, TODAY, cache, key)
+    assert cache.get(key) is not None
+    for chart in charts:
+        chart.renderer = '0.0'
+    cache.set(key, charts)
+    assert cache.get(key) is None
+
+
+def test_charts_are_drawn_once_per_key(tmp_path, monkeypatch):
+    cache = ChartCache(str(tmp_path))
+    drawn = []
+    record = RecordedChart.record.__func__
+    monkeypatch.setattr(RecordedChart, 'record', classmethod(lambda cls, d: drawn.append(d) or record(cls, d)))
+
+    key = chart_key('e1', 'M1', 3, TODAY)
+    first = report_charts(MINUTES, CALORIES, TODAY, cache, key)
+    again = report_charts(MINUTES, CALORIES, TODAY, ChartCache(str(tmp_path)), key)
+    assert len(drawn) == 2
+    assert [chart.operators for chart in again] == [chart.operators for chart in first]
+    assert [(chart.width, chart.height) for chart in again] == [(240, 150), (240, 150)]
+
+    report_charts(MINUTES, CALORIES, TODAY, cache, chart_key('e1', 'M1', 4, TODAY))
+    assert len(drawn) == 4
+
+
+def test_unreadable_cache_entries_are_redrawn(tmp_path):
+    cache = ChartCache(str(tmp_path))
+    key = chart_key('e1', 'M1', 1, TODAY)
+    cache.put(key, io.BytesIO(b'not json'))
+    assert cache.get(key) is None
+    assert len(report_charts(MINUTES, CALORIES, TODAY, cache, key)) == 2
+    assert len(cache.get(key)) == 2
+
+
+def test_category_chart_uses_every_category_in_order():
+    chart = category_chart({'Workout': 90}).contents[0]
+    assert chart.data == [[0, 90, 0]]
+    assert chart.categoryAxis.categoryNames == ['Warm-up', 'Workout', 'Cool-down']
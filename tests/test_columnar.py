@@ -0,0 +1,112 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+
+from src.columnar import ColumnStore, week_days, week_window
+from src.models import WorkoutEntry
+
+
+def _entry(category, name, duration, calories, day, entry_id=None):
+    ts = int(datetime.combine(day, datetime.min.time()).timestamp()) + 9 * 3600
+    return WorkoutEntry(category, name, duration, calories, ts, id=entry_id)
+
+
+def test_append_grows_by_doubling():
+    columns = ColumnStore(capacity=2)
+    day = date(2025, 1, 6)
+    for i in range(5):
+        columns.append(_entry('Workout', 'Run', 10 + i, 100, day, entry_id=i + 1))
+    assert len(columns) == 5
+    assert columns._capacity == 8
+    assert columns.column('duration').dtype == np.int32
+    assert columns.column('ts').dtype == np.int64
+    assert list(columns.column('duration')) == [10, 11, 12, 13, 14]
+    assert list(columns.column('id')) == [1, 2, 3, 4, 5]
+
+
+def test_dictionary_encoded_names_and_members():
+    columns = ColumnStore()
+    day = date(2025, 1, 6)
+    columns.append(_entry('Workout', 'Run', 10, 100, day), member_id='R1')
+    columns.extend([_entry('Warm-up', 'Jog', 5, 20, day), _entry('Workout', 'Run', 20, 200, day)], member_id='R2')
+    assert columns.exercise_names == ['Run', 'Jog']
+    assert list(columns.column('exercise')) == [0, 1, 0]
+    assert columns.member_ids == ['R1', 'R2']
+    assert columns.progress_totals(member_id='R2') == {'Warm-up': 5, 'Workout': 20, 'Cool-down': 0}
+    assert columns.progress_totals(member_id='unknown') == {'Warm-up': 0, 'Workout': 0, 'Cool-down': 0}
+
+
+def test_weekly_window_and_report_summary():
+    today = date(2025, 1, 13)
+    columns = ColumnStore()
+    columns.extend([
+        _entry('Workout', 'Run', 30, 300, today),
+        _entry('Cool-down', 'Stretch', 10, 30, today - timedelta(days=6)),
+        _entry('Workout', 'Row', 20, 250, today - timedelta(days=7)),
+    ])
+    assert columns.weekly_calories(today) == 330
+    start_ts, end_ts = week_window(today)
+    summary = columns.report_summary(start_ts=start_ts, end_ts=end_ts)
+    assert summary['sessions'] == {'Warm-up': 0, 'Workout': 1, 'Cool-down': 1}
+    assert summary['total_minutes'] == 40
+    assert summary['total_calories'] == 330
+    assert columns.report_summary()['total_sessions'] == 3
+
+
+def test_daily_totals_bucket_the_week_by_local_day():
+    today = date(2025, 1, 13)
+    columns = ColumnStore()
+    columns.extend([
+        _entry('Workout', 'Run', 30, 300, today),
+        _entry('Workout', 'Run', 30, 200, today),
+        _entry('Cool-down', 'Stretch', 10, 30, today - timedelta(days=6)),
+        _entry('Workout', 'Row', 20, 250, today - timedelta(days=7)),
+    ], member_id='R1')
+    assert columns.daily_totals('calories', 'R1', today) == [30, 0, 0, 0, 0, 0, 500]
+    assert columns.daily_totals('duration', today=today) == [10, 0, 0, 0, 0, 0, 60]
+    assert columns.daily_totals('calories', 'R2', today) == [0] * 7
+    bounds = week_days(today)
+    assert (bounds[0], bounds[-1]) == week_window(today)
+    start_ts, end_ts = week_window(today)
+    columns.append(_entry('Workout', 'Run', 30, 300, today - timedelta(days=8)), member_id='R2')
+    assert columns.active_members(start_ts, end_ts) == ['R1']
+    assert columns.active_members() == ['R1', 'R2']
+
+
+def test_column_views_are_read_only():
+    columns = ColumnStore()
+    columns.append(_entry('Workout', 'Run', 10, 100, date(2025, 1, 6)))
+    view = columns.column('calories')
+    assert not view.flags.writeable
+
+
+def test_npz_round_trip_keeps_types_and_name_tables(tmp_path):
+    columns = ColumnStore()
+    day = date(2025, 1, 6)
+    columns.extend([_entry('Workout', 'Run', 30, 300, day, 1), _entry('Warm-up', 'Jog', 10, 50, day, 2)], 'R1')
+    columns.append(_entry('Workout', 'Run', 20, 200, day, 3), 'R2')
+    columns.save_npz(tmp_path / 'log.npz')
+    loaded = ColumnStore.load_npz(tmp_path / 'log.npz')
+    assert len(loaded) == 3
+    for name, dtype in ColumnStore.COLUMNS:
+        assert loaded.column(name).dtype == dtype
+        assert list(loaded.column(name)) == list(columns.column(name))
+    assert loaded.exercise_names == ['Run', 'Jog'] and loaded.member_ids == ['R1', 'R2']
+    assert loaded.report_summary('R1') == columns.report_summary('R1')
+    loaded.append(_entry('Cool-down', 'Walk', 5, 10, day, 4), 'R3')
+    assert loaded.member_ids[-1] == 'R3' and len(loaded) == 4
+
+    only_r2 = columns.select(columns.mask('R2'))
+    assert list(only_r2.column('id')) == [3]
+    # Only the names these rows use travel with them.
+    assert only_r2.member_ids == ['R2'] and only_r2.exercise_names == ['Run']
+    assert list(only_r2.column('member')) == [0] and list(only_r2.column('exercise')) == [0]
+    only_r2.save_npz(tmp_path / 'r2.npz')
+    assert ColumnStore.load_npz(tmp_path / 'r2.npz').report_summary('R2') == columns.report_summary('R2')
+    assert len(columns.select(columns.mask('nobody')).member_ids) == 0
+
+    np.savez(tmp_path / 'other.npz', ts=np.arange(3))
+    with pytest.raises(ValueError):
+        ColumnStore.load_npz(tmp_path / 'other.npz')
+
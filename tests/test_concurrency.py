@@ -0,0 +1,120 @@
+import re
+import threading
+import time
+
+from src.app import HOME_LOG_SIZE, app, store as app_store
+from src.models import WorkoutEntry
+from src.storage import MemoryStore
+
+WRITERS = 8
+WRITES_PER_THREAD = 50
+READERS = 4
+
+
+def _run(threads):
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrent_writers_and_readers_see_consistent_views(store):
+    errors = []
+    done = threading.Event()
+
+    def writer(n):
+        for i in range(WRITES_PER_THREAD):
+            store.add_workout('M1', WorkoutEntry.create('Workout', f'W{n}', 2, 10))
+            if i % 10 == 0:
+                tag = f'{n}-{i}'
+                store.save_profile('M1', {'name': tag, 'regn_id': 'M1', 'tag': tag})
+
+    def reader():
+        while not done.is_set():
+            view = store.read('M1')
+            sessions = sum(len(entries) for entries in view.workouts.values())
+            if view.aggregates.total_sessions != sessions:
+                errors.append(f'aggregates {view.aggregates.total_sessions} != log {sessions}')
+            if view.aggregates.total_minutes != 2 * sessions:
+                errors.append('minutes out of step with log')
+            if view.profile and view.profile['name'] != view.profile['tag']:
+                errors.append('torn profile')
+
+    readers = [threading.Thread(target=reader) for _ in range(READERS)]
+    for thread in readers:
+        thread.start()
+    _run([threading.Thread(target=writer, args=(n,)) for n in range(WRITERS)])
+    done.set()
+    for thread in readers:
+        thread.join()
+
+    assert errors == []
+    view = store.read('M1')
+    total = WRITERS * WRITES_PER_THREAD
+    assert view.aggregates.total_sessions == total
+    ids = [entry.id for entry in view.workouts['Workout']]
+    assert len(set(ids)) == total
+    assert store.columns().report_summary('M1')['total_sessions'] == total
+
+
+def test_long_reader_does_not_block_writers():
+    store = MemoryStore()
+    store.add_workout('M1', WorkoutEntry.create('Workout', 'Run', 2, 10))
+    view = store.read('M1')
+    writer = threading.Thread(target=lambda: [
+        store.add_workout('M1', WorkoutEntry.create('Workout', 'Run', 2, 10)) for _ in range(100)])
+    writer.start()
+    writer.join(timeout=5)
+    # The writer finished while the old view was still in use...
+    assert not writer.is_alive()
+    # ...and that view still shows the state it was taken at.
+    assert len(view.workouts['Workout']) == 1 and view.aggregates.total_sessions == 1
+    assert store.read('M1').aggregates.total_sessions == 101
+
+
+def test_writers_do_not_wait_on_the_columnar_mirror():
+    store = MemoryStore()
+
+    def writer(n):
+        for _ in range(WRITES_PER_THREAD):
+            store.add_workout(f'M{n}', WorkoutEntry.create('Workout', 'Run', 2, 10))
+
+    writers = [threading.Thread(target=writer, args=(n,)) for n in range(WRITERS)]
+    # Held by whoever folds queued rows in or grows the arrays.
+    with store._columns_lock:
+        for thread in writers:
+            thread.start()
+        for thread in writers:
+            thread.join(timeout=5)
+        assert not any(thread.is_alive() for thread in writers)
+    columns = store.columns()
+    assert len(columns) == WRITERS * WRITES_PER_THREAD
+    assert columns.report_summary('M3')['total_sessions'] == WRITES_PER_THREAD
+
+
+def test_http_add_and_index_under_threads():
+    app.config['TESTING'] = True
+    app_store.clear()
+    errors = []
+
+    def poster():
+        with app.test_client() as client:
+            for _ in range(25):
+                resp = client.post('/add', data={'workout': 'Burst', 'duration': '1', 'calories': '5', 'category': 'Workout'})
+                if resp.status_code != 302:
+                    errors.append(resp.status_code)
+
+    def getter():
+        with app.test_client() as client:
+            for _ in range(15):
+                page = client.get('/').get_data(as_text=True)
+                listed = page.count('class="workout-item"')
+                match = re.search(r'LIFETIME TOTAL: (\d+) minutes', page)
+                # Every session is 1 minute; the page embeds at most HOME_LOG_SIZE of them.
+                if min(int(match.group(1)), HOME_LOG_SIZE) != listed:
+                    errors.append(f'total {match.group(1)} != listed {listed}')
+
+    _run([threading.Thread(target=poster) for _ in range(6)] + [threading.Thread(target=getter) for _ in range(4)])
+    assert errors == []
+    assert app_store.aggregates('').total_sessions == 150
+    app_store.clear()
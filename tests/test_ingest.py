@@ -0,0 +1,54 @@
+import pytest
+
+from src.ingest import ValidationError, entries_from_records, entry_from_record, met_calories
+from src.models import MAX_ENTRY_VALUE, parse_timestamp
+
+
+def test_record_fields_and_defaults():
+    entry = entry_from_record({'workout': ' Row ', 'duration': '20', 'calories': 150}, now=1000)
+    assert (entry.category, entry.workout, entry.duration, entry.calories, entry.ts) == ('Workout', 'Row', 20, 150, 1000)
+    dated = entry_from_record({'workout': 'Run', 'duration': 30, 'calories': 1, 'timestamp': '2025-01-06 07:30:00'})
+    assert dated.ts == parse_timestamp('2025-01-06 07:30:00')
+    assert entry_from_record({'workout': 'Run', 'duration': 30, 'calories': 1, 'ts': 42}).ts == 42
+
+
+def test_historical_timestamps():
+    day = entry_from_record({'workout': 'Run', 'duration': 30, 'timestamp': '2019-05-01'})
+    assert day.timestamp == '2019-05-01 00:00:00'
+    utc = entry_from_record({'workout': 'Run', 'duration': 30, 'timestamp': '2019-05-01T06:00:00+00:00'})
+    assert utc.ts == 1556690400
+
+
+def test_missing_calories_use_met_formula():
+    entry = entry_from_record({'workout': 'Walk', 'duration': 40, 'category': 'Cool-down'}, weight=80)
+    assert entry.calories == met_calories('Cool-down', 40, 80) == 140
+
+
+@pytest.mark.parametrize('record, message', [
+    ({'duration': 10}, 'workout is required'),
+    ({'workout': 'Run', 'duration': 10, 'category': 'Nap'}, 'category must be one of'),
+    ({'workout': 'Run'}, 'duration is required'),
+    ({'workout': 'Run', 'duration': 'ten'}, 'duration must be a whole number'),
+    ({'workout': 'Run', 'duration': 2.5}, 'duration must be a whole number'),
+    ({'workout': 'Run', 'duration': True}, 'duration must be a whole number'),
+    ({'workout': 'Run', 'duration': 0}, 'duration must be a positive number'),
+    ({'workout': 'Run', 'duration': 10, 'calories': -1}, 'calories cannot be negative'),
+    ({'workout': 'Run', 'duration': MAX_ENTRY_VALUE + 1}, 'duration is too large'),
+    ({'workout': 'Run', 'duration': 10, 'timestamp': 'yesterday'}, 'timestamp must look like'),
+    ({'workout': 'Run', 'duration': 10, 'ts': -10 ** 17}, 'time must be between'),
+    ({'workout': 'Run', 'duration': 10, 'ts': MAX_ENTRY_VALUE}, 'time must be between'),
+    ({'workout': 'Run', 'duration': 10, 'timestamp': '1900-01-01'}, 'time must be between'),
+    ({'workout': 'Run', 'duration': 10, 'timestamp': '2037-12-31'}, 'time must be between'),
+    (['Run', 10], 'entry must be an object'),
+])
+def test_invalid_records(record, message):
+    with pytest.raises(ValueError, match=message):
+        entry_from_record(record)
+
+
+def test_batch_reports_every_invalid_record():
+    records = [{'workout': 'Run', 'duration': 10}, {'workout': ''}, {'workout': 'Row', 'duration': -5}]
+    with pytest.raises(ValidationError) as excinfo:
+        entries_from_records(records)
+    assert sorted(excinfo.value.errors) == [1, 2]
+    assert len(entries_from_records(records[:1], now=7)) == 1
@@ -0,0 +1,312 @@
+import glob
+import os
+import time
+
+import pytest
+
+from src import journal as journal_module
+from src.journal import Journal, JournalInUse
+from src.models import WorkoutEntry, parse_timestamp
+from src.storage import MemoryStore
+
+
+def _entry(category, name, duration=30, calories=200, timestamp='2025-01-06 07:30:00'):
+    return WorkoutEntry(category, name, duration, calories, parse_timestamp(timestamp))
+
+
+def _open(directory, **kwargs):
+    return MemoryStore(journal=Journal(str(directory), **kwargs))
+
+
+def test_replay_restores_workouts_and_profile(tmp_path):
+    store = _open(tmp_path)
+    store.save_profile('M1', {'name': 'Ana', 'weight': 61.5})
+    store.add_workout('M1', _entry('Workout', 'Run'))
+    store.add_workout('M1', _entry('Cool-down', 'Stretch', 10, 30))
+    store.close()
+
+    restored = _open(tmp_path)
+    assert restored.get_profile('M1') == {'name': 'Ana', 'weight': 61.5}
+    assert [e.workout for e in restored.workouts('M1')['Workout']] == ['Run']
+    assert restored.aggregates('M1').total_minutes == 40
+    assert len(restored.columns()) == 2
+    # Ids keep increasing after a restart.
+    later = _entry('Warm-up', 'Jog')
+    restored.add_workout('M1', later)
+    assert later.id == 3
+    restored.close()
+
+
+def test_clear_is_journaled(tmp_path):
+    store = _open(tmp_path)
+    store.add_workout('M1', _entry('Workout', 'Run'))
+    store.clear()
+    store.add_workout('M1', _entry('Workout', 'Row'))
+    store.close()
+    restored = _open(tmp_path)
+    assert [e.workout for e in restored.workouts('M1')['Workout']] == ['Row']
+    restored.close()
+
+
+def test_torn_tail_is_dropped(tmp_path):
+    store = _open(tmp_path)
+    store.add_workout('M1', _entry('Workout', 'Run'))
+    store.add_workout('M1', _entry('Workout', 'Row'))
+    store.close()
+    segment = sorted(glob.glob(str(tmp_path / 'journal-*.bin')))[-1]
+    size = os.path.getsize(segment)
+    with open(segment, 'r+b') as f:
+        f.truncate(size - 3)
+    restored = _open(tmp_path)
+    assert [e.workout for e in restored.workouts('M1')['Workout']] == ['Run']
+    restored.close()
+
+
+def test_checkpoint_writes_snapshot_and_truncates_log(tmp_path):
+    store = _open(tmp_path)
+    store.save_profile('M1', {'name': 'Snap'})
+    for i in range(5):
+        store.add_workout('M1', _entry('Workout', f'Set {i}', duration=i + 1))
+    store.checkpoint()
+    store.add_workout('M1', _entry('Cool-down', 'Walk'))
+    store.close()
+    segments = glob.glob(str(tmp_path / 'journal-*.bin'))
+    assert os.path.exists(tmp_path / 'snapshot.bin')
+    # Only the segment written after the snapshot remains.
+    assert len(segments) == 1
+
+    restored = _open(tmp_path)
+    assert restored.get_profile('M1') == {'name': 'Snap'}
+    assert [e.workout for e in restored.workouts('M1')['Workout']] == [f'Set {i}' for i in range(5)]
+    assert [e.workout for e in restored.workouts('M1')['Cool-down']] == ['Walk']
+    assert restored.aggregates('M1').total_sessions == 6
+    restored.close()
+
+
+def test_background_checkpoint_after_threshold(tmp_path):
+    store = _open(tmp_path, flush_interval=0.01, snapshot_every=3)
+    for i in range(4):
+        store.add_workout('M1', _entry('Workout', f'Set {i}'))
+    journal = store._journal
+    for _ in range(200):
+        if os.path.exists(tmp_path / 'snapshot.bin'):
+            break
+        journal._wakeup.wait(0.01)
+    store.close()
+    assert os.path.exists(tmp_path / 'snapshot.bin')
+    restored = _open(tmp_path)
+    assert len(restored.workouts('M1')['Workout']) == 4
+    restored.close()
+
+
+def test_group_commit_fsyncs_once_per_batch(tmp_path, monkeypatch):
+    journal = Journal(str(tmp_path), flush_interval=3600)
+    journal.replay(lambda kind, payload: None)
+    journal.start()
+    calls = []
+    monkeypatch.setattr(journal_module.os, 'fsync', lambda fd: calls.append(fd))
+    for i in range(100):
+        journal.append(journal_module.KIND_CLEAR, b'')
+    assert calls == []  # appends never fsync on the caller's thread
+    journal.sync()
+    assert len(calls) == 1
+    journal.sync()  # nothing new buffered
+    assert len(calls) == 1
+    journal.close()
+
+
+def test_replay_keeps_members_apart(tmp_path):
+    store = _open(tmp_path)
+    store.save_profile('A1', {'name': 'Alice'})
+    store.add_workout('A1', _entry('Workout', 'Run'))
+    store.add_workout('B2', _entry('Workout', 'Swim'))
+    store.checkpoint()
+    store.add_workout('A1', _entry('Cool-down', 'Walk'))
+    store.close()
+    restored = _open(tmp_path)
+    assert restored.members() == ['A1', 'B2']
+    assert restored.get_profile('A1') == {'name': 'Alice'}
+    assert [e.workout for e in restored.workouts('B2')['Workout']] == ['Swim']
+    assert restored.aggregates('A1').total_sessions == 2
+    restored.close()
+
+
+def test_names_longer_than_64k_round_trip(tmp_path):
+    member_id, name = 'M' * 70000, 'Run ' * 20000
+    store = _open(tmp_path)
+    store.save_profile(member_id, {'name': 'Ana'})
+    store.add_workout(member_id, _entry('Workout', name))
+    store.add_workouts(member_id, [_entry('Warm-up', name)])
+    store.close()
+    restored = _open(tmp_path)
+    assert restored.get_profile(member_id) == {'name': 'Ana'}
+    workouts = restored.workouts(member_id)
+    assert [e.workout for category in ('Workout', 'Warm-up') for e in workouts[category]] == [name, name]
+    restored.close()
+
+
+def test_forked_worker_keeps_journaling(tmp_path):
+    store = _open(tmp_path)
+    store.add_workout('M1', _entry('Workout', 'Run'))
+    store._journal.sync()
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            store.after_fork()
+            store.add_workout('M1', _entry('Cool-down', 'Stretch', 10, 30))
+            store.close()
+            code = 0
+        finally:
+            os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    store.close()
+
+    restored = _open(tmp_path)
+    assert [e.workout for e in restored.workouts('M1')['Cool-down']] == ['Stretch']
+    assert restored.aggregates('M1').total_sessions == 2
+    restored.close()
+
+
+def test_batches_replay_as_one_record(tmp_path):
+    store = _open(tmp_path)
+    store.add_workouts('M1', [_entry('Workout', 'Run'), _entry('Warm-up', 'Jog', 5, 20)])
+    store.close()
+    records = []
+    Journal(str(tmp_path)).replay(lambda kind, payload: records.append(kind))
+    assert records == [journal_module.KIND_BATCH]
+
+    restored = _open(tmp_path)
+    assert restored.aggregates('M1').total_sessions == 2
+    later = _entry('Workout', 'Row')
+    restored.add_workout('M1', later)
+    assert later.id == 3
+    restored.close()
+
+
+def test_failed_fsync_refuses_appends_until_restart(tmp_path, monkeypatch):
+    journal = Journal(str(tmp_path), flush_interval=0.01)
+    journal.replay(lambda kind, payload: None)
+    journal.start()
+    real_fsync, failing, calls = os.fsync, [True], []
+
+    def fsync(fd):
+        calls.append(fd)
+        if failing[0]:
+            raise OSError(5, 'Input/output error')
+        real_fsync(fd)
+
+    monkeypatch.setattr(journal_module.os, 'fsync', fsync)
+    journal.append(journal_module.KIND_CLEAR, b'')
+    journal._thread.join(2)
+    # The flusher gives up instead of retrying descriptors whose pages may be gone.
+    assert journal.error is not None and not journal._thread.is_alive()
+    assert len(calls) == 1
+    failing[0] = False
+    with pytest.raises(OSError, match='cannot be synced'):
+        journal.append(journal_module.KIND_CLEAR, b'')
+    with pytest.raises(OSError, match='cannot be synced'):
+        journal.sync()
+    assert journal.error is not None and len(calls) == 1
+    journal.close()
+    # A restart replays what reached the disk and journals again.
+    restarted = Journal(str(tmp_path), flush_interval=0.01)
+    restarted.replay(lambda kind, payload: None)
+    restarted.start()
+    restarted.append(journal_module.KIND_CLEAR, b'')
+    restarted.sync()
+    assert restarted.error is None
+    restarted.close()
+
+
+def test_checkpoint_fsyncs_after_releasing_the_writers(tmp_path, monkeypatch):
+    store = _open(tmp_path, flush_interval=3600)
+    store.add_workout('M1', _entry('Workout', 'Run'))
+    held = []
+    monkeypatch.setattr(journal_module.os, 'fsync',
+                        lambda fd: held.append(store._shards_lock.locked() or store._shards['M1'].lock.locked()))
+    store.checkpoint()
+    assert held and not any(held)
+    store.close()
+
+
+def test_snapshot_records_do_not_count_towards_the_next_checkpoint(tmp_path):
+    store = _open(tmp_path)
+    for i in range(5):
+        store.add_workout('M1', _entry('Workout', f'Set {i}'))
+    store.checkpoint()
+    store.add_workout('M1', _entry('Cool-down', 'Walk'))
+    store.close()
+    journal = Journal(str(tmp_path))
+    assert journal.replay(lambda kind, payload: None) == 6
+    assert journal._since_snapshot == 1
+
+
+def test_directory_belongs_to_one_process_at_a_time(tmp_path):
+    store = _open(tmp_path)
+    with pytest.raises(JournalInUse):
+        _open(tmp_path)
+    store.close()
+    _open(tmp_path).close()
+
+
+def _in_child(body):
+    """Run ``body()`` in a forked child; returns its exit status (0 on success)."""
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            code = body() or 0
+        finally:
+            os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    return os.WEXITSTATUS(status)
+
+
+def test_only_one_forked_worker_takes_the_journal_over(tmp_path):
+    store = _open(tmp_path)
+    store.add_workout('M1', _entry('Workout', 'Run'))
+    read_end, write_end = os.pipe()
+    first = os.fork()
+    if first == 0:
+        code = 1
+        try:
+            store.after_fork()
+            store.add_workout('M1', _entry('Workout', 'Row'))
+            store._journal.sync()
+            os.write(write_end, b'1')
+            os.read(read_end, 1)  # stay alive while the sibling starts
+            store.close()
+            code = 0
+        finally:
+            os._exit(code)
+    os.read(read_end, 1)
+
+    def sibling():
+        try:
+            store.after_fork()
+        except JournalInUse:
+            return 0
+        return 2
+
+    assert _in_child(sibling) == 0
+    # The parent handed the journal over at the first fork.
+    with pytest.raises(JournalInUse):
+        store.add_workout('M1', _entry('Workout', 'Swim'))
+    os.write(write_end, b'1')
+    _, status = os.waitpid(first, 0)
+    assert os.WEXITSTATUS(status) == 0
+
+    def replacement():
+        # A worker replacing the dead one replays what it wrote.
+        store.after_fork()
+        names = [e.workout for e in store.workouts('M1')['Workout']]
+        store.close()
+        return 0 if names == ['Run', 'Row'] else 3
+
+    assert _in_child(replacement) == 0
+    store.close()
+    restored = _open(tmp_path)
+    assert [e.workout for e in restored.workouts('M1')['Workout']] == ['Run', 'Row']
+    restored.close()
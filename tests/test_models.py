@@ -0,0 +1,31 @@
+import pytest
+
+from src.models import WorkoutEntry, parse_timestamp
+
+
+def test_entry_timestamp_roundtrip():
+    ts = parse_timestamp('2025-03-04 05:06:07')
+    entry = WorkoutEntry('Workout', 'Squats', 20, 150, ts)
+    assert entry.timestamp == '2025-03-04 05:06:07'
+    assert entry.date_str == '2025-03-04'
+    assert entry.to_dict() == {
+        'category': 'Workout', 'workout': 'Squats', 'duration': 20,
+        'calories': 150, 'timestamp': '2025-03-04 05:06:07',
+    }
+
+
+def test_entry_item_access_and_slots():
+    entry = WorkoutEntry.create('Warm-up', 'Jog', 10, 40)
+    assert entry['calories'] == 40
+    assert entry['timestamp'] == entry.timestamp
+    with pytest.raises(KeyError):
+        entry['missing']
+    assert not hasattr(entry, '__dict__')
+    with pytest.raises(AttributeError):
+        entry.notes = 'x'
+
+
+def test_exercise_names_are_interned():
+    a = WorkoutEntry.create('Workout', ''.join(['Run', 'ning']), 30, 300)
+    b = WorkoutEntry.create('Workout', ''.join(['Runn', 'ing']), 25, 250)
+    assert a.workout is b.workout
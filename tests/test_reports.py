@@ -0,0 +1,128 @@
+import io
+import os
+import re
+import threading
+import time
+
+import pytest
+
+from src.reports import (
+    DONE, FAILED, QUEUED, ReportCache, ReportJobs, ReportQueueFull, write_table_pdf,
+)
+
+HEADER = ['Category', 'Exercise']
+
+
+def _pages(pdf):
+    return len(re.findall(rb'/Type /Page\b', pdf))
+
+
+def _render(rows, lines=('one', 'two', 'three')):
+    out = io.BytesIO()
+    pages = write_table_pdf(out, 'Report', list(lines), HEADER, rows, [100, 100])
+    return pages, out.getvalue()
+
+
+def test_rows_flow_onto_as_many_pages_as_needed():
+    pages, pdf = _render(([str(i), 'Run'] for i in range(500)))
+    assert pdf.startswith(b'%PDF') and pages == _pages(pdf) > 10
+
+
+def test_full_last_page_leaves_no_blank_page():
+    first, _ = _render([])
+    assert first == 1
+    # Page 1 holds 34 rows under three info lines, later pages 39.
+    assert _render([['x', 'y']] * (34 + 39))[0] == 2
+    assert _render([['x', 'y']] * (34 + 39 + 1))[0] == 3
+
+
+def test_rows_are_consumed_one_page_at_a_time(monkeypatch):
+    import reportlab.platypus
+
+    pulled, drawn, ahead = [], [0], []
+    real_table = reportlab.platypus.Table
+
+    def table(data, *args, **kwargs):
+        drawn[0] += len(data) - 1
+        ahead.append(len(pulled) - drawn[0])
+        return real_table(data, *args, **kwargs)
+
+    def rows():
+        for i in range(200):
+            pulled.append(i)
+            yield [str(i), 'Run']
+
+    monkeypatch.setattr(reportlab.platypus, 'Table', table)
+    pages = write_table_pdf(io.BytesIO(), 'Report', [], HEADER, rows(), [100, 100])
+    assert pages == len(ahead) > 3 and drawn[0] == 200
+    # Nothing beyond the page being laid out has been read from the iterator.
+    assert max(ahead) == 0
+
+
+def _jobs(tmp_path, render, **kwargs):
+    return ReportJobs(ReportCache(str(tmp_path / 'cache'), max_files=2), render, **kwargs)
+
+
+def _pdf(text):
+    return io.BytesIO(text.encode())
+
+
+def test_jobs_render_once_per_key_and_cache_the_result(tmp_path):
+    calls = []
+    jobs = _jobs(tmp_path, lambda name: calls.append(name) or _pdf(name))
+    first = jobs.submit(('M1', 1), 'one')
+    assert first.wait(5) and first.status == DONE
+    again = jobs.submit(('M1', 1), 'one')
+    assert again.status == DONE and calls == ['one']
+    assert jobs.cache.open(('M1', 1)).read() == b'one'
+    assert jobs.status(('M1', 2)) is None
+    jobs.shutdown()
+
+
+def test_pending_jobs_are_bounded_and_deduplicated(tmp_path):
+    release = threading.Event()
+
+    def render(name):
+        release.wait(5)
+        return _pdf(name)
+
+    jobs = _jobs(tmp_path, render, workers=1, max_pending=2)
+    running = jobs.submit('a', 'a')
+    assert jobs.submit('a', 'a') is running
+    jobs.submit('b', 'b')
+    with pytest.raises(ReportQueueFull):
+        jobs.submit('c', 'c')
+    assert jobs.status('b').status == QUEUED
+    release.set()
+    assert running.wait(5) and jobs.status('b').wait(5)
+    jobs.shutdown()
+
+
+def test_failed_jobs_report_their_error_and_can_be_retried(tmp_path):
+    outcomes = [ValueError('no profile'), None]
+
+    def render():
+        error = outcomes.pop(0)
+        if error:
+            raise error
+        return _pdf('ok')
+
+    jobs = _jobs(tmp_path, render)
+    failed = jobs.submit('k')
+    assert failed.wait(5) and failed.status == FAILED and failed.error == 'no profile'
+    assert jobs.status('k') is failed
+    retried = jobs.submit('k')
+    assert retried.wait(5) and retried.status == DONE
+    jobs.shutdown()
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ReportCache(str(tmp_path), max_files=2)
+    cache.put('a', _pdf('a'))
+    cache.put('b', _pdf('b'))
+    old = time.time() - 60
+    for key in ('a', 'b'):
+        os.utime(cache._path(key), (old, old))
+    cache.open('a').close()
+    cache.put('c', _pdf('c'))
+    assert 'a' in cache and 'c' in cache and 'b' not in cache
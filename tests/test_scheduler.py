@@ -0,0 +1,94 @@
+import os
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from src.scheduler import WeeklyPrerender, closed_week, parse_hours
+
+MONDAY = date(2025, 1, 13)
+
+
+class Clock:
+    def __init__(self, now, step=None):
+        self.now, self.step = now, step
+
+    def __call__(self):
+        now = self.now
+        if self.step:
+            self.now += self.step
+        return now
+
+
+def _scheduler(tmp_path, members=('M1', 'M2'), render=lambda member_id, today: True, clock=None, **kwargs):
+    return WeeklyPrerender(lambda start, end: list(members), render, str(tmp_path / 'prerender.lock'),
+                           pause=0, clock=clock or Clock(datetime(2025, 1, 13, 2)), **kwargs)
+
+
+def test_parse_hours():
+    assert parse_hours('1-6') == (1, 6)
+    for bad in ('6-1', '0-25', 'night'):
+        with pytest.raises(ValueError):
+            parse_hours(bad)
+
+
+def test_closed_week_is_the_iso_week_before_monday():
+    start, end = closed_week(MONDAY)
+    assert datetime.fromtimestamp(start) == datetime(2025, 1, 6)
+    assert datetime.fromtimestamp(end) == datetime(2025, 1, 13)
+
+
+def test_runs_in_the_monday_window_once_per_week(tmp_path):
+    scheduler = _scheduler(tmp_path)
+    assert scheduler.next_run(datetime(2025, 1, 12, 23)) == datetime(2025, 1, 13, 1)
+    assert scheduler.next_run(datetime(2025, 1, 13, 0, 30)) == datetime(2025, 1, 13, 1)
+    inside = datetime(2025, 1, 13, 3)
+    assert scheduler.next_run(inside) == inside
+    assert scheduler.next_run(datetime(2025, 1, 13, 6)) == datetime(2025, 1, 20, 1)
+    assert scheduler.next_run(datetime(2025, 1, 16, 3)) == datetime(2025, 1, 20, 1)
+    assert scheduler.run_once(MONDAY) == 2
+    assert scheduler.next_run(inside) == datetime(2025, 1, 20, 1)
+
+
+def test_only_new_reports_count_and_failures_do_not_stop_the_run(tmp_path):
+    rendered = []
+
+    def render(member_id, today):
+        if member_id == 'bad':
+            raise RuntimeError('boom')
+        rendered.append((member_id, today))
+        return member_id != 'cached'
+
+    scheduler = _scheduler(tmp_path, members=('M1', 'bad', 'cached', 'M2'), render=render)
+    assert scheduler.run_once(MONDAY) == 2
+    assert rendered == [('M1', MONDAY), ('cached', MONDAY), ('M2', MONDAY)]
+
+
+def test_run_stops_when_the_window_closes(tmp_path):
+    clock = Clock(datetime(2025, 1, 13, 5, 58), step=timedelta(minutes=1))
+    scheduler = _scheduler(tmp_path, members=[f'M{n}' for n in range(10)], clock=clock)
+    assert scheduler.run_once(MONDAY) == 2
+    # Not finished: the rest waits for next week's window.
+    assert scheduler.next_run(datetime(2025, 1, 13, 6)) == datetime(2025, 1, 20, 1)
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='lock files need fcntl')
+def test_one_worker_renders_at_a_time(tmp_path, monkeypatch):
+    import fcntl
+    monkeypatch.setattr('src.scheduler.LOCK_RETRY', 0)
+    with open(tmp_path / 'prerender.lock', 'a') as held:
+        fcntl.flock(held, fcntl.LOCK_EX)
+        clock = Clock(datetime(2025, 1, 13, 5, 59), step=timedelta(seconds=30))
+        assert _scheduler(tmp_path, clock=clock).run_once(MONDAY) == 0
+    assert _scheduler(tmp_path).run_once(MONDAY) == 2
+
+
+def test_background_thread_starts_once_and_stops(tmp_path):
+    scheduler = _scheduler(tmp_path, clock=Clock(datetime(2025, 1, 14, 12)))
+    scheduler.start()
+    thread = scheduler._thread
+    scheduler.start()
+    assert scheduler._thread is thread and thread.daemon
+    scheduler.stop()
+    assert not thread.is_alive()
+    scheduler.after_fork()
+    assert not scheduler.started
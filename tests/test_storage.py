@@ -0,0 +1,316 @@
+import sqlite3
+import threading
+from datetime import date, timedelta
+
+import pytest
+from src.models import WorkoutEntry, parse_timestamp
+from src.storage import CATEGORIES, MemoryStore, SQLiteStore, create_store
+
+
+def _entry(category, name, duration=30, calories=200, timestamp='2025-01-06 07:30:00'):
+    return WorkoutEntry(category, name, duration, calories, parse_timestamp(timestamp))
+
+
+def test_add_and_list_workouts(store):
+    store.add_workout('M1', _entry('Workout', 'Run'))
+    store.add_workout('M1', _entry('Warm-up', 'Jog', duration=10))
+    store.add_workout('M1', _entry('Workout', 'Row', timestamp='2025-01-07 18:00:00'))
+    workouts = store.workouts('M1')
+    assert tuple(workouts) == CATEGORIES
+    assert [e['workout'] for e in workouts['Workout']] == ['Run', 'Row']
+    assert workouts['Warm-up'][0]['duration'] == 10
+    assert workouts['Cool-down'] == []
+
+
+def test_daily_workouts_grouped_by_date(store):
+    store.add_workout('M1', _entry('Workout', 'Run'))
+    store.add_workout('M1', _entry('Cool-down', 'Stretch', timestamp='2025-01-07 08:00:00'))
+    daily = store.daily_workouts('M1')
+    assert sorted(daily) == ['2025-01-06', '2025-01-07']
+    assert [e['workout'] for e in daily['2025-01-06']['Workout']] == ['Run']
+    assert [e['workout'] for e in daily['2025-01-07']['Cool-down']] == ['Stretch']
+
+
+def test_profile_roundtrip_and_clear(store):
+    assert store.get_profile('M1') == {}
+    store.save_profile('M1', {'name': 'A', 'weight': 70.0})
+    store.save_profile('M1', {'name': 'B', 'weight': 55.5})
+    assert store.get_profile('M1') == {'name': 'B', 'weight': 55.5}
+    store.add_workout('M1', _entry('Workout', 'Run'))
+    store.clear()
+    assert store.get_profile('M1') == {}
+    assert all(entries == [] for entries in store.workouts('M1').values())
+
+
+def test_sqlite_shared_between_instances(tmp_path):
+    """Two stores on one file (e.g. two gunicorn workers) see the same data."""
+    path = str(tmp_path / 'shared.db')
+    first, second = SQLiteStore(path), SQLiteStore(path)
+    first.add_workout('M1', _entry('Workout', 'Run'))
+    first.save_profile('M1', {'name': 'Shared'})
+    assert [e['workout'] for e in second.workouts('M1')['Workout']] == ['Run']
+    assert second.get_profile('M1') == {'name': 'Shared'}
+    journal_mode = second._conn().execute("PRAGMA journal_mode").fetchone()[0]
+    assert journal_mode == 'wal'
+    first.close()
+    second.close()
+
+
+def test_create_store_from_env(monkeypatch, tmp_path):
+    monkeypatch.setenv('ACEEST_STORE', 'sqlite')
+    monkeypatch.setenv('ACEEST_DB_PATH', str(tmp_path / 'env.db'))
+    store = create_store()
+    assert isinstance(store, SQLiteStore)
+    store.close()
+    monkeypatch.delenv('ACEEST_STORE')
+    assert isinstance(create_store(), MemoryStore)
+    with pytest.raises(ValueError):
+        create_store('redis')
+
+
+def test_aggregates_match_log(store):
+    today = date.today()
+    stamp = today.strftime('%Y-%m-%d') + ' 09:00:00'
+    old_stamp = (today - timedelta(days=30)).strftime('%Y-%m-%d') + ' 09:00:00'
+    store.add_workout('M1', _entry('Workout', 'Run', 30, 300, stamp))
+    store.add_workout('M1', _entry('Warm-up', 'Jog', 10, 50, stamp))
+    store.add_workout('M1', _entry('Workout', 'Old', 20, 400, old_stamp))
+    aggregates = store.aggregates('M1')
+    assert aggregates.progress_totals() == {'Warm-up': 10, 'Workout': 50, 'Cool-down': 0}
+    assert aggregates.total_sessions == 3
+    assert aggregates.weekly_calories(today) == 350
+    store.clear()
+    assert store.aggregates('M1').total_minutes == 0
+
+
+def test_sqlite_backfills_aggregates_for_existing_db(tmp_path):
+    path = str(tmp_path / 'legacy.db')
+    store = SQLiteStore(path)
+    store.add_workout('M1', _entry('Workout', 'Run'))
+    with store._conn() as conn:
+        conn.execute("DELETE FROM category_totals")
+        conn.execute("DELETE FROM daily_calories")
+    store.close()
+    reopened = SQLiteStore(path)
+    assert reopened.aggregates('M1').progress_totals()['Workout'] == 30
+    reopened.close()
+
+
+def test_sqlite_drops_the_unused_timestamp_index(tmp_path):
+    path = str(tmp_path / 'legacy.db')
+    store = SQLiteStore(path)
+    with store._conn() as conn:
+        conn.execute("CREATE INDEX idx_workouts_member_ts ON workouts (member_id, ts, id)")
+    store.close()
+    reopened = SQLiteStore(path)
+    names = {row[0] for row in reopened._conn().execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert 'idx_workouts_member_ts' not in names and 'idx_workouts_member_category_ts' in names
+    reopened.close()
+
+
+def test_sqlite_closes_the_connections_of_finished_threads(tmp_path):
+    store = SQLiteStore(str(tmp_path / 'aceest.db'))
+    opened = []
+
+    def request():
+        opened.append(store._conn())
+        store.get_profile('M1')
+
+    for _ in range(20):
+        thread = threading.Thread(target=request)
+        thread.start()
+        thread.join()
+    # Only the creating thread's connection is still tracked; the rest are closed.
+    assert len(store._connections) == 1
+    with pytest.raises(sqlite3.ProgrammingError):
+        opened[0].execute("SELECT 1")
+    store.close()
+
+
+def test_entries_are_records_with_ids(store):
+    first = _entry('Workout', 'Running')
+    store.add_workout('M1', first)
+    store.add_workout('M1', _entry('Workout', ''.join(['Run', 'ning']), timestamp='2025-01-06 18:05:09'))
+    entries = store.workouts('M1')['Workout']
+    assert all(isinstance(e, WorkoutEntry) for e in entries)
+    assert entries[0].id == first.id and entries[1].id > entries[0].id
+    assert entries[1].timestamp == '2025-01-06 18:05:09'
+    assert entries[1].date_str == '2025-01-06'
+    # Repeated exercise names share one string object.
+    assert entries[0].workout is entries[1].workout
+
+
+def test_columnar_mirror_matches_log(store):
+    store.add_workout('M1', _entry('Workout', 'Run', 30, 300))
+    store.add_workout('M1', _entry('Cool-down', 'Stretch', 10, 40))
+    columns = store.columns()
+    assert len(columns) == 2
+    assert columns.progress_totals() == store.aggregates('M1').progress_totals()
+    assert list(columns.column('id')) == [e.id for e in (list(store.workouts('M1')['Workout']) + list(store.workouts('M1')['Cool-down']))]
+
+
+def test_read_view_is_a_stable_snapshot(store):
+    store.save_profile('M1', {'name': 'Before'})
+    store.add_workout('M1', _entry('Workout', 'Run', 30, 300))
+    view = store.read('M1')
+    store.add_workout('M1', _entry('Workout', 'Swim', 20, 150))
+    store.save_profile('M1', {'name': 'After'})
+    assert [e.workout for e in view.workouts['Workout']] == ['Run']
+    assert view.aggregates.total_sessions == 1
+    assert view.profile['name'] == 'Before'
+    assert len(store.read('M1').workouts['Workout']) == 2
+
+
+def test_data_versions_only_increase(store):
+    assert store.data_version('M1') == (0, None)
+    store.add_workout('M1', _entry('Workout', 'Run'))
+    first, modified = store.data_version('M1')
+    assert first > 0 and modified is not None
+    store.save_profile('M2', {'name': 'Bo'})
+    second = store.data_version('M2')[0]
+    assert second > first
+    assert store.data_version('M1')[0] == first
+    view = store.read('M1')
+    assert (view.version, view.modified) == (first, modified)
+    store.clear()
+    assert store.data_version('M1') == (0, None)
+    store.add_workout('M1', _entry('Workout', 'Run'))
+    # Never reused, even after clear().
+    assert store.data_version('M1')[0] > second
+
+
+def test_sqlite_data_version_is_persisted(tmp_path):
+    path = str(tmp_path / 'v.db')
+    first = SQLiteStore(path)
+    first.add_workout('M1', _entry('Workout', 'Run'))
+    second = SQLiteStore(path)
+    assert second.epoch == first.epoch
+    assert second.data_version('M1') == first.data_version('M1')
+    first.close()
+    second.close()
+
+
+def test_read_page_windows_each_category(store):
+    for i in range(5):
+        store.add_workout('M1', _entry('Workout', f'W{i}', 10, 50))
+    store.add_workout('M1', _entry('Cool-down', 'Stretch', 5, 10))
+    view = store.read_page('M1', 2, 2)
+    assert [e.workout for e in view.workouts['Workout']] == ['W2', 'W3']
+    assert list(view.workouts['Cool-down']) == []
+    assert view.aggregates.sessions['Workout'] == 5
+    assert view.version == store.data_version('M1')[0]
+
+
+def test_recent_listing_orders_by_timestamp_then_id(store):
+    store.add_workout('M1', _entry('Workout', 'Tue', timestamp='2025-01-07 07:00:00'))
+    store.add_workout('M1', _entry('Workout', 'Wed', timestamp='2025-01-08 07:00:00'))
+    # Backfilled: logged last, happened first.
+    store.add_workout('M1', _entry('Workout', 'Mon', timestamp='2025-01-06 07:00:00'))
+    store.add_workout('M1', _entry('Workout', 'Wed2', timestamp='2025-01-08 07:00:00'))
+    recent = store.read_recent('M1', 2)
+    assert [e.workout for e in recent.workouts['Workout']] == ['Wed2', 'Wed']
+    assert recent.aggregates.sessions['Workout'] == 4
+    last = recent.workouts['Workout'][-1]
+    older = store.workouts_before('M1', 'Workout', (last.ts, last.id), 5)
+    assert [e.workout for e in older] == ['Tue', 'Mon']
+    assert store.workouts_before('M1', 'Cool-down', (last.ts, last.id), 5) == []
+
+
+def test_backfilled_entries_keep_listings_bisectable():
+    store = MemoryStore()
+    days = [8, 3, 9, 1, 9, 5, 2, 7, 4, 6]
+    for n, day in enumerate(days):
+        store.add_workout('M1', _entry('Workout', f'W{n}', timestamp=f'2025-01-{day:02d} 07:00:00'))
+    shard = store._shards['M1']
+    published = shard.current
+    before_backfill = list(shard.by_position(1, published))
+    store.add_workouts('M1', [_entry('Workout', 'Old', timestamp='2024-12-31 07:00:00'),
+                              _entry('Workout', 'New', timestamp='2025-01-10 07:00:00')])
+    # Versions already handed to readers keep their order.
+    assert list(shard.by_position(1, published)) == before_backfill
+
+    log = list(store.workouts('M1')['Workout'])
+    expected = sorted(log, key=lambda e: (e.ts, e.id), reverse=True)
+    assert store.read_recent('M1', 3).workouts['Workout'] == expected[:3]
+    cursor = (expected[4].ts, expected[4].id)
+    assert store.workouts_before('M1', 'Workout', cursor, 3) == expected[5:8]
+    start, end = parse_timestamp('2025-01-03 00:00:00'), parse_timestamp('2025-01-08 00:00:00')
+    window = [e for _, e in store.export_workouts('M1', ['Workout'], start, end)]
+    assert window == [e for e in log if start <= e.ts < end]
+
+
+def test_add_workouts_applies_a_batch(store):
+    batch = [_entry('Workout', 'Run', 30, 300), _entry('Cool-down', 'Stretch', 10, 40)]
+    store.add_workouts('M1', batch)
+    assert all(entry.id for entry in batch) and batch[1].id > batch[0].id
+    view = store.read('M1')
+    assert view.aggregates.total_sessions == 2
+    assert [e.id for e in view.workouts['Cool-down']] == [batch[1].id]
+    assert len(store.columns()) == 2
+
+
+def test_failed_batch_leaves_the_shard_unchanged():
+    store = MemoryStore()
+    store.add_workout('M1', _entry('Workout', 'Run'))
+    before = store.read('M1')
+    with pytest.raises((ValueError, OverflowError, OSError)):
+        store.add_workouts('M1', [_entry('Workout', 'Row'), WorkoutEntry('Workout', 'Swim', 30, 200, -10 ** 17)])
+    view = store.read('M1')
+    assert view.version == before.version
+    assert [e.workout for e in view.workouts['Workout']] == ['Run']
+    store.add_workout('M1', _entry('Workout', 'Row', timestamp='2025-01-07 07:30:00'))
+    assert [e.workout for e in store.read('M1').workouts['Workout']] == ['Run', 'Row']
+
+
+def test_export_filters_and_pages_without_holding_a_snapshot(store, monkeypatch):
+    monkeypatch.setattr('src.storage.EXPORT_PAGE_SIZE', 2)
+    store.add_workouts('B2', [_entry('Workout', 'Swim', timestamp='2025-01-08 09:00:00')])
+    store.add_workouts('A1', [
+        _entry('Workout', 'Run', timestamp='2025-01-06 07:00:00'),
+        _entry('Warm-up', 'Jog', timestamp='2025-01-07 07:00:00'),
+        _entry('Workout', 'Row', timestamp='2025-01-05 07:00:00'),
+        _entry('Cool-down', 'Walk', timestamp='2025-01-09 07:00:00'),
+    ])
+    rows = store.export_workouts()
+    first = next(rows)
+    # Writers are not blocked while an export is half-way through.
+    store.add_workout('C3', _entry('Workout', 'Bike', timestamp='2025-01-10 07:00:00'))
+    listed = [first] + list(rows)
+    assert [(member, e.workout) for member, e in listed][:5] == [
+        ('A1', 'Run'), ('A1', 'Jog'), ('A1', 'Row'), ('A1', 'Walk'), ('B2', 'Swim')]
+
+    start, end = parse_timestamp('2025-01-06 00:00:00'), parse_timestamp('2025-01-09 00:00:00')
+    window = store.export_workouts(categories=['Workout', 'Warm-up'], start_ts=start, end_ts=end)
+    assert [e.workout for _, e in window] == ['Run', 'Jog', 'Swim']
+    assert [e.workout for _, e in store.export_workouts('A1', ['Cool-down'])] == ['Walk']
+    assert list(store.export_workouts('nobody')) == []
+
+
+def test_active_members_trained_in_the_window(store, monkeypatch):
+    store.add_workout('B2', _entry('Workout', 'Swim', timestamp='2025-01-07 07:00:00'))
+    store.add_workout('A1', _entry('Workout', 'Run', timestamp='2025-01-08 07:00:00'))
+    store.add_workout('C3', _entry('Workout', 'Row', timestamp='2025-01-13 07:00:00'))
+    store.save_profile('D4', {'name': 'Dee'})
+    if isinstance(store, SQLiteStore):
+        # Answered in SQL, without loading the gym-wide columns.
+        monkeypatch.setattr(store, 'columns', lambda: pytest.fail("loaded every workout"))
+    start, end = parse_timestamp('2025-01-06 00:00:00'), parse_timestamp('2025-01-13 00:00:00')
+    assert store.active_members(start, end) == ['A1', 'B2']
+
+
+def test_members_are_isolated(store):
+    store.save_profile('A1', {'name': 'Alice'})
+    store.save_profile('B2', {'name': 'Bob'})
+    store.add_workout('A1', _entry('Workout', 'Run', 30, 300))
+    store.add_workout('B2', _entry('Workout', 'Swim', 45, 400))
+    store.add_workout('B2', _entry('Cool-down', 'Walk', 10, 40))
+    assert [e.workout for e in store.workouts('A1')['Workout']] == ['Run']
+    assert store.aggregates('B2').total_sessions == 2
+    assert store.aggregates('A1').progress_totals()['Workout'] == 30
+    assert store.get_profile('A1') == {'name': 'Alice'}
+    assert store.get_profile('nobody') == {}
+    assert store.workouts('nobody')['Workout'] == []
+    assert store.members() == ['A1', 'B2']
+    columns = store.columns()
+    assert columns.report_summary('B2')['total_minutes'] == 55
+    assert columns.report_summary('A1')['total_calories'] == 300